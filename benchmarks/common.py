@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import base64
+import contextlib
+import sys
+import timeit
+from ipaddress import IPv4Network, IPv6Network
+from typing import Callable, Iterator
+
+from wgmgr import MainConfig, keygen
+
+
+def fake_key(index: int, salt: int = 0) -> str:
+    return base64.b64encode(
+        (index.to_bytes(16, "little") + salt.to_bytes(16, "little"))
+    ).decode()
+
+
+@contextlib.contextmanager
+def fake_keygen() -> Iterator[None]:
+    """
+    Replace key generation with cheap deterministic fakes so that benchmarks
+    measure wgmgr itself.
+    """
+    counter = 0
+
+    def generate_keypairs(count: int, jobs: int | None = None) -> list[tuple[str, str]]:
+        nonlocal counter
+        counter += count
+        return [
+            (fake_key(i, 1), fake_key(i, 2)) for i in range(counter - count, counter)
+        ]
+
+    def generate_psks(count: int, jobs: int | None = None) -> list[str]:
+        nonlocal counter
+        counter += count
+        return [fake_key(i, 3) for i in range(counter - count, counter)]
+
+    patched = {
+        "generate_keypairs": generate_keypairs,
+        "generate_keypair": lambda: generate_keypairs(1)[0],
+        "generate_psks": generate_psks,
+        "generate_psk": lambda: generate_psks(1)[0],
+    }
+    # also patch names imported from keygen into other modules, which a patch of
+    # the keygen module alone would miss
+    fakes = {id(getattr(keygen, name)): func for name, func in patched.items()}
+    replaced = [
+        (module, name, value)
+        for module_name, module in list(sys.modules.items())
+        if module_name.split(".")[0] == "wgmgr" and module is not None
+        for name, value in vars(module).items()
+        if id(value) in fakes
+    ]
+    for module, name, value in replaced:
+        setattr(module, name, fakes[id(value)])
+    try:
+        yield
+    finally:
+        for module, name, value in replaced:
+            setattr(module, name, value)
+
+
+SPARSE_DEGREE = 4
+
+
+def synthetic_config(num_peers: int, graph: str | None = None) -> MainConfig:
+    """
+    Config with num_peers peers and, depending on graph, no point-to-point
+    connections, a sparse ring in which every peer is connected to its
+    SPARSE_DEGREE nearest neighbors or a dense full mesh.
+    """
+    config = MainConfig(51820, IPv4Network("10.0.0.0/8"), IPv6Network("fd00::/64"))
+    with fake_keygen():
+        config.add_peers([{"name": f"peer{i}"} for i in range(num_peers)])
+        names = [peer.name for peer in config.peers]
+        if graph == "sparse":
+            for index, name in enumerate(names):
+                for offset in range(1, SPARSE_DEGREE // 2 + 1):
+                    other = names[(index + offset) % num_peers]
+                    if (other != name) and not config.has_p2p(name, other):
+                        config.add_p2p(name, other)
+        elif graph == "dense":
+            config.add_p2p_mesh(names)
+    return config
+
+
+def measure(func: Callable[[], object], number: int = 1, repeat: int = 5) -> float:
+    """
+    Best time per call in seconds.
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
@@ -0,0 +1,139 @@
+"""
+Memory use and construction time of the model classes compared to the previous
+dict-backed ones, which are reproduced here.
+"""
+
+from __future__ import annotations
+
+import gc
+import logging
+import marshal
+import tracemalloc
+from ipaddress import IPv4Address, IPv6Address
+from typing import Any, Callable
+
+from benchmarks.common import fake_keygen, measure, synthetic_config
+from wgmgr import keygen
+from wgmgr.p2p import PointToPointConfig
+from wgmgr.peer import PeerConfig
+
+SIZES = [1000, 10000, 100000]
+LINKS_PER_PEER = 4
+
+
+class LegacyAssignable:
+    def __init__(self, address: Any, auto: bool):
+        self.address = address
+        self.auto = auto
+
+
+class LegacyPort:
+    def __init__(self, number: int, auto: bool):
+        self.number = number
+        self.auto = auto
+
+
+class LegacyPeerConfig:
+    def __init__(self, name: str, private_key: str, public_key: str):
+        self.name = name
+        self.private_key = private_key
+        self.public_key = public_key
+        self.ipv4: LegacyAssignable | None = None
+        self.ipv6: LegacyAssignable | None = None
+        self.port: LegacyPort
+        self.site: str | None = None
+
+    @staticmethod
+    def deserialize(data: dict[str, Any]) -> "LegacyPeerConfig":
+        config = LegacyPeerConfig(data["name"], data["private_key"], data["public_key"])
+        config.ipv4 = LegacyAssignable(
+            IPv4Address(data["ipv4"]["address"]), data["ipv4"]["auto"]
+        )
+        config.ipv6 = LegacyAssignable(
+            IPv6Address(data["ipv6"]["address"]), data["ipv6"]["auto"]
+        )
+        config.port = LegacyPort(data["port"]["number"], data["port"]["auto"])
+        return config
+
+
+class LegacyPointToPointConfig:
+    def __init__(self, name1: str, name2: str, endpoint1: Any, endpoint2: Any):
+        self.peer1_name = name1
+        self.peer2_name = name2
+        self.peer1_endpoint = endpoint1
+        self.peer2_endpoint = endpoint2
+        self.preshared_key = keygen.generate_psk()
+
+    @staticmethod
+    def deserialize(data: dict[str, Any]) -> "LegacyPointToPointConfig":
+        config = LegacyPointToPointConfig(
+            data["peer1"]["name"],
+            data["peer2"]["name"],
+            data["peer1"]["endpoint"],
+            data["peer2"]["endpoint"],
+        )
+        config.preshared_key = data["preshared_key"]
+        return config
+
+
+def memory(func: Callable[[], object]) -> int:
+    """
+    Memory still allocated by the result of func once everything else it
+    allocated is freed again.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    logging.disable(logging.INFO)
+    print(
+        f"{'peers':>8} {'links':>8} {'model':>8} {'time':>10} {'memory':>10} "
+        f"{'per peer':>10}"
+    )
+    for size in SIZES:
+        config = synthetic_config(size)
+        names = [peer.name for peer in config.peers]
+        with fake_keygen():
+            for index, name in enumerate(names):
+                for offset in range(1, LINKS_PER_PEER + 1):
+                    other = names[(index + offset) % size]
+                    if not config.has_p2p(name, other):
+                        config.add_p2p(name, other)
+
+        data = config.serialize()
+        raw = marshal.dumps(data)
+        del config
+        num_links = len(data["point_to_point"])
+
+        for label, peer_class, p2p_class in (
+            ("legacy", LegacyPeerConfig, LegacyPointToPointConfig),
+            ("compact", PeerConfig, PointToPointConfig),
+        ):
+
+            def build(data=data):
+                return (
+                    [peer_class.deserialize(peer) for peer in data["peers"]],
+                    [p2p_class.deserialize(p2p) for p2p in data["point_to_point"]],
+                )
+
+            with fake_keygen():
+                elapsed = measure(build, repeat=3)
+                # deserialize a fresh copy whose strings are freed afterwards, as
+                # when loading a config from disk
+                used = memory(lambda: build(marshal.loads(raw)))
+            print(
+                f"{size:>8} {num_links:>8} {label:>8} {elapsed * 1e3:>8.1f}ms "
+                f"{used / 2**20:>8.1f}MB {used / size:>9.0f}B"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import logging
+import random
+
+from benchmarks.common import measure, synthetic_config
+
+SIZES = [10, 100, 1000, 10000, 100000]
+LOOKUPS = 1000
+
+
+def main():
+    logging.disable(logging.INFO)
+    print(f"{'peers':>8} {'get_peer':>12} {'by public key':>14}")
+    for size in SIZES:
+        config = synthetic_config(size)
+        peers = random.choices(config.peers, k=LOOKUPS)
+        names = [peer.name for peer in peers]
+        keys = [peer.public_key for peer in peers]
+
+        def by_name():
+            for name in names:
+                config.get_peer(name)
+
+        def by_public_key():
+            for key in keys:
+                config.get_peer_by_public_key(key)
+
+        print(
+            f"{size:>8} {measure(by_name) / LOOKUPS * 1e9:>10.0f}ns "
+            f"{measure(by_public_key) / LOOKUPS * 1e9:>12.0f}ns"
+        )
+
+
+if __name__ == "__main__":
+    main()
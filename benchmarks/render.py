@@ -0,0 +1,38 @@
+import logging
+import random
+
+from benchmarks.common import fake_keygen, measure, synthetic_config
+
+SIZES = [10, 100, 1000]
+DEGREE = 8
+
+
+def main():
+    logging.disable(logging.INFO)
+    print(f"{'peers':>8} {'links':>8} {'native':>12} {'jinja':>12}")
+    for size in SIZES:
+        config = synthetic_config(size)
+        names = [peer.name for peer in config.peers]
+        with fake_keygen():
+            for name in names:
+                for other in random.sample(names, min(DEGREE, size)):
+                    if (other != name) and not config.has_p2p(name, other):
+                        config.add_p2p(name, other)
+
+        def native():
+            for name in names:
+                config.generate_peer_config(name, "wg-quick")
+
+        def jinja():
+            for name in names:
+                config.generate_peer_config(name, "wg-quick", "wg-quick.conf.j2")
+
+        print(
+            f"{size:>8} {len(config.point_to_point):>8} "
+            f"{measure(native, repeat=3) / size * 1e6:>10.1f}us "
+            f"{measure(jinja, repeat=3) / size * 1e6:>10.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import subprocess
+import sys
+
+DEFERRED = [
+    "jinja2",
+    "yaml",
+    "concurrent.futures",
+    "wgmgr.templates",
+    "wgmgr.daemon",
+    "wgmgr.directory",
+    "wgmgr.dispatch",
+    "wgmgr.graph",
+    "wgmgr.interface",
+    "wgmgr.journal",
+    "wgmgr.renumber",
+    "wgmgr.operations.config",
+    "wgmgr.operations.keys",
+    "wgmgr.operations.p2p",
+    "wgmgr.operations.peer",
+    "wgmgr.operations.render",
+    "wgmgr.operations.site",
+]
+
+
+def import_times(module: str) -> dict[str, int]:
+    """
+    Cumulative import time in microseconds of every module imported by module, as
+    reported by python -X importtime.
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    result: dict[str, int] = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        result[name.strip()] = int(cumulative)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the startup of the CLI.")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=100.0,
+        help="Maximum import time of wgmgr.cli in milliseconds.",
+    )
+    args = parser.parse_args()
+
+    runs = [import_times("wgmgr.cli") for _ in range(args.repeat)]
+    best = min(runs, key=lambda times: times["wgmgr.cli"])
+    for module in ["typer", "wgmgr", "wgmgr.base", "wgmgr.cli"]:
+        print(f"{module:<16} {best.get(module, 0) / 1000:>8.1f}ms")
+
+    failed = False
+    for module in DEFERRED:
+        if module in best:
+            print(f"error: {module} is imported at startup")
+            failed = True
+    if best["wgmgr.cli"] / 1000 > args.budget:
+        print(f"error: startup exceeds budget of {args.budget:.0f}ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Scale benchmarks of the main operations on synthetic configs with sparse and
+dense point-to-point graphs. Key generation is replaced by cheap fakes.
+
+Results can be stored as a baseline and later runs are compared against it,
+failing if an operation got slower than the tolerance allows.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+import tempfile
+import time
+from ipaddress import IPv4Network
+from pathlib import Path
+from typing import Callable
+
+from benchmarks.common import fake_keygen, measure, synthetic_config
+from wgmgr import MainConfig
+from wgmgr.storage import StorageFormat
+
+SIZES = [10, 100, 1000, 10000, 100000]
+GRAPHS = ["sparse", "dense"]
+DENSE_MAX_PEERS = 1000
+BASELINE_VERSION = 1
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+
+def timed(
+    func: Callable[[], object],
+    setup: Callable[[], object] | None = None,
+    teardown: Callable[[], object] | None = None,
+    repeat: int = 3,
+) -> float:
+    """
+    Best time in seconds of a single call of func, excluding setup and teardown.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+        if teardown:
+            teardown()
+    return best
+
+
+def run_cases(
+    size: int, graph: str, storage_format: StorageFormat, repeat: int
+) -> dict[str, float]:
+    config = synthetic_config(size, graph)
+    names = [peer.name for peer in config.peers]
+    networks = [IPv4Network("172.16.0.0/12"), IPv4Network("10.0.0.0/8")]
+    suffix = {"yaml": ".yml", "json": ".json", "binary": ".wgmgr"}[storage_format]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / f"wgmgr{suffix}"
+        output = Path(directory) / f"output{suffix}"
+        config.save(path, storage_format, cache=False)
+
+        def add_p2p_setup():
+            if config.has_p2p(names[0], names[-1]):
+                config.remove_p2p(names[0], names[-1])
+
+        def set_ipv4_network():
+            networks.reverse()
+            config.set_ipv4_network(networks[0])
+
+        results: dict[str, float] = {}
+        with fake_keygen():
+            results["load"] = timed(
+                lambda: MainConfig.load(path, storage_format, cache=False),
+                repeat=repeat,
+            )
+            results["save"] = timed(
+                lambda: config.save(output, storage_format, cache=False),
+                setup=lambda: output.unlink(missing_ok=True),
+                repeat=repeat,
+            )
+            results["add_peer"] = timed(
+                lambda: config.add_peer("benchmark"),
+                teardown=lambda: config.remove_peer("benchmark"),
+                repeat=repeat,
+            )
+            if size > 1:
+                results["add_p2p"] = timed(
+                    lambda: config.add_p2p(names[0], names[-1]),
+                    setup=add_p2p_setup,
+                    repeat=repeat,
+                )
+            results["get_next_ipv4"] = measure(
+                config.get_next_ipv4, number=100, repeat=repeat
+            )
+            results["get_next_ipv6"] = measure(
+                config.get_next_ipv6, number=100, repeat=repeat
+            )
+            results["set_ipv4_network"] = timed(set_ipv4_network, repeat=repeat)
+            results["regenerate_all_keys"] = timed(
+                config.regenerate_all_keys, repeat=repeat
+            )
+            results["generate_peer_config"] = measure(
+                lambda: config.generate_peer_config(names[0], "wg-quick"),
+                number=10,
+                repeat=repeat,
+            )
+    return results
+
+
+def format_time(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds:.2f}s"
+
+
+def read_baseline(path: Path) -> dict[str, float]:
+    try:
+        with open(path) as fptr:
+            data = json.load(fptr)
+    except FileNotFoundError:
+        return {}
+    if data.get("version") != BASELINE_VERSION:
+        return {}
+    return data["results"]
+
+
+def write_baseline(path: Path, results: dict[str, float]):
+    with open(path, "w") as fptr:
+        json.dump(
+            {"version": BASELINE_VERSION, "results": results},
+            fptr,
+            indent=2,
+            sort_keys=True,
+        )
+        fptr.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--max-peers",
+        type=int,
+        default=10000,
+        help="Largest config to benchmark, at most 100000.",
+    )
+    parser.add_argument("--graph", choices=GRAPHS, action="append")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--format",
+        type=StorageFormat,
+        default=StorageFormat.yaml,
+        choices=list(StorageFormat),
+        help="Storage format used for load and save.",
+    )
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the results as the new baseline instead of comparing.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Relative slowdown against the baseline reported as regression.",
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    baseline = {} if args.save_baseline else read_baseline(args.baseline)
+    results: dict[str, float] = {}
+    regressions: list[str] = []
+
+    print(f"{'case':<40} {'time':>10} {'baseline':>10} {'change':>8}")
+    for graph in args.graph or GRAPHS:
+        for size in SIZES:
+            if (size > args.max_peers) or (
+                (graph == "dense") and (size > DENSE_MAX_PEERS)
+            ):
+                continue
+
+            for operation, elapsed in run_cases(
+                size, graph, args.format, args.repeat
+            ).items():
+                key = f"{operation}/{graph}/{size}"
+                results[key] = elapsed
+                line = f"{key:<40} {format_time(elapsed):>10}"
+                if key in baseline:
+                    change = elapsed / baseline[key] - 1
+                    line += f" {format_time(baseline[key]):>10} {change:>+7.0%}"
+                    if change > args.tolerance:
+                        line += "  REGRESSION"
+                        regressions.append(key)
+                print(line, flush=True)
+
+    if args.save_baseline:
+        write_baseline(args.baseline, results)
+        print(f"saved baseline to {args.baseline}")
+    elif regressions:
+        print(f"error: {len(regressions)} regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,15 @@ def tests(c):
     c.run(f"{VENV}/bin/pytest", pty=True)
 
 
+@task
+def bench(c, max_peers=10000, save_baseline=False, tolerance=0.25, storage="yaml"):
+    """Run the scale benchmarks and compare against the stored baseline"""
+    flags = f"--max-peers {max_peers} --tolerance {tolerance} --format {storage}"
+    if save_baseline:
+        flags += " --save-baseline"
+    c.run(f"{VENV}/bin/python -m benchmarks.suite {flags}", pty=True)
+
+
 @task
 def black(c, check=False, diff=False):
     """Run Black auto-formatter, optionally with --check or --diff"""
@@ -0,0 +1,12 @@
+from ipaddress import IPv4Network, IPv6Network
+
+import pytest
+
+from wgmgr import MainConfig
+
+
+@pytest.fixture
+def config() -> MainConfig:
+    return MainConfig(
+        51820, IPv4Network("10.0.0.0/24"), IPv6Network("fd00:641:c767:bc00::/64")
+    )
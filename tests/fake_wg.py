@@ -0,0 +1,107 @@
+"""
+Stand-in for the wg binary that keeps the state of one interface in the file
+FAKE_WG_STATE in the format of 'wg show <interface> dump' and appends every
+call to FAKE_WG_LOG. The commands listed in FAKE_WG_FAIL fail like wg does
+without the required permissions.
+"""
+
+import os
+import sys
+
+NONE = "(none)"
+
+
+def read_secret(path):
+    if path == "/dev/null":
+        return NONE
+    with open(path) as fptr:
+        return fptr.read().strip()
+
+
+def load():
+    with open(os.environ["FAKE_WG_STATE"]) as fptr:
+        lines = [line.split("\t") for line in fptr.read().splitlines() if line]
+    return lines[0], {fields[0]: fields for fields in lines[1:]}
+
+
+def save(interface, peers):
+    with open(os.environ["FAKE_WG_STATE"], "w") as fptr:
+        for fields in [interface, *peers.values()]:
+            fptr.write("\t".join(fields) + "\n")
+
+
+def new_peer(public_key):
+    return [public_key, NONE, NONE, NONE, "0", "0", "0", "off"]
+
+
+def wg_set(args):
+    interface, peers = load()
+    peer = None
+    while args:
+        key = args.pop(0)
+        if key == "private-key":
+            interface[0] = read_secret(args.pop(0))
+        elif key == "listen-port":
+            interface[2] = args.pop(0)
+        elif key == "peer":
+            public_key = args.pop(0)
+            peer = peers.setdefault(public_key, new_peer(public_key))
+        elif key == "remove":
+            del peers[peer[0]]
+        elif key == "preshared-key":
+            peer[1] = read_secret(args.pop(0))
+        elif key == "endpoint":
+            peer[2] = args.pop(0)
+        elif key == "allowed-ips":
+            peer[3] = args.pop(0) or NONE
+        else:
+            sys.exit(f"unsupported argument {key}")
+    save(interface, peers)
+
+
+def syncconf(path):
+    interface, peers = load()
+    with open(path) as fptr:
+        sections = fptr.read().split("[Peer]")
+
+    new_peers = {}
+    for section in sections[1:]:
+        values = dict(
+            line.split(" = ", 1) for line in section.strip().splitlines() if line
+        )
+        public_key = values["PublicKey"]
+        peer = peers.get(public_key, new_peer(public_key))
+        peer[1] = values.get("PresharedKey", NONE)
+        peer[2] = values.get("Endpoint", peer[2])
+        peer[3] = values.get("AllowedIPs", "").replace(", ", ",") or NONE
+        new_peers[public_key] = peer
+
+    for line in sections[0].splitlines():
+        if line.startswith("PrivateKey = "):
+            interface[0] = line.split(" = ", 1)[1]
+        elif line.startswith("ListenPort = "):
+            interface[2] = line.split(" = ", 1)[1]
+    save(interface, new_peers)
+
+
+def main():
+    args = sys.argv[1:]
+    with open(os.environ["FAKE_WG_LOG"], "a") as fptr:
+        fptr.write(" ".join(args) + "\n")
+
+    command, args = args[0], args[2:]
+    if command in os.environ.get("FAKE_WG_FAIL", "").split(","):
+        sys.exit("Unable to modify interface: Operation not permitted")
+    if command == "show":
+        with open(os.environ["FAKE_WG_STATE"]) as fptr:
+            sys.stdout.write(fptr.read())
+    elif command == "set":
+        wg_set(args)
+    elif command == "syncconf":
+        syncconf(args[0])
+    else:
+        sys.exit(f"unsupported command {command}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import subprocess
+import sys
+
+import pytest
+from typer.testing import CliRunner
+
+from wgmgr import MainConfig, dispatch
+from wgmgr.cli import app
+
+SCRIPT = """\
+# two peers and a connection
+add_peer a
+add_peer b ipv4=10.0.0.9 port=51999
+add_p2p a b endpoint2="b.example.com"
+set reserve=10.0.0.200/32 reserve=10.0.0.201/32 keep_offsets=yes
+"""
+
+
+def test_parse_lines():
+    assert dispatch.parse_lines(SCRIPT) == [
+        {"op": "add_peer", "args": {"name": "a"}},
+        {"op": "add_peer", "args": {"name": "b", "ipv4": "10.0.0.9", "port": 51999}},
+        {
+            "op": "add_p2p",
+            "args": {"peer1": "a", "peer2": "b", "endpoint2": "b.example.com"},
+        },
+        {
+            "op": "set",
+            "args": {
+                "reserve": ["10.0.0.200/32", "10.0.0.201/32"],
+                "keep_offsets": True,
+            },
+        },
+    ]
+
+    for line in ["drop_table", "add_peer a nickname=b", "add_peer a b c d e f"]:
+        with pytest.raises(ValueError):
+            dispatch.parse_lines(line)
+
+
+def test_batch(config, tmp_path):
+    path = tmp_path / "wgmgr.yml"
+    config.save(path)
+    script = tmp_path / "script"
+    script.write_text(SCRIPT + "generate_config a\n")
+
+    result = CliRunner().invoke(app, ["batch", str(script), "-c", str(path)])
+    assert result.exit_code == 0
+    assert "Endpoint = b.example.com:51999" in result.stdout
+    config = MainConfig.load(path)
+    assert [peer.name for peer in config.peers] == ["a", "b"]
+    assert config.has_p2p("a", "b")
+
+
+def test_batch_rollback(config, tmp_path):
+    path = tmp_path / "wgmgr.yml"
+    config.add_peer("a")
+    config.save(path)
+    before = path.read_bytes()
+
+    result = CliRunner().invoke(
+        app, ["batch", "-c", str(path)], input="add_peer b\nadd_peer a\n"
+    )
+    assert result.exit_code == 1
+    assert "operation 2 (add_peer) failed: peer already exists: a" in result.output
+    assert path.read_bytes() == before
+
+
+def test_batch_yaml(config, tmp_path):
+    path = tmp_path / "wgmgr.yml"
+    config.save(path)
+    script = tmp_path / "script.yml"
+    script.write_text("- op: add_peer\n  args: {name: a, port: 51999}\n")
+
+    result = CliRunner().invoke(app, ["batch", str(script), "-c", str(path)])
+    assert result.exit_code == 0
+    assert MainConfig.load(path).get_peer("a").port.number == 51999
+
+
+def test_concurrent_updates(config, tmp_path):
+    path = tmp_path / "wgmgr.yml"
+    config.save(path)
+    names = [f"peer{i}" for i in range(8)]
+    processes = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                "from wgmgr.cli import app; app()",
+                "peer",
+                "add",
+                name,
+                "-c",
+                str(path),
+            ],
+            stderr=subprocess.DEVNULL,
+        )
+        for name in names
+    ]
+    assert [process.wait() for process in processes] == [0] * len(names)
+    assert sorted(peer.name for peer in MainConfig.load(path).peers) == names
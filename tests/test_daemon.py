@@ -0,0 +1,170 @@
+import threading
+
+import pytest
+from typer.testing import CliRunner
+
+from wgmgr import MainConfig, daemon, storage
+from wgmgr.cli import app
+from wgmgr.error import DaemonError
+
+
+def start(path):
+    instance = daemon.Daemon(path, flush_interval=0)
+    thread = threading.Thread(target=instance.serve_forever)
+    thread.start()
+    while (client := daemon.connect(instance.socket_path)) is None:
+        pass
+    client.close()
+    return instance, thread
+
+
+@pytest.fixture
+def server(config, tmp_path):
+    path = tmp_path / "wgmgr.yml"
+    config.save(path)
+    instance, thread = start(path)
+    yield instance
+    instance.shutdown()
+    thread.join()
+
+
+@pytest.fixture
+def client(server):
+    instance = daemon.connect(server.socket_path)
+    yield instance
+    instance.close()
+
+
+def test_operations(server, client):
+    client.call("add_peer", name="a")
+    client.call("add_peer", name="b", ipv4="10.0.0.9")
+    client.call("add_p2p", peer1="a", peer2="b", endpoint2="b.example.com")
+    assert client.call("list_peers") == ["a", "b"]
+    assert "Endpoint = b.example.com:51820" in client.call("generate_config", name="a")
+    assert client.call("set", ipv4_network="10.1.0.0/24") == [
+        "a: 10.0.0.1 -> 10.1.0.1",
+        "b: 10.0.0.9 -> 10.1.0.2",
+    ]
+
+    with pytest.raises(DaemonError) as e:
+        client.call("add_peer", name="a")
+    assert e.value.kind == "DuplicatePeerError"
+    with pytest.raises(DaemonError) as e:
+        client.call("add_peer", nickname="c")
+    assert e.value.kind == "TypeError"
+    with pytest.raises(DaemonError) as e:
+        client.call("drop_table")
+    assert e.value.kind == "UnknownOperationError"
+
+
+def test_flush(server, client):
+    client.call("add_peer", name="a")
+    assert not MainConfig.load(server.config_path).has_peer("a")
+    client.call("flush")
+    assert MainConfig.load(server.config_path).has_peer("a")
+
+
+def test_reload_external_change(server, client):
+    config = MainConfig.load(server.config_path)
+    config.add_peer("external")
+    config.save(server.config_path)
+    assert client.call("list_peers") == ["external"]
+
+
+def test_cli(config, tmp_path):
+    config.save(tmp_path / "wgmgr.yml")
+    server, thread = start(tmp_path / "wgmgr.yml")
+    path = str(server.config_path)
+    assert CliRunner().invoke(app, ["peer", "add", "a", "-c", path]).exit_code == 0
+    result = CliRunner().invoke(app, ["peer", "remove", "b", "-c", path])
+    assert result.output == "no such peer: b\n"
+    assert server.config.has_peer("a")
+
+    result = CliRunner().invoke(app, ["--no-daemon", "peer", "list", "-c", path])
+    assert result.output == ""
+    server.shutdown()
+    thread.join()
+    assert MainConfig.load(server.config_path).has_peer("a")
+    assert not storage.get_socket_path(server.config_path).exists()
+
+
+def test_batch(server, client):
+    client.call("add_peer", name="a")
+    with pytest.raises(DaemonError) as e:
+        client.call(
+            "batch",
+            requests=[
+                {"op": "add_peer", "args": {"name": "b"}},
+                {"op": "add_peer", "args": {"name": "a"}},
+            ],
+        )
+    assert e.value.kind == "BatchError"
+    assert client.call("list_peers") == ["a"]
+
+    requests = [{"op": "add_peer", "args": {"name": "b"}}, {"op": "list_peers"}]
+    assert client.call("batch", requests=requests, dry_run=True) == [None, ["a", "b"]]
+    assert client.call("list_peers") == ["a"]
+    assert client.call("batch", requests=requests) == [None, ["a", "b"]]
+    assert client.call("list_peers") == ["a", "b"]
+
+
+def test_set_dry_run(server, client):
+    client.call("add_peer", name="a")
+    client.call("flush")
+    before = server.config.serialize()
+    report = client.call(
+        "set",
+        port=1234,
+        reserve=["10.0.0.128/25"],
+        ipv4_network="10.1.0.0/24",
+        dry_run=True,
+    )
+    assert report == ["a: 10.0.0.1 -> 10.1.0.1"]
+    assert not server.dirty
+    assert server.config.serialize() == before
+
+
+def test_direct_update_while_dirty(server, client):
+    client.call("add_peer", name="a")
+    client.call("flush")
+    client.call("add_peer", name="b")
+    assert server.dirty
+
+    path = str(server.config_path)
+    result = CliRunner().invoke(
+        app, ["--no-daemon", "peer", "rename", "a", "renamed", "-c", path]
+    )
+    assert result.exit_code == 0
+    assert client.call("list_peers") == ["renamed", "b"]
+    client.call("add_peer", name="c")
+    client.call("flush")
+    names = [peer.name for peer in MainConfig.load(server.config_path).peers]
+    assert names == ["renamed", "b", "c"]
+
+
+@pytest.mark.parametrize(
+    "response, message",
+    [(b"", "daemon closed the connection"), (b"{\n", "invalid response from daemon")],
+)
+def test_cli_broken_daemon(config, tmp_path, response, message):
+    import socket
+
+    path = tmp_path / "wgmgr.yml"
+    config.save(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(storage.get_socket_path(path)))
+    listener.listen()
+
+    def respond():
+        connection, _ = listener.accept()
+        with connection:
+            connection.makefile("rb").readline()
+            connection.sendall(response)
+
+    thread = threading.Thread(target=respond)
+    thread.start()
+    result = CliRunner().invoke(app, ["peer", "remove", "a", "-c", str(path)])
+    thread.join()
+    listener.close()
+    assert result.exit_code == 1
+    assert result.output == f"{message}\n"
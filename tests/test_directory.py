@@ -0,0 +1,106 @@
+import pytest
+from typer.testing import CliRunner
+
+from wgmgr import MainConfig, directory, storage
+from wgmgr.cli import app
+
+
+@pytest.fixture
+def populated(config):
+    config.add_peers([{"name": name} for name in ["a", "b", "c d"]])
+    config.add_p2p("a", "b", "a.example.com")
+    config.add_p2p("a", "c d")
+    return config
+
+
+def sorted_data(config):
+    data = config.serialize()
+    data["peers"].sort(key=lambda entry: directory.escape(entry["name"]))
+    data["point_to_point"].sort(key=directory.SHARDS["point_to_point"][1])
+    return data
+
+
+def test_layout(populated, tmp_path):
+    path = tmp_path / "wgmgr.d"
+    assert populated.save(path)
+    assert storage.guess_format(path) == storage.StorageFormat.directory
+    assert sorted(
+        str(file.relative_to(path)) for file in path.rglob("*") if file.is_file()
+    ) == [
+        "config.yml",
+        "links/a+b.yml",
+        "links/a+c%20d.yml",
+        "peers/a.yml",
+        "peers/b.yml",
+        "peers/c%20d.yml",
+    ]
+    assert MainConfig.load(path).serialize() == sorted_data(populated)
+    assert not populated.save(path)
+
+
+def test_save_dirty_only(populated, tmp_path, monkeypatch):
+    path = tmp_path / "wgmgr.d"
+    populated.save(path)
+    config = MainConfig.load(path)
+    config.rotate_keys(["b"])
+    config.remove_p2p("a", "c d")
+
+    written = []
+    write = directory.write_file_atomic
+    monkeypatch.setattr(
+        directory,
+        "write_file_atomic",
+        lambda file, content: written.append(file.name) or write(file, content),
+    )
+    assert config.save(path)
+    # rotating the keys of b also replaces the preshared key of its connection
+    assert written == ["b.yml", "a+b.yml"]
+    assert not (path / "links" / "a+c%20d.yml").exists()
+    assert MainConfig.load(path).serialize() == sorted_data(config)
+
+
+def test_convert(populated, tmp_path):
+    single = tmp_path / "wgmgr.yml"
+    populated.save(single)
+    runner = CliRunner()
+    result = runner.invoke(
+        app,
+        ["convert", str(single), str(tmp_path / "shards"), "--format", "directory"],
+    )
+    assert result.exit_code == 0
+    assert (tmp_path / "shards" / "peers" / "a.yml").exists()
+
+    result = runner.invoke(
+        app, ["convert", str(tmp_path / "shards"), str(tmp_path / "back.json")]
+    )
+    assert result.exit_code == 0
+    assert MainConfig.load(tmp_path / "back.json").serialize() == sorted_data(populated)
+
+
+def test_daemon_reload(populated, tmp_path):
+    from wgmgr import daemon
+
+    path = tmp_path / "wgmgr.d"
+    populated.save(path)
+    instance = daemon.Daemon(path, flush_interval=0)
+    config = MainConfig.load(path)
+    config.remove_peer("b")
+    config.save(path)
+    assert instance.handle({"op": "list_peers"}) == {"result": ["a", "c d"]}
+
+
+def test_journal_compaction(populated, tmp_path):
+    path = tmp_path / "wgmgr.d"
+    populated.save(path)
+    config = MainConfig.load(path)
+    config.add_peer("e")
+    config.remove_peer("b")
+    config.save(path, journal=True)
+    assert not (path / "peers" / "e.yml").exists()
+
+    result = CliRunner().invoke(app, ["journal", "--compact", "-c", str(path)])
+    assert result.exit_code == 0
+    assert not storage.get_journal_path(path).exists()
+    assert (path / "peers" / "e.yml").exists()
+    assert not (path / "peers" / "b.yml").exists()
+    assert MainConfig.load(path).serialize() == sorted_data(config)
@@ -0,0 +1,104 @@
+import io
+import json
+from xml.etree import ElementTree
+
+import pytest
+from typer.testing import CliRunner
+
+from wgmgr import graph
+from wgmgr.cli import app
+from wgmgr.error import UnknownPeerError
+
+
+@pytest.fixture
+def topology(config):
+    config.add_peers([{"name": name} for name in "abcde"])
+    config.add_site("home", hubs=["a"], endpoints={"a": "a.example.com:51820"})
+    config.set_peer_site("b", "home")
+    config.apply_topology()
+    config.add_p2p("c", "d", endpoint2="192.0.2.4")
+    return config
+
+
+def test_analytics(topology):
+    assert graph.components(topology) == [["a", "b"], ["c", "d"], ["e"]]
+    assert graph.degree_distribution(topology) == {0: 1, 1: 4}
+    assert graph.unreachable_from(topology, "a") == ["c", "d", "e"]
+    with pytest.raises(UnknownPeerError):
+        graph.unreachable_from(topology, "x")
+
+
+def test_dot(topology):
+    output = io.StringIO()
+    graph.write_graph(topology, output, graph.GraphFormat.dot)
+    lines = output.getvalue().splitlines()
+    assert lines[0] == "graph network {"
+    assert lines[-1] == "}"
+    assert (
+        '    "a" [label="a\\nhome\\n10.0.0.1\\nfd00:641:c767:bc00::1\\n'
+        'a.example.com:51820", site="home", ipv4="10.0.0.1", '
+        'ipv6="fd00:641:c767:bc00::1", endpoints="a.example.com:51820"];'
+    ) in lines
+    assert '    "a" -- "b" [style=dashed, endpoint1="a.example.com:51820"];' in lines
+    assert '    "c" -- "d" [style=solid, endpoint2="192.0.2.4"];' in lines
+
+
+def test_graphml(topology):
+    output = io.StringIO()
+    graph.write_graph(topology, output, graph.GraphFormat.graphml)
+    namespace = "{http://graphml.graphdrawing.org/xmlns}"
+    root = ElementTree.fromstring(output.getvalue())
+    nodes = root.findall(f"{namespace}graph/{namespace}node")
+    edges = root.findall(f"{namespace}graph/{namespace}edge")
+    assert [node.get("id") for node in nodes] == list("abcde")
+    assert [(edge.get("source"), edge.get("target")) for edge in edges] == [
+        ("a", "b"),
+        ("c", "d"),
+    ]
+
+
+def test_json(topology):
+    output = io.StringIO()
+    graph.write_graph(topology, output, graph.GraphFormat.json)
+    data = json.loads(output.getvalue())
+    assert data["nodes"][3] == {
+        "name": "d",
+        "site": None,
+        "ipv4": "10.0.0.4",
+        "ipv6": "fd00:641:c767:bc00::4",
+        "endpoints": ["192.0.2.4"],
+    }
+    assert data["edges"][1] == {
+        "peer1": "c",
+        "peer2": "d",
+        "endpoint1": None,
+        "endpoint2": "192.0.2.4",
+        "auto": False,
+    }
+
+
+def test_cli(topology, tmp_path):
+    path = tmp_path / "wgmgr.yml"
+    topology.save(path)
+
+    result = CliRunner().invoke(
+        app, ["graph", "-c", str(path), "--stats", "--hub", "a"]
+    )
+    assert result.exit_code == 0
+    assert result.stdout.splitlines() == [
+        "peers: 5",
+        "connections: 2",
+        "components: 3 (largest: 2)",
+        "degree 0: 1",
+        "degree 1: 4",
+        "unreachable from a: c, d, e",
+    ]
+
+    result = CliRunner().invoke(
+        app, ["graph", "-c", str(path), "-f", "json", "-o", str(tmp_path / "out")]
+    )
+    assert result.exit_code == 0
+    assert len(json.loads((tmp_path / "out").read_text())["edges"]) == 2
+
+    result = CliRunner().invoke(app, ["graph", "-c", str(path), "-f", "svg"])
+    assert result.exit_code == 1
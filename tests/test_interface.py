@@ -0,0 +1,128 @@
+import sys
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from wgmgr import interface
+from wgmgr.cli import app
+
+FAKE_WG = Path(__file__).with_name("fake_wg.py")
+STALE_KEY = "S" * 42 + "E="
+
+
+@pytest.fixture
+def local(config):
+    config.add_peers([{"name": name} for name in "abc"])
+    config.add_p2p("a", "b", endpoint2="192.0.2.2")
+    config.add_p2p("a", "c", endpoint2="c.example.com")
+    return config
+
+
+@pytest.fixture
+def wg(tmp_path, monkeypatch, local):
+    """
+    A fake wg binary with an interface that has outdated settings: the wrong port,
+    a stale peer, no connection to c and the wrong allowed IPs for b.
+    """
+    binary = tmp_path / "wg"
+    binary.write_text(f'#!/bin/sh\nexec {sys.executable} {FAKE_WG} "$@"\n')
+    binary.chmod(0o755)
+
+    peer_a = local.get_peer("a")
+    peer_b = local.get_peer("b")
+    state = tmp_path / "state"
+    state.write_text(
+        f"{peer_a.private_key}\t{peer_a.public_key}\t51821\toff\n"
+        f"{peer_b.public_key}\t{local.get_p2p('a', 'b').preshared_key}\t"
+        "192.0.2.2:51820\t10.0.0.2/32\t0\t0\t0\toff\n"
+        f"{STALE_KEY}\t(none)\t(none)\t10.0.0.9/32\t0\t0\t0\toff\n"
+    )
+    monkeypatch.setenv("FAKE_WG_STATE", str(state))
+    monkeypatch.setenv("FAKE_WG_LOG", str(tmp_path / "log"))
+    return interface.WgCommand("wg0", str(binary))
+
+
+def test_parse_dump(wg, local):
+    state = wg.dump()
+    assert state.private_key == local.get_peer("a").private_key
+    assert state.listen_port == 51821
+    assert state.peers[STALE_KEY].preshared_key is None
+    assert state.peers[STALE_KEY].endpoint is None
+    assert state.peers[STALE_KEY].allowed_ips == ["10.0.0.9/32"]
+
+    with pytest.raises(ValueError):
+        interface.parse_dump("invalid\n")
+
+
+def test_diff(wg, local):
+    names = {peer.public_key: peer.name for peer in local.peers}
+    changes = interface.diff(wg.dump(), interface.desired_state(local, "a"), names)
+    peer_b = local.get_peer("b").public_key
+    peer_c = local.get_peer("c").public_key
+    assert changes.describe() == [
+        "~ interface: listen-port 51820",
+        f"- peer {STALE_KEY}",
+        f"~ peer {peer_b} (b): allowed-ips 10.0.0.2/32,fd00:641:c767:bc00::2/128",
+        f"+ peer {peer_c} (c): preshared-key, allowed-ips "
+        "10.0.0.3/32,fd00:641:c767:bc00::3/128, endpoint c.example.com:51820",
+    ]
+
+
+@pytest.mark.parametrize("syncconf", [False, True])
+def test_apply(wg, local, tmp_path, syncconf):
+    desired = interface.desired_state(local, "a")
+    changes = interface.diff(wg.dump(), desired)
+    if syncconf:
+        wg.syncconf(desired)
+    else:
+        wg.apply(changes)
+
+    assert not interface.diff(wg.dump(), desired)
+    log = (tmp_path / "log").read_text()
+    assert local.get_p2p("a", "c").preshared_key not in log
+    assert (f"peer {local.get_peer('b').public_key}" in log) == (not syncconf)
+
+
+def test_cli_dry_run(wg, local, tmp_path):
+    config_path = tmp_path / "wgmgr.yml"
+    local.save(config_path)
+    before = (tmp_path / "state").read_text()
+
+    result = CliRunner().invoke(
+        app, ["apply", "a", "-c", str(config_path), "--wg", wg.binary, "-n"]
+    )
+    assert result.exit_code == 0
+    assert result.stdout.splitlines()[0] == "~ interface: listen-port 51820"
+    assert (tmp_path / "state").read_text() == before
+
+    result = CliRunner().invoke(
+        app, ["apply", "a", "-c", str(config_path), "--wg", wg.binary]
+    )
+    assert result.exit_code == 0
+    assert not interface.diff(wg.dump(), interface.desired_state(local, "a"))
+
+
+@pytest.mark.parametrize("fail", ["set", "show"])
+def test_cli_wg_failure(wg, local, tmp_path, monkeypatch, fail):
+    config_path = tmp_path / "wgmgr.yml"
+    local.save(config_path)
+    monkeypatch.setenv("FAKE_WG_FAIL", fail)
+
+    result = CliRunner().invoke(
+        app, ["apply", "a", "-c", str(config_path), "--wg", wg.binary]
+    )
+    assert result.exit_code == 1
+    assert f"{wg.binary} {fail} wg0" in result.output
+    assert "Operation not permitted" in result.output
+
+
+def test_cli_missing_wg(local, tmp_path):
+    config_path = tmp_path / "wgmgr.yml"
+    local.save(config_path)
+    missing = str(tmp_path / "missing")
+    result = CliRunner().invoke(
+        app, ["apply", "a", "-c", str(config_path), "--wg", missing]
+    )
+    assert result.exit_code == 1
+    assert f"{missing} show wg0 dump failed" in result.output
@@ -0,0 +1,104 @@
+from typer.testing import CliRunner
+
+from wgmgr import MainConfig, journal, storage
+from wgmgr.cli import app
+
+
+def test_journaled_save(config, tmp_path):
+    path = tmp_path / "wgmgr.yml"
+    config.add_peers([{"name": name} for name in "abc"])
+    config.save(path)
+    snapshot = path.read_bytes()
+
+    config = MainConfig.load(path)
+    config.add_peer("d")
+    config.remove_peer("b")
+    config.add_p2p("a", "c", "a.example.com")
+    config.rotate_keys(["a"])
+    config.set_default_port(51000)
+    assert config.save(path, journal=True)
+    assert not config.save(path, journal=True)
+    config.rename_peer("d", "e")
+    assert config.save(path, journal=True)
+
+    assert path.read_bytes() == snapshot
+    records = journal.read(path)
+    assert [(r["op"], r["kind"], r.get("key")) for r in records] == [
+        ("set", "settings", None),
+        ("delete", "peer", "b"),
+        ("put", "peer", "a"),
+        ("put", "peer", "c"),
+        ("put", "peer", "d"),
+        ("put", "p2p", ["a", "c"]),
+        ("delete", "peer", "d"),
+        ("put", "peer", "e"),
+    ]
+    assert {"private_key", "public_key"} <= set(records[2]["fields"])
+    assert "ipv4" not in records[2]["fields"]
+    assert MainConfig.load(path).serialize() == config.serialize()
+
+    # replaying records that are already part of the snapshot changes nothing
+    journaled = journal.get_journal_path(path).read_bytes()
+    config.save(path, journal=False)
+    assert not journal.get_journal_path(path).exists()
+    journal.get_journal_path(path).write_bytes(journaled)
+    assert MainConfig.load(path).serialize() == config.serialize()
+
+
+def test_compaction(config, tmp_path, monkeypatch):
+    monkeypatch.setattr(journal, "COMPACT_SIZE", 1000)
+    path = tmp_path / "wgmgr.yml"
+    config.save(path)
+    config = MainConfig.load(path)
+    config.add_peer("a")
+    config.save(path, journal=True)
+    assert 0 < journal.get_size(path) < 1000
+
+    config.add_peers([{"name": name} for name in "bcdef"])
+    config.save(path, journal=True)
+    assert journal.get_size(path) > 1000
+    config.add_peer("g")
+    config.save(path, journal=True)
+    assert not journal.get_journal_path(path).exists()
+    assert len(storage.load_data(path)["peers"]) == 7
+
+
+def test_torn_record(config, tmp_path):
+    path = tmp_path / "wgmgr.yml"
+    config.save(path)
+    config = MainConfig.load(path)
+    config.add_peer("a")
+    config.save(path, journal=True)
+    with open(journal.get_journal_path(path), "a") as fptr:
+        fptr.write('{"time": 0, "op": "put", "kind": "peer", "key": "b", "val')
+    assert [peer.name for peer in MainConfig.load(path).peers] == ["a"]
+
+    config = MainConfig.load(path)
+    config.add_peer("c")
+    config.save(path, journal=True)
+    config.add_peer("d")
+    config.save(path, journal=True)
+    assert [peer.name for peer in MainConfig.load(path).peers] == ["a", "c", "d"]
+
+
+def test_cli(config, tmp_path):
+    path = tmp_path / "wgmgr.yml"
+    config.save(path)
+    runner = CliRunner()
+    for args in [["peer", "add", "a"], ["peer", "add", "b"], ["peer", "remove", "a"]]:
+        result = runner.invoke(app, ["--journal", *args, "-c", str(path)])
+        assert result.exit_code == 0
+
+    result = runner.invoke(app, ["journal", "-c", str(path)])
+    assert [line.split(" ", 2)[2] for line in result.output.splitlines()] == [
+        "put peer a ipv4,ipv6,key_created,key_generation,name,port,private_key,"
+        "public_key,site",
+        "put peer b ipv4,ipv6,key_created,key_generation,name,port,private_key,"
+        "public_key,site",
+        "delete peer a",
+    ]
+    assert "private_key" not in result.output.replace(",private_key,", "")
+
+    assert runner.invoke(app, ["journal", "--compact", "-c", str(path)]).exit_code == 0
+    assert not journal.get_journal_path(path).exists()
+    assert [peer.name for peer in MainConfig.load(path).peers] == ["b"]
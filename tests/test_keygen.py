@@ -0,0 +1,70 @@
+import base64
+
+import pytest
+
+from wgmgr import keygen
+
+
+@pytest.fixture(autouse=True)
+def native_backend():
+    backend = keygen.get_backend()
+    keygen.set_backend(keygen.KeygenBackend.native)
+    yield
+    keygen.set_backend(backend)
+
+
+def test_x25519_rfc7748():
+    scalar = bytes.fromhex(
+        "a546e36bf0527c9d3b16154b82465edd62144c0ac1fc5a18506a2244ba449ac4"
+    )
+    point = bytes.fromhex(
+        "e6db6867583030db3594c1a424b15f7c726624ec26b3353b10a903a6d0ab1c4c"
+    )
+    assert (
+        keygen.x25519(scalar, point).hex()
+        == "c3da55379de9c6908e94ea4df28d084f32eccf03491c71f754b4075577a28552"
+    )
+
+
+def test_public_key_rfc7748():
+    private_key = bytes.fromhex(
+        "77076d0a7318a57d3c16c17251b26645df4c2f87ebc0992ab177fba51db92c2a"
+    )
+    assert keygen.generate_public_key(keygen.encode_key(private_key)) == (
+        keygen.encode_key(
+            bytes.fromhex(
+                "8520f0098930a754748b7ddcb43ef75a0dbf3a0d26381af4eba4a98eaa9b4e6a"
+            )
+        )
+    )
+
+
+def test_private_key_is_clamped():
+    key = base64.b64decode(keygen.generate_private_key())
+    assert len(key) == keygen.KEY_SIZE
+    assert key[0] & 7 == 0
+    assert key[31] & 128 == 0
+    assert key[31] & 64 == 64
+
+
+def test_generate_keypairs():
+    keypairs = keygen.generate_keypairs(10)
+    assert len(keypairs) == 10
+    assert len({private_key for private_key, _ in keypairs}) == 10
+    for private_key, public_key in keypairs:
+        assert keygen.generate_public_key(private_key) == public_key
+
+
+def test_generate_psks():
+    psks = keygen.generate_psks(10)
+    assert len(psks) == 10
+    assert len(set(psks)) == 10
+    for psk in psks:
+        assert len(keygen.decode_key(psk)) == keygen.KEY_SIZE
+
+
+def test_backend_from_env(monkeypatch):
+    monkeypatch.setenv("WGMGR_KEYGEN_BACKEND", "wg")
+    assert keygen._backend_from_env() == keygen.KeygenBackend.wg
+    monkeypatch.setenv("WGMGR_KEYGEN_BACKEND", "bogus")
+    assert keygen._backend_from_env() == keygen.KeygenBackend.native
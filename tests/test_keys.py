@@ -0,0 +1,56 @@
+import itertools
+
+from wgmgr import MainConfig, keygen
+
+
+def test_key_metadata(config):
+    config.add_peers([{"name": name} for name in "abcd"])
+    config.add_p2p_mesh(["a", "b", "c"])
+    peer = config.get_peer("a")
+    assert peer.key_generation == 1
+    assert peer.key_created is not None
+
+    for index, name in enumerate("abcd"):
+        config.get_peer(name).key_created = 1000 * index
+    assert config.select_key_rotation(1500, now=2500) == ["a", "b"]
+    assert config.select_key_rotation(1500, patterns=["b*"], now=2500) == ["b"]
+    config.get_peer("d").key_created = None
+    assert config.select_key_rotation(1500, now=2500) == ["a", "b", "d"]
+
+    loaded = MainConfig.deserialize(config.serialize())
+    assert loaded.serialize() == config.serialize()
+    assert loaded.get_peer("b").key_created == 1000
+
+
+def test_rotate_keys(config):
+    config.add_peers([{"name": name} for name in "abcd"])
+    config.add_p2p_mesh(["a", "b", "c"])
+    config.add_p2p("c", "d")
+    keys = {peer.name: peer.public_key for peer in config.peers}
+    psks = {id(p2p): p2p.preshared_key for p2p in config.point_to_point}
+
+    result = config.rotate_keys(["a", "b"])
+    assert result.peers == ["a", "b"]
+    assert sorted((p2p.peer1_name, p2p.peer2_name) for p2p in result.p2ps) == [
+        ("a", "b"),
+        ("a", "c"),
+        ("b", "c"),
+    ]
+    for p2p in config.point_to_point:
+        rotated = p2p.peer2_name != "d"
+        assert (psks[id(p2p)] != p2p.preshared_key) == rotated
+        assert p2p.psk_generation == (2 if rotated else 1)
+
+    assert config.get_peer("a").public_key != keys["a"]
+    assert config.get_peer("a").key_generation == 2
+    assert config.get_peer("c").public_key == keys["c"]
+    assert config.get_peer_by_public_key(config.get_peer("a").public_key).name == "a"
+
+
+def test_wg_backend_concurrent(monkeypatch):
+    counter = itertools.count()
+    monkeypatch.setattr(keygen, "_wg", lambda *args, input=None: f"key{next(counter)}")
+    monkeypatch.setattr(keygen, "_backend", keygen.KeygenBackend.wg)
+    assert sorted(keygen.generate_psks(8, jobs=4)) == sorted(
+        f"key{i}" for i in range(8)
+    )
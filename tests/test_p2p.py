@@ -0,0 +1,77 @@
+import pytest
+
+from wgmgr import MainConfig
+
+
+@pytest.fixture
+def mesh(config):
+    config.add_peers([{"name": name} for name in "abcd"])
+    config.add_p2p("a", "b")
+    config.add_p2p("c", "a")
+    config.add_p2p("b", "c")
+    return config
+
+
+def test_add_p2p(mesh):
+    assert mesh.has_p2p("a", "c")
+    assert mesh.has_p2p("c", "a")
+    assert not mesh.has_p2p("a", "d")
+    assert mesh.get_neighbors("a") == ["b", "c"]
+    assert mesh.get_neighbors("d") == []
+
+    with pytest.raises(ValueError):
+        mesh.add_p2p("a", "c")
+    with pytest.raises(ValueError):
+        mesh.add_p2p("b", "a")
+
+
+def test_remove_p2p(mesh):
+    mesh.remove_p2p("c", "a")
+    assert not mesh.has_p2p("a", "c")
+    assert mesh.get_neighbors("a") == ["b"]
+    assert len(mesh.point_to_point) == 2
+
+    with pytest.raises(ValueError):
+        mesh.remove_p2p("a", "c")
+
+
+def test_remove_peer_removes_p2ps(mesh):
+    mesh.remove_peer("a")
+    assert [(p2p.peer1_name, p2p.peer2_name) for p2p in mesh.point_to_point] == [
+        ("b", "c")
+    ]
+    assert mesh.get_neighbors("b") == ["c"]
+
+
+def test_adjacency_after_load(mesh):
+    loaded = MainConfig.deserialize(mesh.serialize())
+    for p2p in mesh.point_to_point:
+        loaded_p2p = loaded.get_p2p(p2p.peer2_name, p2p.peer1_name)
+        assert loaded_p2p.preshared_key == p2p.preshared_key
+    assert loaded.get_neighbors("c") == ["a", "b"]
+
+
+def test_regenerate_keys_for_peer(mesh):
+    psks = {id(p2p): p2p.preshared_key for p2p in mesh.point_to_point}
+    mesh.regenerate_keys_for_peer("c")
+    for p2p in mesh.point_to_point:
+        changed = psks[id(p2p)] != p2p.preshared_key
+        assert changed == ("c" in (p2p.peer1_name, p2p.peer2_name))
+
+
+def test_add_p2p_mesh(mesh):
+    mesh.add_site("home")
+    mesh.add_peers([{"name": "e", "site": "home"}, {"name": "f", "site": "home"}])
+
+    p2ps = mesh.add_p2p_mesh(mesh.select_peers(sites=["home"]))
+    assert [(p2p.peer1_name, p2p.peer2_name) for p2p in p2ps] == [("e", "f")]
+
+    p2ps = mesh.add_p2p_mesh(mesh.select_peers())
+    assert len(p2ps) == 15 - 4
+    assert len(mesh.point_to_point) == 15
+    assert len({p2p.preshared_key for p2p in mesh.point_to_point}) == 15
+    assert mesh.get_neighbors("d") == ["a", "b", "c", "e", "f"]
+    assert mesh.add_p2p_mesh(["a", "b", "c"]) == []
+
+    loaded = MainConfig.deserialize(mesh.serialize())
+    assert loaded.select_peers(sites=["home"]) == ["e", "f"]
@@ -0,0 +1,131 @@
+from ipaddress import IPv4Address, IPv6Address
+
+import pytest
+from typer.testing import CliRunner
+
+from wgmgr import MainConfig, keygen
+from wgmgr.cli import app
+from wgmgr.error import DuplicatePeerError, InvalidPeerNameError, UnknownPeerError
+from wgmgr.peer import PeerConfig
+
+
+def test_add_peers(config):
+    config.add_site("home")
+    config.add_peer("existing")
+    errors = config.add_peers(
+        [
+            {"name": "a"},
+            {"name": "b", "ipv4": "10.0.0.2", "port": "1234"},
+            {"name": "existing"},
+            {"name": "c", "ipv6": "invalid"},
+            {"name": "a"},
+            {"name": "d", "site": "home"},
+        ]
+    )
+
+    assert [index for index, _ in errors] == [2, 3, 4]
+    assert isinstance(errors[0][1], DuplicatePeerError)
+    assert isinstance(errors[2][1], DuplicatePeerError)
+
+    assert [peer.name for peer in config.peers] == ["existing", "a", "b", "d"]
+    assert config.get_peer("existing").ipv4.address == IPv4Address("10.0.0.1")
+    assert config.get_peer("a").ipv4.address == IPv4Address("10.0.0.3")
+    assert config.get_peer("b").ipv4.address == IPv4Address("10.0.0.2")
+    assert not config.get_peer("b").ipv4.auto
+    assert config.get_peer("b").port.number == 1234
+    assert config.get_peer("d").ipv4.address == IPv4Address("10.0.0.4")
+    assert config.get_peer("d").ipv6.address == IPv6Address("fd00:641:c767:bc00::4")
+    assert config.get_peer("d").site == "home"
+
+
+def test_remove_peer_frees_address(config):
+    config.add_peer("a")
+    config.add_peer("b")
+    config.remove_peer("a")
+    config.add_peer("c")
+    assert config.get_peer("c").ipv4.address == IPv4Address("10.0.0.1")
+
+
+def test_rename_peer(config):
+    config.add_peer("b")
+    config.add_peer("c")
+    config.add_p2p("b", "c", "b.example.com", "c.example.com")
+    public_key = config.get_peer("b").public_key
+
+    config.rename_peer("b", "d")
+
+    assert not config.has_peer("b")
+    assert config.get_peer("d").public_key == public_key
+    assert config.get_peer_by_public_key(public_key).name == "d"
+    p2p = config.point_to_point[0]
+    assert (p2p.peer1_name, p2p.peer2_name) == ("c", "d")
+    assert (p2p.peer1_endpoint, p2p.peer2_endpoint) == (
+        "c.example.com",
+        "b.example.com",
+    )
+
+    with pytest.raises(DuplicatePeerError):
+        config.rename_peer("c", "d")
+
+
+def test_lookup_after_load(config):
+    config.add_peers([{"name": name} for name in "abc"])
+    loaded = MainConfig.deserialize(config.serialize())
+    for peer in config.peers:
+        assert loaded.get_peer(peer.name).public_key == peer.public_key
+        assert loaded.get_peer_by_public_key(peer.public_key).name == peer.name
+    with pytest.raises(UnknownPeerError):
+        loaded.get_peer("d")
+
+
+def test_compact_roundtrip(config):
+    config.add_peer("a", IPv4Address("10.0.0.5"), IPv6Address("fd00:641:c767:bc00::5"))
+    peer = config.get_peer("a")
+    assert not hasattr(peer, "__dict__")
+    assert peer.ipv4.value == int(IPv4Address("10.0.0.5"))
+    assert len(peer.public_key_bytes) == 32
+
+    data = config.serialize()
+    assert data["peers"][0]["ipv4"]["address"] == "10.0.0.5"
+    assert data["peers"][0]["ipv6"]["address"] == "fd00:641:c767:bc00::5"
+    assert MainConfig.deserialize(data).serialize() == data
+
+    with pytest.raises(UnknownPeerError):
+        config.get_peer_by_public_key("not a key")
+    with pytest.raises(ValueError):
+        data["peers"][0]["public_key"] = "c2hvcnQ="
+        MainConfig.deserialize(data)
+
+
+def test_create_uses_keygen_module(monkeypatch):
+    private_key, public_key = keygen.generate_keypair()
+    monkeypatch.setattr(keygen, "generate_keypair", lambda: (private_key, public_key))
+    peer = PeerConfig.create("a")
+    assert (peer.private_key, peer.public_key) == (private_key, public_key)
+
+
+@pytest.mark.parametrize("name", ["", "../escaped", "a/b", "a\\b", ".hidden"])
+def test_invalid_names(config, name):
+    with pytest.raises(InvalidPeerNameError):
+        config.add_peer(name)
+    assert isinstance(config.add_peers([{"name": name}])[0][1], ValueError)
+    config.add_peer("a")
+    with pytest.raises(InvalidPeerNameError):
+        config.rename_peer("a", name)
+    assert [peer.name for peer in config.peers] == ["a"]
+
+
+@pytest.mark.parametrize("content", ["", "peers:\n", "hosts: []\n", "- a\n", "[\n"])
+def test_add_many_invalid_input(config, tmp_path, content):
+    path = tmp_path / "wgmgr.yml"
+    config.save(path)
+    source = tmp_path / "peers.yml"
+    source.write_text(content)
+    result = CliRunner().invoke(app, ["peer", "add-many", str(source), "-c", str(path)])
+    if content.strip() in ("", "peers:"):
+        # no peers to add
+        assert result.exit_code == 0
+    else:
+        assert result.exit_code == 1
+        assert "invalid input" in result.output
+    assert not MainConfig.load(path).peers
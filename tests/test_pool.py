@@ -0,0 +1,53 @@
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
+
+import pytest
+
+from wgmgr.error import FreeAddressError
+from wgmgr.pool import AddressPool
+
+
+def test_host_range():
+    pool = AddressPool(IPv4Network("10.0.0.0/30"))
+    assert list(pool.free_addresses()) == list(IPv4Network("10.0.0.0/30").hosts())
+
+    pool = AddressPool(IPv6Network("fd00::/126"))
+    assert list(pool.free_addresses()) == list(IPv6Network("fd00::/126").hosts())
+
+
+def test_allocate_release():
+    pool = AddressPool(IPv4Network("10.0.0.0/29"))
+    assert pool.allocate_next() == IPv4Address("10.0.0.1")
+    assert pool.allocate_next() == IPv4Address("10.0.0.2")
+    pool.allocate(IPv4Address("10.0.0.4"))
+    assert pool.allocate_next() == IPv4Address("10.0.0.3")
+    assert pool.allocate_next() == IPv4Address("10.0.0.5")
+
+    pool.release(IPv4Address("10.0.0.2"))
+    assert pool.is_free(IPv4Address("10.0.0.2"))
+    assert pool.allocate_next() == IPv4Address("10.0.0.2")
+
+    assert pool.allocate_next() == IPv4Address("10.0.0.6")
+    with pytest.raises(FreeAddressError):
+        pool.allocate_next()
+
+
+def test_shared_address():
+    pool = AddressPool(IPv4Network("10.0.0.0/29"))
+    pool.allocate(IPv4Address("10.0.0.1"))
+    pool.allocate(IPv4Address("10.0.0.1"))
+    pool.release(IPv4Address("10.0.0.1"))
+    assert not pool.is_free(IPv4Address("10.0.0.1"))
+    pool.release(IPv4Address("10.0.0.1"))
+    assert pool.is_free(IPv4Address("10.0.0.1"))
+
+
+def test_reserved():
+    pool = AddressPool(
+        IPv6Network("fd00::/64"),
+        [IPv6Network("fd00::/120"), IPv6Network("fd00::1:0/128")],
+    )
+    assert pool.next_free() == IPv6Address("fd00::100")
+    pool.allocate(IPv6Address("fd00::1"))
+    pool.release(IPv6Address("fd00::1"))
+    assert not pool.is_free(IPv6Address("fd00::1"))
+    assert pool.next_free(IPv6Address("fd00::1:0")) == IPv6Address("fd00::1:1")
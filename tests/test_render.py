@@ -0,0 +1,101 @@
+import stat
+
+import pytest
+from typer.testing import CliRunner
+
+from wgmgr import MainConfig
+from wgmgr.cli import app
+from wgmgr.error import InvalidPeerNameError
+
+
+@pytest.fixture
+def mesh(config):
+    config.add_peers([{"name": name} for name in ["a", "b", "c", "d1", "d2"]])
+    config.add_p2p("a", "b", "a.example.com", "b.example.com")
+    config.add_p2p("b", "c")
+    config.add_p2p("c", "d1")
+    return config
+
+
+def test_select_peers(mesh):
+    assert mesh.select_peers() == ["a", "b", "c", "d1", "d2"]
+    assert mesh.select_peers(["d*", "a"]) == ["a", "d1", "d2"]
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_write_peer_configs(mesh, tmp_path, processes):
+    result = mesh.write_peer_configs(tmp_path, jobs=2, processes=processes)
+    assert sorted(path.name for path in result.written) == [
+        "a.conf",
+        "b.conf",
+        "c.conf",
+        "d1.conf",
+        "d2.conf",
+    ]
+    for path in result.written:
+        assert stat.S_IMODE(path.stat().st_mode) == 0o600
+        name = path.name[: -len(".conf")]
+        assert path.read_text() == mesh.generate_peer_config(name, "wg-quick")
+
+
+def test_incremental(mesh, tmp_path):
+    result = mesh.write_peer_configs(tmp_path)
+    assert sorted(result.changed) == ["a", "b", "c", "d1", "d2"]
+
+    result = mesh.write_peer_configs(tmp_path)
+    assert result.changed == []
+    assert sorted(result.unchanged) == ["a", "b", "c", "d1", "d2"]
+
+    mesh.regenerate_keys_for_peer("a")
+    mesh.add_p2p("d1", "d2")
+    result = mesh.write_peer_configs(tmp_path)
+    assert sorted(result.changed) == ["a", "b", "d1", "d2"]
+
+    mesh.remove_peer("d2")
+    result = mesh.write_peer_configs(tmp_path)
+    assert result.changed == ["d1"]
+    assert result.removed == ["d2"]
+    assert not (tmp_path / "d2.conf").exists()
+
+    (tmp_path / "c.conf").unlink()
+    result = mesh.write_peer_configs(tmp_path, ["b", "c"])
+    assert result.changed == ["c"]
+
+    result = mesh.write_peer_configs(tmp_path, force=True)
+    assert sorted(result.changed) == ["a", "b", "c", "d1"]
+
+
+def test_cli_removes_stale_configs(mesh, tmp_path):
+    path = tmp_path / "wgmgr.yml"
+    mesh.save(path)
+    output_dir = tmp_path / "out"
+    args = ["peer", "generate-config", "--all", "-o", str(output_dir), "-c", str(path)]
+    runner = CliRunner()
+    assert runner.invoke(app, args).exit_code == 0
+    assert (output_dir / "c.conf").exists()
+
+    assert runner.invoke(app, ["peer", "remove", "c", "-c", str(path)]).exit_code == 0
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert "1 removed" in result.output
+    assert not (output_dir / "c.conf").exists()
+
+    # with --match only the matching configs are considered
+    mesh.save(path)
+    assert runner.invoke(app, args).exit_code == 0
+    mesh.remove_peer("a")
+    mesh.save(path)
+    result = runner.invoke(app, [*args[:2], "-m", "b", *args[3:]])
+    assert "0 removed" in result.output
+    assert (output_dir / "a.conf").exists()
+
+
+def test_names_outside_output_dir(mesh, tmp_path):
+    # configs written before peer names were checked
+    data = mesh.serialize()
+    data["peers"][-1]["name"] = "../escaped"  # d2, which has no links
+    config = MainConfig.deserialize(data)
+    output_dir = tmp_path / "out"
+    with pytest.raises(InvalidPeerNameError):
+        config.write_peer_configs(output_dir)
+    assert not (tmp_path / "escaped.conf").exists()
@@ -0,0 +1,89 @@
+from ipaddress import IPv4Address, IPv4Network, IPv6Network
+
+import pytest
+from typer.testing import CliRunner
+
+from wgmgr.cli import app
+from wgmgr.error import FreeAddressError, NotReservedError
+
+
+@pytest.fixture
+def peers(config):
+    config.add_peers([{"name": name} for name in "abc"])
+    config.add_peer("manual", IPv4Address("10.0.0.17"))
+    config.add_peer("inside", IPv4Address("10.1.0.2"))
+    config.remove_peer("b")
+    return config
+
+
+def test_renumber(peers):
+    renumbering = peers.plan_renumbering(IPv4Network("10.1.0.0/24"))
+    assert renumbering.mapping() == {
+        "a": ("10.0.0.1", "10.1.0.1"),
+        "c": ("10.0.0.3", "10.1.0.3"),
+        "manual": ("10.0.0.17", "10.1.0.4"),
+    }
+    assert renumbering.report()[0] == "a: 10.0.0.1 -> 10.1.0.1"
+    assert peers.get_peer("a").ipv4.address == IPv4Address("10.0.0.1")
+
+    peers.apply_renumbering(renumbering)
+    assert peers.ipv4_network == IPv4Network("10.1.0.0/24")
+    assert peers.get_peer("manual").ipv4.auto
+    assert not peers.get_peer("inside").ipv4.auto
+    assert peers.get_next_ipv4() == IPv4Address("10.1.0.5")
+
+
+def test_renumber_keep_offsets(peers):
+    peers.reserve_network(IPv4Network("10.1.0.3/32"))
+    renumbering = peers.set_ipv4_network(IPv4Network("10.1.0.0/24"), keep_offsets=True)
+    assert renumbering.mapping() == {
+        "a": ("10.0.0.1", "10.1.0.1"),
+        "c": ("10.0.0.3", "10.1.0.4"),
+        "manual": ("10.0.0.17", "10.1.0.17"),
+    }
+    assert peers.get_next_ipv4() == IPv4Address("10.1.0.5")
+
+
+def test_renumber_ipv6(config):
+    config.ipv6_network = None
+    config.ipv6_pool = None
+    config.add_peers([{"name": name} for name in "ab"])
+    renumbering = config.set_ipv6_network(IPv6Network("fd00::/64"))
+    assert renumbering.mapping() == {"a": (None, "fd00::1"), "b": (None, "fd00::2")}
+
+
+def test_renumber_too_small(peers):
+    with pytest.raises(FreeAddressError):
+        peers.plan_renumbering(IPv4Network("10.1.0.0/30"))
+    assert peers.ipv4_network == IPv4Network("10.0.0.0/24")
+
+
+def test_unreserve(config):
+    config.reserve_network(IPv4Network("10.0.0.8/32"))
+    with pytest.raises(NotReservedError):
+        config.unreserve_network(IPv4Network("10.0.0.9/32"))
+    config.unreserve_network(IPv4Network("10.0.0.8/32"))
+    assert config.reserved_ipv4 == []
+
+
+@pytest.mark.parametrize(
+    "args, message",
+    [
+        (["--unreserve", "10.0.0.9/32"], "network is not reserved: 10.0.0.9/32\n"),
+        (["--reserve", "10.0.0.300/32"], "does not appear to be an IPv4 or IPv6"),
+        (["--ipv4", "bogus"], "bogus"),
+    ],
+)
+def test_set_invalid(config, tmp_path, args, message):
+    path = tmp_path / "wgmgr.yml"
+    config.reserve_network(IPv4Network("10.0.0.8/32"))
+    config.save(path)
+    before = path.read_bytes()
+    # the valid reservation change must not be applied either
+    result = CliRunner().invoke(
+        app, ["set", "--unreserve", "10.0.0.8/32", *args, "-c", str(path)]
+    )
+    assert result.exit_code == 1
+    assert message in result.output
+    assert result.exception is None or isinstance(result.exception, SystemExit)
+    assert path.read_bytes() == before
@@ -0,0 +1,118 @@
+from ipaddress import ip_network
+
+import pytest
+
+from wgmgr import MainConfig
+from wgmgr.error import DuplicateSiteError, UnknownSiteError
+
+
+def links(config):
+    return sorted(
+        (p2p.peer1_name, p2p.peer2_name, p2p.auto) for p2p in config.point_to_point
+    )
+
+
+@pytest.fixture
+def sites(config):
+    config.add_peers([{"name": name} for name in ["hub1", "hub2", "hub3"]])
+    config.add_site(
+        "berlin",
+        ["hub1", "hub2"],
+        [ip_network("192.168.1.0/24")],
+        {"hub1": "berlin.example.com"},
+    )
+    config.add_site("paris", ["hub3"], [ip_network("192.168.2.0/24")])
+    config.add_peers(
+        [
+            {"name": "a", "site": "berlin"},
+            {"name": "b", "site": "berlin"},
+            {"name": "c", "site": "paris"},
+        ]
+    )
+    config.apply_topology()
+    return config
+
+
+def test_apply_topology(sites):
+    assert links(sites) == [
+        ("a", "hub1", True),
+        ("a", "hub2", True),
+        ("b", "hub1", True),
+        ("b", "hub2", True),
+        ("c", "hub3", True),
+        ("hub1", "hub2", True),
+        ("hub1", "hub3", True),
+        ("hub2", "hub3", True),
+    ]
+    assert sites.get_p2p("a", "hub1").peer2_endpoint == "berlin.example.com"
+    assert sites.apply_topology() == ([], [])
+
+    sites.add_p2p("a", "b")
+    sites.set_peer_site("b", None)
+    added, removed = sites.apply_topology()
+    assert added == []
+    assert [(p2p.peer1_name, p2p.peer2_name) for p2p in removed] == [
+        ("b", "hub1"),
+        ("b", "hub2"),
+    ]
+    assert sites.has_p2p("a", "b")
+
+
+def test_routing(sites):
+    config = sites.generate_peer_config("a", "wg-quick")
+    assert "AllowedIPs = 10.0.0.1, fd00:641:c767:bc00::1, 192.168.1.0/24, " in config
+    assert "192.168.2.0/24" in config
+    assert "AllowedIPs = 10.0.0.2, fd00:641:c767:bc00::2\n" in config
+
+    assert [str(network) for network in sites.get_routed_networks("hub1", "hub3")] == [
+        "192.168.2.0/24"
+    ]
+    assert sites.get_routed_networks("hub3", "hub2") == []
+    assert sites.get_routed_networks("hub1", "a") == []
+
+    # the other spokes of the hub are reached through it unless connected directly
+    assert [str(network) for network in sites.get_routed_networks("a", "hub1")] == [
+        "192.168.1.0/24",
+        "192.168.2.0/24",
+        "10.0.0.5/32",
+        "fd00:641:c767:bc00::5/128",
+    ]
+    assert sites.get_routed_networks("a", "hub2") == []
+    sites.add_p2p("a", "b")
+    assert len(sites.get_routed_networks("a", "hub1")) == 2
+
+    before = sites.peer_input_hash("c")
+    sites.set_site_subnets("paris", [ip_network("192.168.3.0/24")])
+    assert sites.peer_input_hash("c") != before
+
+
+def test_hub_changes(sites):
+    sites.rename_peer("hub1", "gateway")
+    assert sites.get_site("berlin").hubs == ["gateway", "hub2"]
+    assert sites.get_site("berlin").endpoints == {"gateway": "berlin.example.com"}
+    assert sites.apply_topology() == ([], [])
+
+    sites.remove_peer("hub2")
+    assert sites.get_site("berlin").hubs == ["gateway"]
+
+    sites.remove_site("paris")
+    sites.apply_topology()
+    assert links(sites) == [("a", "gateway", True), ("b", "gateway", True)]
+    assert sites.get_peer("c").site is None
+
+
+def test_errors(sites):
+    with pytest.raises(DuplicateSiteError):
+        sites.add_site("berlin")
+    with pytest.raises(UnknownSiteError):
+        sites.add_peer("d", site="london")
+    errors = sites.add_peers([{"name": "d", "site": "london"}])
+    assert isinstance(errors[0][1], UnknownSiteError)
+
+
+def test_sites_after_load(sites):
+    loaded = MainConfig.deserialize(sites.serialize())
+    assert loaded.serialize() == sites.serialize()
+    assert loaded.get_site("berlin").endpoints == {"hub1": "berlin.example.com"}
+    assert loaded.is_hub("hub2")
+    assert loaded.apply_topology() == ([], [])
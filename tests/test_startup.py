@@ -0,0 +1,7 @@
+from benchmarks.startup import DEFERRED, import_times
+
+
+def test_deferred_imports():
+    imported = import_times("wgmgr.cli")
+    assert "wgmgr.cli" in imported
+    assert [module for module in DEFERRED if module in imported] == []
@@ -0,0 +1,98 @@
+import marshal
+import pickle
+import stat
+import subprocess
+
+import pytest
+
+from wgmgr import MainConfig, keygen, storage
+
+
+@pytest.fixture
+def populated(config):
+    config.add_peers([{"name": name} for name in "abc"])
+    config.add_p2p("a", "b", "a.example.com")
+    return config
+
+
+@pytest.mark.parametrize("suffix", [".yml", ".json", ".wgmgr"])
+def test_roundtrip(populated, tmp_path, suffix):
+    path = tmp_path / f"wgmgr{suffix}"
+    populated.save(path)
+    assert MainConfig.load(path).serialize() == populated.serialize()
+
+
+def test_guess_format(tmp_path):
+    assert storage.guess_format(tmp_path / "wgmgr.yml") == storage.StorageFormat.yaml
+    assert storage.guess_format(tmp_path / "wgmgr.json") == storage.StorageFormat.json
+    assert (
+        storage.guess_format(tmp_path / "wgmgr.wgmgr") == storage.StorageFormat.binary
+    )
+
+
+def test_snapshot_cache(populated, tmp_path, monkeypatch):
+    path = tmp_path / "wgmgr.yml"
+    populated.save(path)
+    MainConfig.load(path, cache=True)
+    assert storage.get_cache_path(path).exists()
+
+    def fail(self, raw):
+        raise AssertionError("YAML parsed despite valid cache")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(storage.YamlStorage, "loads", fail)
+        assert MainConfig.load(path, cache=True).serialize() == populated.serialize()
+
+    populated.remove_peer("c")
+    path.write_bytes(storage.YamlStorage().dumps(populated.serialize()))
+    assert MainConfig.load(path, cache=True).serialize() == populated.serialize()
+
+
+def test_save_skips_unchanged(populated, tmp_path):
+    path = tmp_path / "wgmgr.yml"
+    assert populated.save(path)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    inode = path.stat().st_ino
+
+    assert not MainConfig.load(path).save(path)
+    assert path.stat().st_ino == inode
+
+    populated.remove_peer("c")
+    assert populated.save(path)
+    assert path.stat().st_ino != inode
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    assert [entry.name for entry in tmp_path.iterdir()] == ["wgmgr.yml"]
+
+
+def test_load_generates_no_keys(populated, tmp_path, monkeypatch):
+    path = tmp_path / "wgmgr.yml"
+    populated.save(path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("key generated or subprocess started during load")
+
+    monkeypatch.setattr(keygen, "_backend", keygen.KeygenBackend.wg)
+    monkeypatch.setattr(subprocess, "Popen", fail)
+    for name in ["generate_private_key", "generate_psk", "generate_keypair"]:
+        monkeypatch.setattr(keygen, name, fail)
+    assert MainConfig.load(path).serialize() == populated.serialize()
+
+
+def test_binary_format(populated, tmp_path):
+    path = tmp_path / "wgmgr.wgmgr"
+    populated.save(path)
+    assert path.read_bytes().startswith(storage.BINARY_MAGIC)
+
+    binary = storage.BinaryStorage()
+    data = populated.serialize()
+    legacy = storage.LEGACY_BINARY_MAGIC + marshal.dumps(data, 4)
+    assert binary.loads(legacy) == data
+    with pytest.raises(ValueError, match="older wgmgr"):
+        binary.loads(storage.LEGACY_BINARY_MAGIC + b"\xff")
+
+    class Evil:
+        def __reduce__(self):
+            return (print, ("pwned",))
+
+    with pytest.raises(pickle.UnpicklingError):
+        binary.loads(storage.BINARY_MAGIC + pickle.dumps(Evil(), 4))
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+from typer.testing import CliRunner
+
+from wgmgr import MainConfig, trace
+from wgmgr.cli import app
+
+
+@pytest.fixture
+def tracing():
+    enabled = trace.get_enabled()
+    trace.reset()
+    trace.set_enabled(True)
+    yield
+    trace.set_enabled(enabled)
+    trace.reset()
+
+
+def test_disabled():
+    enabled = trace.get_enabled()
+    trace.set_enabled(False)
+    trace.reset()
+    try:
+        with trace.span("outer"):
+            pass
+        assert trace.events() == []
+    finally:
+        trace.set_enabled(enabled)
+
+
+def test_nested_spans(tracing):
+    @trace.traced("inner")
+    def inner():
+        return 42
+
+    with trace.span("outer"):
+        assert inner() == 42
+        assert inner() == 42
+
+    events = trace.events()
+    assert [event["span"] for event in events] == ["inner", "inner", "outer"]
+    assert [event["depth"] for event in events] == [1, 1, 0]
+    assert events[2]["duration"] >= events[0]["duration"] + events[1]["duration"]
+
+    lines = trace.report_table().splitlines()
+    assert lines[0].split() == ["phase", "calls", "total", "self", "mean"]
+    assert lines[1].split()[:2] == ["outer", "1"]
+    assert lines[2].split()[:2] == ["inner", "2"]
+
+
+def test_phases(config, tmp_path, tracing):
+    path = tmp_path / "wgmgr.yml"
+    config.add_peers([{"name": name} for name in "abc"])
+    config.add_p2p("a", "b")
+    config.save(path)
+    MainConfig.load(path).generate_peer_config("a", "wg-quick")
+
+    phases = {event["span"] for event in trace.events()}
+    assert {
+        "allocate.next",
+        "keygen.keypairs",
+        "keygen.psk",
+        "save",
+        "storage.write",
+        "load",
+        "storage.parse",
+        "deserialize",
+        "render.peer_config",
+    } <= phases
+
+
+def test_cli_profile(config, tmp_path):
+    path = tmp_path / "wgmgr.yml"
+    config.save(path)
+    enabled = trace.get_enabled()
+    try:
+        result = CliRunner().invoke(
+            app,
+            [
+                "--profile",
+                "--profile-format",
+                "json",
+                "--profile-dump",
+                str(tmp_path / "profile"),
+                "peer",
+                "add",
+                "a",
+                "-c",
+                str(path),
+            ],
+        )
+    finally:
+        trace.set_enabled(enabled)
+    assert result.exit_code == 0
+    events = [json.loads(line) for line in result.output.splitlines()]
+    assert {"load", "save"} <= {event["span"] for event in events}
+    assert (tmp_path / "profile").exists()
+
+
+def test_cli_profile_options(config, tmp_path):
+    path = tmp_path / "wgmgr.yml"
+    config.save(path)
+    enabled = trace.get_enabled()
+    try:
+        result = CliRunner().invoke(app, ["--profile", "peer", "list", "-c", str(path)])
+        assert result.exit_code == 0
+        assert "load" in result.output
+
+        result = CliRunner().invoke(
+            app, ["--profile-format", "jsn", "peer", "list", "-c", str(path)]
+        )
+        assert result.exit_code == 2
+    finally:
+        trace.set_enabled(enabled)
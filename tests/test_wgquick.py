@@ -0,0 +1,120 @@
+from pathlib import Path
+
+import pytest
+
+from wgmgr import MainConfig
+
+KEYS = {
+    name: (f"{name * 42}A=", f"{name.upper() * 42}E=") for name in ["a", "b", "c", "d"]
+}
+PSKS = {names: f"{names * 21}A=" for names in ["ab", "ac"]}
+
+EXPECTED = {
+    "a": """[Interface]
+Address = 10.0.0.1, fd00::1
+ListenPort = 51820
+PrivateKey = aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaA=
+
+[Peer]
+PublicKey = BBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBE=
+PresharedKey = abababababababababababababababababababababA=
+AllowedIPs = 10.0.0.2
+Endpoint = b.example.com:51821
+
+[Peer]
+PublicKey = CCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCCE=
+PresharedKey = acacacacacacacacacacacacacacacacacacacacacA=
+AllowedIPs = fd00::3
+""",
+    "b": """[Interface]
+Address = 10.0.0.2
+ListenPort = 51821
+PrivateKey = bbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbbA=
+
+[Peer]
+PublicKey = AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAE=
+PresharedKey = abababababababababababababababababababababA=
+AllowedIPs = 10.0.0.1, fd00::1
+Endpoint = a.example.com:51820
+""",
+    "c": """[Interface]
+Address = fd00::3
+ListenPort = 51820
+PrivateKey = ccccccccccccccccccccccccccccccccccccccccccA=
+
+[Peer]
+PublicKey = AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAE=
+PresharedKey = acacacacacacacacacacacacacacacacacacacacacA=
+AllowedIPs = 10.0.0.1, fd00::1
+""",
+    "d": """[Interface]
+ListenPort = 51820
+PrivateKey = ddddddddddddddddddddddddddddddddddddddddddA=
+""",
+}
+
+
+def address(value):
+    return {"address": value, "auto": True} if value else None
+
+
+@pytest.fixture
+def golden_config():
+    def peer(name, ipv4, ipv6, port=51820):
+        return {
+            "name": name,
+            "private_key": KEYS[name][0],
+            "public_key": KEYS[name][1],
+            "ipv4": address(ipv4),
+            "ipv6": address(ipv6),
+            "port": {"number": port, "auto": port == 51820},
+        }
+
+    return MainConfig.deserialize(
+        {
+            "version": 1,
+            "ipv4_network": "10.0.0.0/24",
+            "ipv6_network": "fd00::/64",
+            "default_port": 51820,
+            "peers": [
+                peer("a", "10.0.0.1", "fd00::1"),
+                peer("b", "10.0.0.2", None, 51821),
+                peer("c", None, "fd00::3"),
+                peer("d", None, None),
+            ],
+            "point_to_point": [
+                {
+                    "peer1": {"name": "a", "endpoint": "a.example.com"},
+                    "peer2": {"name": "b", "endpoint": "b.example.com"},
+                    "preshared_key": PSKS["ab"],
+                },
+                {
+                    "peer1": {"name": "a", "endpoint": None},
+                    "peer2": {"name": "c", "endpoint": None},
+                    "preshared_key": PSKS["ac"],
+                },
+            ],
+            "sites": [],
+        }
+    )
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_native(golden_config, name):
+    assert golden_config.generate_peer_config(name, "wg-quick") == EXPECTED[name]
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_template(golden_config, name):
+    assert (
+        golden_config.generate_peer_config(name, "wg-quick", "wg-quick.conf.j2")
+        == EXPECTED[name]
+    )
+
+
+def test_custom_template(golden_config, tmp_path: Path):
+    template = tmp_path / "custom.j2"
+    template.write_text(
+        "{{ peer_name }}: {% for link in peer.links %}{{ link.name }} {% endfor %}"
+    )
+    assert golden_config.generate_peer_config("a", "wg-quick", template) == "a: b c "
@@ -1,30 +1,63 @@
 from __future__ import annotations
 
 import logging
-import os
 from ipaddress import IPv4Network, IPv6Network
 from pathlib import Path
-from typing import cast
+from typing import TYPE_CHECKING, Any, cast
 
-import yaml
+from wgmgr import storage
+from wgmgr.base import CURRENT_CONFIG_VERSION, MainConfigBase
+from wgmgr.storage import StorageFormat
+from wgmgr.trace import traced
 
-import wgmgr.operations.config as ops_config
-import wgmgr.operations.p2p as ops_p2p
-import wgmgr.operations.peer as ops_peer
-from wgmgr import keygen
-from wgmgr.base import MainConfigBase
+if TYPE_CHECKING:
+    import wgmgr.operations.config as ops_config
+    import wgmgr.operations.keys as ops_keys
+    import wgmgr.operations.p2p as ops_p2p
+    import wgmgr.operations.peer as ops_peer
+    import wgmgr.operations.render as ops_render
+    import wgmgr.operations.site as ops_site
+else:
+    from wgmgr.operations import LazyOperations
+
+    ops_config = LazyOperations("wgmgr.operations.config")
+    ops_keys = LazyOperations("wgmgr.operations.keys")
+    ops_p2p = LazyOperations("wgmgr.operations.p2p")
+    ops_peer = LazyOperations("wgmgr.operations.peer")
+    ops_render = LazyOperations("wgmgr.operations.render")
+    ops_site = LazyOperations("wgmgr.operations.site")
 
 LOGGER = logging.getLogger(__name__)
 
 
 class MainConfig(MainConfigBase):
     add_peer = ops_peer.add_peer
+    add_peers = ops_peer.add_peers
     remove_peer = ops_peer.remove_peer
+    rename_peer = ops_peer.rename_peer
     set_default_port = ops_config.set_default_port
     set_ipv4_network = ops_config.set_ipv4_network
     set_ipv6_network = ops_config.set_ipv6_network
+    plan_renumbering = ops_config.plan_renumbering
+    apply_renumbering = ops_config.apply_renumbering
+    reserve_network = ops_config.reserve_network
+    unreserve_network = ops_config.unreserve_network
     generate_peer_config = ops_peer.generate_peer_config
+    peer_input_hash = ops_render.peer_input_hash
+    select_peers = ops_render.select_peers
+    write_peer_configs = ops_render.write_peer_configs
     add_p2p = ops_p2p.add_p2p
+    add_p2p_mesh = ops_p2p.add_p2p_mesh
+    remove_p2p = ops_p2p.remove_p2p
+    add_site = ops_site.add_site
+    remove_site = ops_site.remove_site
+    set_site_hubs = ops_site.set_site_hubs
+    set_site_subnets = ops_site.set_site_subnets
+    set_peer_site = ops_site.set_peer_site
+    derive_topology = ops_site.derive_topology
+    apply_topology = ops_site.apply_topology
+    select_key_rotation = ops_keys.select_key_rotation
+    rotate_keys = ops_keys.rotate_keys
 
     def __init__(
         self,
@@ -35,32 +68,44 @@ class MainConfig(MainConfigBase):
         super().__init__(default_port, ipv4_network, ipv6_network)
 
     def regenerate_all_keys(self):
-        for peer in self.peers:
-            self.regenerate_keys_for_peer(peer.name)
+        self.rotate_keys([peer.name for peer in self.peers])
 
     def regenerate_keys_for_peer(self, name: str):
-        peer = self.get_peer(name)
-
-        peer.private_key = keygen.generate_private_key()
-        peer.public_key = keygen.generate_public_key(peer.private_key)
+        self.rotate_keys([name])
 
-        for p2p in self.point_to_point:
-            if p2p.peer1_name == name:
-                p2p.preshared_key = keygen.generate_psk()
-            elif p2p.peer2_name == name:
-                p2p.preshared_key = keygen.generate_psk()
+    @traced("save")
+    def save(
+        self,
+        path: Path,
+        storage_format: StorageFormat | None = None,
+        cache: bool | None = None,
+        journal: bool | None = None,
+    ) -> bool:
+        data = self.serialize()
+        stored = getattr(self, "_stored", None)
+        base = stored[1] if stored and stored[0] == path.resolve() else None
+        written = storage.dump_data(data, path, storage_format, cache, base, journal)
+        self._stored = (path.resolve(), data)
+        return written
 
-    def save(self, path: Path):
-        with os.fdopen(
-            os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode=0o600), "w"
-        ) as fptr:
-            yaml.dump(self.serialize(), fptr, yaml.CDumper)
+    @staticmethod
+    def deserialize(data: dict[str, Any]) -> MainConfig:
+        obj = cast(MainConfig, MainConfigBase.deserialize(data))
+        obj.__class__ = MainConfig
+        return obj
 
     @staticmethod
-    def load(path: Path) -> MainConfig:
-        with os.fdopen(os.open(path, os.O_RDONLY, mode=0o600), "r") as fptr:
-            obj = cast(
-                MainConfig, MainConfigBase.deserialize(yaml.load(fptr, yaml.CLoader))
-            )
-            obj.__class__ = MainConfig
-            return obj
+    @traced("load")
+    def load(
+        path: Path,
+        storage_format: StorageFormat | None = None,
+        cache: bool | None = None,
+    ) -> MainConfig:
+        data = storage.load_data(path, storage_format, cache)
+        # deserialize may migrate the data in place, which must not end up in
+        # the base the next journaled save is compared to
+        current = int(data["version"]) == CURRENT_CONFIG_VERSION
+        config = MainConfig.deserialize(data)
+        if current:
+            config._stored = (path.resolve(), data)
+        return config
@@ -4,11 +4,19 @@ from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
 from logging import getLogger
 from typing import Any
 
-from wgmgr.error import ConfigVersionError, FreeAddressError, UnknownPeerError
+from wgmgr.error import (
+    ConfigVersionError,
+    FreeAddressError,
+    UnknownPeerError,
+    UnknownSiteError,
+)
+from wgmgr.keygen import decode_key
 from wgmgr.migrations import load_migration
 from wgmgr.p2p import PointToPointConfig
 from wgmgr.peer import PeerConfig
+from wgmgr.pool import AddressPool, NetworkType
 from wgmgr.site import Site
+from wgmgr.trace import traced
 
 CURRENT_CONFIG_VERSION = 1
 
@@ -30,8 +38,18 @@ class MainConfigBase:
         self.peers: list[PeerConfig] = []
         self.point_to_point: list[PointToPointConfig] = []
         self.sites: list[Site] = []
+        self.reserved_ipv4: list[IPv4Network] = []
+        self.reserved_ipv6: list[IPv6Network] = []
+        self.ipv4_pool: AddressPool[IPv4Address] | None = None
+        self.ipv6_pool: AddressPool[IPv6Address] | None = None
+        self._peers_by_name: dict[str, PeerConfig] = {}
+        self._peers_by_public_key: dict[bytes, PeerConfig] = {}
+        self._adjacency: dict[str, dict[str, PointToPointConfig]] = {}
+        self._sites_by_name: dict[str, Site] = {}
+        self.reindex()
 
     @staticmethod
+    @traced("migrate")
     def migrate(data: dict[str, Any]) -> dict[str, Any]:
         while int(data["version"]) < CURRENT_CONFIG_VERSION:
             LOGGER.info(
@@ -42,11 +60,155 @@ class MainConfigBase:
             data = load_migration(data["version"])(data)
         return data
 
-    def get_peer(self, name: str) -> PeerConfig:
+    @traced("reindex")
+    def reindex(self):
+        self.ipv4_pool = self.build_ipv4_pool()
+        self.ipv6_pool = self.build_ipv6_pool()
+        self._peers_by_name = {}
+        self._peers_by_public_key = {}
+        self._adjacency = {}
+        self._sites_by_name = {site.name: site for site in self.sites}
         for peer in self.peers:
-            if peer.name == name:
-                return peer
-        raise UnknownPeerError(name)
+            self._index_peer(peer)
+        for p2p in self.point_to_point:
+            self._index_p2p(p2p)
+
+    def build_ipv4_pool(self) -> AddressPool[IPv4Address] | None:
+        if not self.ipv4_network:
+            return None
+        return AddressPool(self.ipv4_network, self.reserved_ipv4)
+
+    def build_ipv6_pool(self) -> AddressPool[IPv6Address] | None:
+        if not self.ipv6_network:
+            return None
+        return AddressPool(self.ipv6_network, self.reserved_ipv6)
+
+    def _index_peer(self, peer: PeerConfig):
+        self._peers_by_name[peer.name] = peer
+        self._peers_by_public_key[peer.public_key_bytes] = peer
+        if peer.ipv4 and self.ipv4_pool:
+            self.ipv4_pool.allocate(peer.ipv4.value)
+        if peer.ipv6 and self.ipv6_pool:
+            self.ipv6_pool.allocate(peer.ipv6.value)
+
+    def _unindex_peer(self, peer: PeerConfig):
+        del self._peers_by_name[peer.name]
+        self._peers_by_public_key.pop(peer.public_key_bytes, None)
+        if peer.ipv4 and self.ipv4_pool:
+            self.ipv4_pool.release(peer.ipv4.value)
+        if peer.ipv6 and self.ipv6_pool:
+            self.ipv6_pool.release(peer.ipv6.value)
+
+    def _index_p2p(self, p2p: PointToPointConfig):
+        self._adjacency.setdefault(p2p.peer1_name, {})[p2p.peer2_name] = p2p
+        self._adjacency.setdefault(p2p.peer2_name, {})[p2p.peer1_name] = p2p
+
+    def _unindex_p2p(self, p2p: PointToPointConfig):
+        for name, other_name in (
+            (p2p.peer1_name, p2p.peer2_name),
+            (p2p.peer2_name, p2p.peer1_name),
+        ):
+            neighbors = self._adjacency[name]
+            del neighbors[other_name]
+            if not neighbors:
+                del self._adjacency[name]
+
+    def set_peer_keys(
+        self,
+        peer: PeerConfig,
+        private_key: str,
+        public_key: str,
+        created: int | None = None,
+    ):
+        self._peers_by_public_key.pop(peer.public_key_bytes, None)
+        peer.set_keys(private_key, public_key, created)
+        self._peers_by_public_key[peer.public_key_bytes] = peer
+
+    def has_peer(self, name: str) -> bool:
+        return name in self._peers_by_name
+
+    def get_peer(self, name: str) -> PeerConfig:
+        try:
+            return self._peers_by_name[name]
+        except KeyError:
+            raise UnknownPeerError(name) from None
+
+    def get_peer_by_public_key(self, public_key: str) -> PeerConfig:
+        try:
+            return self._peers_by_public_key[decode_key(public_key)]
+        except (KeyError, ValueError):
+            raise UnknownPeerError(public_key) from None
+
+    def has_p2p(self, name1: str, name2: str) -> bool:
+        return name2 in self._adjacency.get(name1, {})
+
+    def get_p2p(self, name1: str, name2: str) -> PointToPointConfig:
+        try:
+            return self._adjacency[name1][name2]
+        except KeyError:
+            raise ValueError(f"No P2P connection between {name1} and {name2}") from None
+
+    def get_p2ps(self, name: str) -> list[PointToPointConfig]:
+        return list(self._adjacency.get(name, {}).values())
+
+    def get_neighbors(self, name: str) -> list[str]:
+        return list(self._adjacency.get(name, {}))
+
+    def has_site(self, name: str) -> bool:
+        return name in self._sites_by_name
+
+    def get_site(self, name: str) -> Site:
+        try:
+            return self._sites_by_name[name]
+        except KeyError:
+            raise UnknownSiteError(name) from None
+
+    def is_hub(self, name: str) -> bool:
+        site = self.get_peer(name).site
+        return (site is not None) and (name in self.get_site(site).hubs)
+
+    def get_routed_networks(self, name: str, other_name: str) -> list[NetworkType]:
+        """
+        Networks that the peer name routes through its connection to other_name in
+        addition to the addresses of other_name, as derived from the sites: spokes
+        route the subnets of all sites and the tunnel addresses of the other peers
+        connected to the primary hub of their site through that hub, and hubs route
+        the subnets of other sites through their primary hubs. Tunnel addresses of
+        peers in other sites are not routed.
+        """
+        other_site = self.get_peer(other_name).site
+        if other_site is None:
+            return []
+        site = self.get_site(other_site)
+        if (not site.hubs) or (site.hubs[0] != other_name):
+            return []
+
+        if self.get_peer(name).site == site.name:
+            if name in site.hubs:
+                return []
+            result: list[NetworkType] = [
+                subnet for entry in self.sites for subnet in entry.subnets
+            ]
+            # addresses of peers that name is connected to directly must not be
+            # routed through the hub as well, WireGuard allows each only once
+            direct = self._adjacency.get(name, {})
+            for neighbor in self.get_neighbors(other_name):
+                peer = self.get_peer(neighbor)
+                if (
+                    (peer.site != site.name)
+                    or (neighbor == name)
+                    or (neighbor in direct)
+                ):
+                    continue
+                if peer.ipv4:
+                    result.append(IPv4Network(peer.ipv4.address))
+                if peer.ipv6:
+                    result.append(IPv6Network(peer.ipv6.address))
+            return result
+
+        if self.is_hub(name):
+            return list(site.subnets)
+        return []
 
     def get_used_ipv4_addresses(self) -> list[IPv4Address]:
         result: list[IPv4Address] = []
@@ -62,26 +224,22 @@ class MainConfigBase:
                 result.append(peer.ipv6.address)
         return result
 
+    @traced("allocate.ipv4")
     def get_next_ipv4(self) -> IPv4Address | None:
-        if not self.ipv4_network:
+        if not self.ipv4_pool:
             return None
 
-        used = self.get_used_ipv4_addresses()
-        for address in self.ipv4_network.hosts():
-            if address in used:
-                continue
+        if (address := self.ipv4_pool.next_free()) is not None:
             return address
 
         raise FreeAddressError("IPv4")
 
+    @traced("allocate.ipv6")
     def get_next_ipv6(self) -> IPv6Address | None:
-        if not self.ipv6_network:
+        if not self.ipv6_pool:
             return None
 
-        used = self.get_used_ipv6_addresses()
-        for address in self.ipv6_network.hosts():
-            if address in used:
-                continue
+        if (address := self.ipv6_pool.next_free()) is not None:
             return address
 
         raise FreeAddressError("IPv6")
@@ -95,9 +253,12 @@ class MainConfigBase:
             "peers": [peer.serialize() for peer in self.peers],
             "point_to_point": [p2p.serialize() for p2p in self.point_to_point],
             "sites": [site.serialize() for site in self.sites],
+            "reserved_ipv4": [str(network) for network in self.reserved_ipv4],
+            "reserved_ipv6": [str(network) for network in self.reserved_ipv6],
         }
 
     @staticmethod
+    @traced("deserialize")
     def deserialize(data: dict[str, Any]) -> MainConfigBase:
         version = int(data["version"])
         if version > CURRENT_CONFIG_VERSION:
@@ -116,5 +277,12 @@ class MainConfigBase:
             PointToPointConfig.deserialize(entry) for entry in data["point_to_point"]
         ]
         config.sites = [Site.deserialize(entry) for entry in data["sites"]]
+        config.reserved_ipv4 = [
+            IPv4Network(entry) for entry in data.get("reserved_ipv4", [])
+        ]
+        config.reserved_ipv6 = [
+            IPv6Network(entry) for entry in data.get("reserved_ipv6", [])
+        ]
+        config.reindex()
 
         return config
@@ -1,20 +1,94 @@
+import json
 import logging
+import sys
 from ipaddress import IPv4Network, IPv6Network
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
-from typer import Option, Typer, echo
+from typer import Argument, Context, Option, Typer, echo
 
-from wgmgr import MainConfig
-from wgmgr.cli import common, p2p, peer
-
-logging.basicConfig(level=logging.INFO)
+from wgmgr import MainConfig, keygen, storage, trace
+from wgmgr.cli import common, p2p, peer, site
+from wgmgr.error import (
+    BatchError,
+    DaemonError,
+    NotReservedError,
+    UnknownPeerError,
+    WgError,
+)
 
 app = Typer()
 app.add_typer(peer.app, name="peer", help="Manage peers.")
 app.add_typer(
     p2p.app, name="p2p", help="Manage point-to-point connections between peers."
 )
+app.add_typer(site.app, name="site", help="Manage sites and their hubs.")
+
+
+@app.callback()
+def main(
+    ctx: Context,
+    keygen_backend: keygen.KeygenBackend = Option(
+        keygen.get_backend().value,
+        "--keygen",
+        envvar="WGMGR_KEYGEN_BACKEND",
+        help="Generate keys in-process (native) or by calling the wg binary.",
+    ),
+    cache: bool = Option(
+        storage.get_use_cache(),
+        "--cache/--no-cache",
+        help="Keep a snapshot of the parsed config next to it to speed up loading.",
+    ),
+    journal: bool = Option(
+        storage.get_use_journal(),
+        "--journal/--no-journal",
+        help="Append changes to a journal next to the config instead of rewriting it.",
+    ),
+    use_daemon: bool = Option(
+        common.get_use_daemon(),
+        "--daemon/--no-daemon",
+        help="Send supported commands to a running 'wgmgr serve' for the config.",
+    ),
+    profile: bool = Option(
+        trace.get_enabled(),
+        "--profile/--no-profile",
+        help="Print the time spent in each phase to stderr.",
+    ),
+    profile_format: trace.TraceFormat = Option(
+        trace.TraceFormat.table.value,
+        "--profile-format",
+        envvar="WGMGR_TRACE_FORMAT",
+        help="Print the --profile output as a table or as JSON lines.",
+    ),
+    profile_dump: Optional[Path] = Option(
+        None, "--profile-dump", help="Write cProfile statistics to this file."
+    ),
+):
+    logging.basicConfig(level=logging.INFO)
+    keygen.set_backend(keygen_backend)
+    storage.set_use_cache(cache)
+    storage.set_use_journal(journal)
+    common.set_use_daemon(use_daemon)
+
+    trace.set_enabled(profile)
+    if profile:
+        trace.reset()
+        if profile_format == trace.TraceFormat.json:
+            ctx.call_on_close(lambda: echo(trace.report_json(), err=True, nl=False))
+        else:
+            ctx.call_on_close(lambda: echo(trace.report_table(), err=True))
+
+    if profile_dump is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        def dump_profile():
+            profiler.disable()
+            profiler.dump_stats(profile_dump)
+
+        ctx.call_on_close(dump_profile)
 
 
 @app.command()
@@ -49,6 +123,7 @@ def new(
     config = MainConfig(
         default_port, IPv4Network(ipv4_network), IPv6Network(ipv6_network)
     )
+    common.lock_config(config_path)
     config.save(config_path)
 
 
@@ -58,6 +133,24 @@ def set(
     port: Optional[int] = common.OPTION_PORT,
     ipv4_network: Optional[str] = common.OPTION_IPV4_NETWORK,
     ipv6_network: Optional[str] = common.OPTION_IPV6_NETWORK,
+    reserve: Optional[List[str]] = Option(
+        None,
+        "--reserve",
+        help="Exclude an address or network from automatic assignment.",
+    ),
+    unreserve: Optional[List[str]] = Option(
+        None,
+        "--unreserve",
+        help="Make a previously reserved address or network assignable again.",
+    ),
+    keep_offsets: bool = Option(
+        False,
+        "--keep-offsets",
+        help="Move addresses to the same offset in the new network where possible.",
+    ),
+    dry_run: bool = Option(
+        False, "-n", "--dry-run", help="Only print the new addresses, do not save."
+    ),
 ):
     """
     Change global and default settings.
@@ -68,16 +161,357 @@ def set(
 
     If a new port is specified, all peers that do not have a manually assigned port
     will be set to use the new default.
+
+    Reserved addresses and networks (e.g. gateways) are never assigned to peers
+    automatically.
+
+    The new address of every peer that has to move is printed as
+    "name: old -> new" before the config is saved.
     """
+    args: Dict[str, Any] = {
+        "port": port,
+        "ipv4_network": ipv4_network,
+        "ipv6_network": ipv6_network,
+        "reserve": reserve,
+        "unreserve": unreserve,
+        "keep_offsets": keep_offsets,
+        "dry_run": dry_run,
+    }
+    client = common.connect_daemon(config_path)
+    if client is not None:
+        try:
+            report = client.call("set", **args)
+        except DaemonError as e:
+            echo(str(e), err=True)
+            exit(1)
+        finally:
+            client.close()
+        for line in report:
+            echo(line)
+        return
 
-    config = MainConfig.load(config_path)
-    if port is not None:
-        config.set_default_port(port)
-    if ipv4_network is not None:
-        config.set_ipv4_network(IPv4Network(ipv4_network))
-    if ipv6_network is not None:
-        config.set_ipv6_network(IPv6Network(ipv6_network))
+    from wgmgr import dispatch
+
+    config = common.load_for_update(config_path)
+    try:
+        report = dispatch.set_options(config, **args)
+    except (NotReservedError, ValueError) as e:
+        echo(str(e), err=True)
+        exit(1)
+    for line in report:
+        echo(line)
+    if not dry_run:
+        config.save(config_path)
+
+
+@app.command()
+def rotate(
+    config_path: Path = common.OPTION_CONFIG_PATH,
+    older_than: Optional[str] = Option(
+        None,
+        "--older-than",
+        help="Only rotate keys at least this old, e.g. 90d, 12h or 3600 (seconds).",
+    ),
+    all_peers: bool = Option(False, "--all", help="Rotate the keys of all peers."),
+    patterns: Optional[List[str]] = Option(
+        None,
+        "-m",
+        "--match",
+        help="Rotate the keys of peers whose name matches this glob pattern.",
+    ),
+    sites: Optional[List[str]] = Option(
+        None, "-s", "--site", help="Rotate the keys of the peers of this site."
+    ),
+    jobs: Optional[int] = Option(
+        None, "-j", "--jobs", help="Number of concurrent calls of the wg binary."
+    ),
+    dry_run: bool = Option(
+        False, "-n", "--dry-run", help="Only print the selected peers, do not save."
+    ),
+):
+    """
+    Replace the keys of the selected peers and the PSKs of their point-to-point
+    connections.
+
+    Peers are selected with --all, --match and --site, combined with --older-than
+    to only rotate keys of a minimum age. The names of the selected peers are
+    printed, one per line.
+    """
+    if not (all_peers or patterns or sites or older_than):
+        echo("specify --all, --match, --site or --older-than", err=True)
+        exit(1)
+
+    try:
+        age = common.parse_duration(older_than) if older_than else None
+    except ValueError:
+        echo(f"invalid duration: {older_than}", err=True)
+        exit(1)
+
+    config = common.load_for_update(config_path)
+    names = config.select_key_rotation(age, patterns, sites)
+    for name in names:
+        echo(name)
+    if dry_run:
+        return
+
+    result = config.rotate_keys(names, jobs)
     config.save(config_path)
+    echo(
+        f"rotated keys of {len(result.peers)} peers and {len(result.p2ps)} "
+        "point-to-point connections",
+        err=True,
+    )
+
+
+@app.command()
+def apply(
+    name: str = Argument(..., help="Name of the local peer."),
+    config_path: Path = common.OPTION_CONFIG_PATH,
+    interface: str = Option(
+        "wg0", "-i", "--interface", help="WireGuard interface of the local peer."
+    ),
+    dump: Optional[Path] = Option(
+        None,
+        "--dump",
+        help="Read the current state from this output of 'wg show <iface> dump'.",
+    ),
+    syncconf: bool = Option(
+        False, "--syncconf", help="Push the whole state with 'wg syncconf' instead."
+    ),
+    wg_binary: str = Option(
+        "wg", "--wg", envvar="WGMGR_WG", help="Path of the wg binary."
+    ),
+    dry_run: bool = Option(
+        False, "-n", "--dry-run", help="Only print the changes, do not apply them."
+    ),
+):
+    """
+    Bring a running interface in line with the config without restarting it.
+
+    The current state is read with 'wg show <iface> dump' and only the peers that
+    were added, removed or changed are updated with 'wg set', so established
+    tunnels are kept. The changes are printed, one per line.
+    """
+    from wgmgr import interface as wg_interface
+
+    config = MainConfig.load(config_path)
+    try:
+        desired = wg_interface.desired_state(config, name)
+    except UnknownPeerError:
+        echo(f"no such peer: {name}", err=True)
+        exit(1)
+
+    command = wg_interface.WgCommand(interface, wg_binary)
+    try:
+        if dump is not None:
+            current = wg_interface.parse_dump(dump.read_text())
+        else:
+            current = command.dump()
+
+        names = {peer.public_key: peer.name for peer in config.peers}
+        changes = wg_interface.diff(current, desired, names)
+        for line in changes.describe():
+            echo(line)
+        if dry_run or not changes:
+            return
+
+        if syncconf:
+            command.syncconf(desired)
+        else:
+            command.apply(changes)
+    except WgError as e:
+        echo(str(e), err=True)
+        exit(1)
+
+
+@app.command()
+def graph(
+    config_path: Path = common.OPTION_CONFIG_PATH,
+    graph_format: str = Option(
+        "dot", "-f", "--format", help="Output format: dot, graphml or json."
+    ),
+    output: Optional[Path] = Option(
+        None, "-o", "--output", help="Write the graph to this file instead of stdout."
+    ),
+    stats: bool = Option(
+        False, "--stats", help="Print statistics of the topology instead."
+    ),
+    hubs: Optional[List[str]] = Option(
+        None, "--hub", help="With --stats, list the peers unreachable from this peer."
+    ),
+):
+    """
+    Export the point-to-point topology as DOT, GraphML or JSON edge list.
+
+    Nodes are annotated with the site, addresses and endpoints of the peers. With
+    --stats, the connected components, the distribution of the number of
+    connections per peer and the peers unreachable from the given hubs are printed
+    instead.
+    """
+    from wgmgr import graph as wg_graph
+
+    config = MainConfig.load(config_path)
+    if stats:
+        components = wg_graph.components(config)
+        echo(f"peers: {len(config.peers)}")
+        echo(f"connections: {len(config.point_to_point)}")
+        echo(
+            f"components: {len(components)}"
+            + (f" (largest: {len(components[0])})" if components else "")
+        )
+        for degree, count in wg_graph.degree_distribution(config).items():
+            echo(f"degree {degree}: {count}")
+        for hub in hubs or []:
+            try:
+                unreachable = wg_graph.unreachable_from(config, hub)
+            except UnknownPeerError:
+                echo(f"no such peer: {hub}", err=True)
+                exit(1)
+            echo(f"unreachable from {hub}: {', '.join(unreachable) or '-'}")
+        return
+
+    try:
+        graph_type = wg_graph.GraphFormat(graph_format)
+    except ValueError:
+        echo(f"unknown graph format: {graph_format}", err=True)
+        exit(1)
+
+    if output is None:
+        wg_graph.write_graph(config, sys.stdout, graph_type)
+    else:
+        with open(output, "w") as fptr:
+            wg_graph.write_graph(config, fptr, graph_type)
+
+
+@app.command()
+def batch(
+    script: str = Argument(
+        "-", help="File with the operations to apply, - to read from stdin."
+    ),
+    config_path: Path = common.OPTION_CONFIG_PATH,
+    script_format: Optional[common.ScriptFormat] = Option(
+        None,
+        "--format",
+        help="Format of the script, guessed from the file extension by default.",
+    ),
+    dry_run: bool = Option(
+        False, "-n", "--dry-run", help="Apply the operations, but do not save."
+    ),
+):
+    """
+    Apply many operations under one lock and with a single save.
+
+    Each line of a script is an operation followed by its arguments, either
+    positional or as key=value, e.g. "add_peer a ipv4=10.0.0.5" or "add_p2p a b
+    endpoint2=b.example.com". Empty lines and comments starting with # are
+    skipped. A YAML script is a list of mappings with the keys op and args.
+
+    Operations: add_peer, remove_peer, rename_peer, add_p2p, remove_p2p,
+    set_peer_site, apply_topology, rotate_keys, set, generate_config and
+    list_peers.
+
+    The batch is all or nothing: if an operation fails, the error is printed and
+    the config is left unchanged. Results of operations, like generated configs,
+    are printed in order.
+    """
+    if script_format is None:
+        if Path(script).suffix in (".yml", ".yaml"):
+            script_format = common.ScriptFormat.yaml
+        else:
+            script_format = common.ScriptFormat.lines
+
+    text = sys.stdin.read() if script == "-" else Path(script).read_text()
+    try:
+        requests = common.read_script(text, script_format)
+    except ValueError as e:
+        echo(f"invalid script: {e}", err=True)
+        exit(1)
+
+    client = common.connect_daemon(config_path)
+    try:
+        if client is not None:
+            results = client.call("batch", requests=requests, dry_run=dry_run)
+        else:
+            from wgmgr import dispatch
+
+            config = common.load_for_update(config_path)
+            results = dispatch.run_batch(config, requests)
+            if not dry_run:
+                config.save(config_path)
+    except (BatchError, DaemonError) as e:
+        echo(str(e), err=True)
+        exit(1)
+    finally:
+        if client is not None:
+            client.close()
+
+    for result in results:
+        if isinstance(result, str):
+            echo(result, nl=not result.endswith("\n"))
+        elif isinstance(result, list):
+            for line in result:
+                echo(line)
+    echo(f"applied {len(requests)} operations", err=True)
+
+
+@app.command()
+def serve(
+    config_path: Path = common.OPTION_CONFIG_PATH,
+    socket_path: Optional[Path] = Option(
+        None,
+        "--socket",
+        help="Path of the socket, next to the config file by default.",
+    ),
+    flush_interval: float = Option(
+        1.0,
+        "--flush-interval",
+        help="Seconds between writes of pending changes, 0 to only write on request.",
+    ),
+):
+    """
+    Keep the config in memory and serve operations on a Unix domain socket.
+
+    While the daemon runs, the commands peer add, peer remove, p2p add, set and
+    peer generate-config are sent to it instead of loading and saving the config
+    file each time. Pending changes are written periodically, on a "flush"
+    request and when the daemon is stopped with SIGINT or SIGTERM. Other commands
+    changing the config ask the daemon to write its pending changes and wait for
+    them before loading the file.
+    """
+    import signal
+
+    from wgmgr.daemon import Daemon
+
+    def stop(signum: int, frame: object):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    daemon = Daemon(config_path, socket_path, flush_interval)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as e:
+        echo(str(e), err=True)
+        exit(1)
+
+
+@app.command()
+def convert(
+    source: Path = Argument(..., help="Config file to convert."),
+    destination: Path = Argument(..., help="Path of the converted config file."),
+    storage_format: Optional[storage.StorageFormat] = Option(
+        None,
+        "--format",
+        help="Format of the destination, guessed from the file extension by default.",
+    ),
+):
+    """
+    Convert a config file to another storage format (YAML, JSON, binary or a
+    directory with one file per peer and connection).
+    """
+    config = MainConfig.load(source)
+    config.save(destination, storage_format)
 
 
 @app.command()
@@ -87,8 +521,39 @@ def migrate(
     """
     Load config file, migrate it to the newest version and save it.
     """
-    config = MainConfig.load(config_path)
-    config.save(config_path)
+    config = common.load_for_update(config_path)
+    if not config.save(config_path):
+        echo(f"{config_path} is already up to date", err=True)
+
+
+@app.command("journal")
+def show_journal(
+    config_path: Path = common.OPTION_CONFIG_PATH,
+    verbose: bool = Option(
+        False, "-v", "--verbose", help="Print the records as JSON, including keys."
+    ),
+    compact: bool = Option(
+        False, "--compact", help="Fold the journal into the config file."
+    ),
+):
+    """
+    Show the changes recorded in the journal of the config, oldest first.
+
+    With --journal, changes are appended to a journal next to the config file
+    instead of rewriting it, and folded into it once the journal gets large.
+    """
+    from wgmgr import journal
+
+    if compact:
+        config = common.load_for_update(config_path)
+        config.save(config_path, journal=False)
+        return
+
+    for record in journal.read(config_path):
+        if verbose:
+            echo(json.dumps(record))
+        else:
+            echo(journal.format_record(record))
 
 
 if __name__ == "__main__":
@@ -1,9 +1,19 @@
 from __future__ import annotations
 
+import csv
+import os
+from enum import Enum
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, TextIO
 
+from click import get_current_context
 from typer import Option
 
+from wgmgr import MainConfig, storage
+
+if TYPE_CHECKING:
+    from wgmgr.daemon import Client
+
 DEFAULT_CONFIG_PATH = Path("wgmgr.yml")
 
 OPTION_CONFIG_PATH = Option(
@@ -44,3 +54,120 @@ OPTION_IPV6_ADDRESS = Option(
     "--ipv6",
     help="IPv6 address.",
 )
+
+
+class RecordFormat(str, Enum):
+    csv = "csv"
+    yaml = "yaml"
+
+
+def read_records(fptr: TextIO, record_format: RecordFormat) -> list[dict[str, Any]]:
+    """
+    Read peer records for add_peers. YAML input is a list of mappings, optionally
+    under the key peers. Raises ValueError for anything else.
+    """
+    if record_format == RecordFormat.csv:
+        return [dict(row) for row in csv.DictReader(fptr)]
+
+    import yaml
+
+    try:
+        data = yaml.load(fptr, yaml.CSafeLoader) or []
+    except yaml.YAMLError as e:
+        raise ValueError(str(e)) from None
+    if isinstance(data, dict) and ("peers" in data):
+        data = data["peers"] or []
+    if not isinstance(data, list) or not all(isinstance(entry, dict) for entry in data):
+        raise ValueError("YAML input must be a list of mappings, one per peer")
+    return data
+
+
+class ScriptFormat(str, Enum):
+    lines = "lines"
+    yaml = "yaml"
+
+
+def read_script(text: str, script_format: ScriptFormat) -> list[dict[str, Any]]:
+    """
+    Parse a batch script into a list of requests, see wgmgr.dispatch.parse_line.
+    """
+    from wgmgr import dispatch
+
+    if script_format == ScriptFormat.lines:
+        return dispatch.parse_lines(text)
+
+    import yaml
+
+    data = yaml.load(text, yaml.CSafeLoader) or []
+    if not isinstance(data, list) or not all(
+        isinstance(entry, dict) and isinstance(entry.get("op"), str) for entry in data
+    ):
+        raise ValueError("a YAML script must be a list of mappings with op and args")
+    return data
+
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+def parse_duration(value: str) -> float:
+    """
+    Parse a duration such as 90d, 12h or 3600 (seconds) into seconds.
+    """
+    value = value.strip()
+    if value and (value[-1] in DURATION_UNITS):
+        return float(value[:-1]) * DURATION_UNITS[value[-1]]
+    return float(value)
+
+
+_use_daemon = os.environ.get("WGMGR_DAEMON", "1") not in ("", "0")
+
+
+def get_use_daemon() -> bool:
+    return _use_daemon
+
+
+def set_use_daemon(use_daemon: bool):
+    global _use_daemon
+    _use_daemon = use_daemon
+
+
+def connect_daemon(config_path: Path) -> Client | None:
+    """
+    Connection to the daemon serving the config at config_path, None if it is not
+    running or disabled, in which case the config file is used directly.
+    """
+    socket_path = storage.get_socket_path(config_path)
+    if not (_use_daemon and socket_path.exists()):
+        return None
+
+    from wgmgr.daemon import connect
+
+    return connect(socket_path)
+
+
+def lock_config(config_path: Path):
+    """
+    Hold an exclusive lock on the config until the current command has finished.
+    """
+    get_current_context().with_resource(storage.locked(config_path))
+
+
+def load_for_update(config_path: Path) -> MainConfig:
+    """
+    Load the config to modify and save it, locked until the command has finished.
+
+    A daemon serving the config holds the lock while it has unsaved changes, so
+    it is asked to write them first instead of waiting for its next flush.
+    """
+    socket_path = storage.get_socket_path(config_path)
+    if socket_path.exists():
+        from wgmgr.daemon import connect
+
+        client = connect(socket_path)
+        if client is not None:
+            try:
+                client.call("flush")
+            finally:
+                client.close()
+    lock_config(config_path)
+    return MainConfig.load(config_path)
@@ -1,10 +1,11 @@
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 from typer import Argument, Option, Typer, echo
 
 from wgmgr import MainConfig
 from wgmgr.cli import common
+from wgmgr.error import DaemonError
 
 app = Typer()
 
@@ -24,11 +25,81 @@ def add(
     """
     Add a new point-to-point connection.
     """
-    config = MainConfig.load(config_path)
+    client = common.connect_daemon(config_path)
+    if client is not None:
+        try:
+            client.call(
+                "add_p2p",
+                peer1=peer1,
+                peer2=peer2,
+                endpoint1=endpoint1,
+                endpoint2=endpoint2,
+            )
+        except DaemonError as e:
+            echo(str(e), err=True)
+            exit(1)
+        finally:
+            client.close()
+        return
+
+    config = common.load_for_update(config_path)
     config.add_p2p(peer1, peer2, endpoint1, endpoint2)
     config.save(config_path)
 
 
+@app.command()
+def mesh(
+    all_peers: bool = Option(False, "--all", help="Connect all peers."),
+    sites: Optional[List[str]] = Option(
+        None, "-s", "--site", help="Connect the peers of this site."
+    ),
+    patterns: Optional[List[str]] = Option(
+        None,
+        "-m",
+        "--match",
+        help="Connect the peers whose name matches this glob pattern.",
+    ),
+    config_path: Path = common.OPTION_CONFIG_PATH,
+):
+    """
+    Connect every pair of the selected peers that is not connected yet.
+
+    With --site and --match, only the peers of the given sites whose name matches
+    one of the patterns are connected.
+    """
+    if all_peers == bool(sites or patterns):
+        echo("specify either --all or --site/--match", err=True)
+        exit(1)
+
+    config = common.load_for_update(config_path)
+    names = config.select_peers(patterns, sites)
+    p2ps = config.add_p2p_mesh(names)
+    config.save(config_path)
+
+    echo(
+        f"added {len(p2ps)} point-to-point connections between {len(names)} peers",
+        err=True,
+    )
+
+
+@app.command()
+def remove(
+    peer1: str = Argument(..., help="Name of one peer."),
+    peer2: str = Argument(..., help="Name of the other peer."),
+    config_path: Path = common.OPTION_CONFIG_PATH,
+):
+    """
+    Remove a point-to-point connection.
+    """
+    config = common.load_for_update(config_path)
+    try:
+        config.remove_p2p(peer1, peer2)
+    except ValueError as e:
+        echo(str(e), err=True)
+        exit(1)
+    config.save(config_path)
+
+
 @app.command()
 def list(
     config_path: Path = common.OPTION_CONFIG_PATH,
@@ -1,13 +1,21 @@
+import sys
 from ipaddress import IPv4Address, IPv6Address
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 from typer import Argument, Option, Typer, echo
 
 from wgmgr import MainConfig
 from wgmgr.cli import common
-from wgmgr.error import DuplicatePeerError, UnknownPeerError
-from wgmgr.operations.peer import PeerConfigType
+from wgmgr.error import (
+    DaemonError,
+    DuplicatePeerError,
+    InvalidPeerNameError,
+    UnknownPeerError,
+    UnknownSiteError,
+)
+from wgmgr.peer import PeerConfigType, get_config_path
+from wgmgr.util import write_file
 
 app = Typer()
 
@@ -19,24 +27,92 @@ def add(
     port: Optional[int] = common.OPTION_PORT,
     ipv4_address: Optional[str] = common.OPTION_IPV4_ADDRESS,
     ipv6_address: Optional[str] = common.OPTION_IPV6_ADDRESS,
-    site: Optional[str] = None,
+    site: Optional[str] = Option(
+        None, "-s", "--site", help="Site of the peer, connects it to the site's hubs."
+    ),
 ):
     """
     Add a new peer.
     """
-    config = MainConfig.load(config_path)
+    client = common.connect_daemon(config_path)
+    if client is not None:
+        try:
+            client.call(
+                "add_peer",
+                name=name,
+                ipv4=ipv4_address,
+                ipv6=ipv6_address,
+                port=port,
+                site=site,
+            )
+        except DaemonError as e:
+            echo(str(e), err=True)
+        finally:
+            client.close()
+        return
+
+    config = common.load_for_update(config_path)
     try:
         config.add_peer(
             name,
             IPv4Address(ipv4_address) if ipv4_address else None,
             IPv6Address(ipv6_address) if ipv6_address else None,
             port,
+            site,
         )
-    except DuplicatePeerError as e:
+    except (DuplicatePeerError, InvalidPeerNameError, UnknownSiteError) as e:
         echo(str(e), err=True)
 
+    if site:
+        config.apply_topology()
+    config.save(config_path)
+
+
+@app.command()
+def add_many(
+    source: str = Argument(
+        "-", help="CSV or YAML file with the peers to add, - to read from stdin."
+    ),
+    record_format: Optional[common.RecordFormat] = Option(
+        None,
+        "--format",
+        help="Format of the input, guessed from the file extension by default.",
+    ),
+    config_path: Path = common.OPTION_CONFIG_PATH,
+):
+    """
+    Add many peers at once.
+
+    CSV input requires a header line with the columns name, ipv4, ipv6, port and
+    site. YAML input is a list of mappings with the same keys. Only the name is
+    mandatory, missing addresses and ports are assigned automatically.
+    """
+    if record_format is None:
+        if Path(source).suffix in (".yml", ".yaml"):
+            record_format = common.RecordFormat.yaml
+        else:
+            record_format = common.RecordFormat.csv
+
+    try:
+        if source == "-":
+            records = common.read_records(sys.stdin, record_format)
+        else:
+            with open(source, newline="") as fptr:
+                records = common.read_records(fptr, record_format)
+    except ValueError as e:
+        echo(f"invalid input: {e}", err=True)
+        exit(1)
+
+    config = common.load_for_update(config_path)
+    errors = config.add_peers(records)
+    for index, error in errors:
+        echo(f"record {index + 1}: {error}", err=True)
+    if any(record.get("site") for record in records):
+        config.apply_topology()
     config.save(config_path)
 
+    echo(f"added {len(records) - len(errors)} of {len(records)} peers", err=True)
+
 
 @app.command()
 def remove(
@@ -46,7 +122,20 @@ def remove(
     """
     Remove a new peer.
     """
-    config = MainConfig.load(config_path)
+    client = common.connect_daemon(config_path)
+    if client is not None:
+        try:
+            client.call("remove_peer", name=name)
+        except DaemonError as e:
+            if e.kind != "UnknownPeerError":
+                echo(str(e), err=True)
+                exit(1)
+            echo(f"no such peer: {name}", err=True)
+        finally:
+            client.close()
+        return
+
+    config = common.load_for_update(config_path)
     try:
         config.remove_peer(name)
     except UnknownPeerError:
@@ -54,6 +143,27 @@ def remove(
     config.save(config_path)
 
 
+@app.command()
+def rename(
+    name: str = Argument(..., help="Name of the peer."),
+    new_name: str = Argument(..., help="New name of the peer."),
+    config_path: Path = common.OPTION_CONFIG_PATH,
+):
+    """
+    Rename a peer, including all its point-to-point connections.
+    """
+    config = common.load_for_update(config_path)
+    try:
+        config.rename_peer(name, new_name)
+    except UnknownPeerError:
+        echo(f"no such peer: {name}", err=True)
+        exit(1)
+    except (DuplicatePeerError, InvalidPeerNameError) as e:
+        echo(str(e), err=True)
+        exit(1)
+    config.save(config_path)
+
+
 @app.command()
 def list(
     config_path: Path = common.OPTION_CONFIG_PATH,
@@ -72,12 +182,97 @@ def list(
 
 @app.command()
 def generate_config(
-    name: str = Argument(..., help="Name of the peer."),
+    name: Optional[str] = Argument(None, help="Name of the peer."),
     config_type: PeerConfigType = PeerConfigType.wg_quick,
     config_path: Path = common.OPTION_CONFIG_PATH,
+    template: Optional[Path] = Option(
+        None, "-t", "--template", help="Render with this Jinja template instead."
+    ),
+    all_peers: bool = Option(False, "--all", help="Generate configs for all peers."),
+    patterns: Optional[List[str]] = Option(
+        None,
+        "-m",
+        "--match",
+        help="Generate configs for peers whose name matches this glob pattern.",
+    ),
+    output_dir: Optional[Path] = Option(
+        None, "-o", "--output-dir", help="Write one <name>.conf per peer here."
+    ),
+    jobs: Optional[int] = Option(
+        None, "-j", "--jobs", help="Number of parallel workers."
+    ),
+    processes: bool = Option(
+        False, "--processes", help="Render in worker processes instead of threads."
+    ),
+    force: bool = Option(
+        False, "-f", "--force", help="Render all configs, even if unchanged."
+    ),
 ):
     """
     Generate config file for a peer.
+
+    With --all or --match, the configs of several peers are rendered in parallel
+    and written to files with mode 0600 in the output directory. A manifest in the
+    output directory keeps track of the inputs of each config, so only configs
+    that changed are rendered again. The names of the changed and removed peers
+    are printed, one per line.
     """
+    if (name is None) == (not (all_peers or patterns)):
+        echo("specify either a peer name or --all/--match", err=True)
+        exit(1)
+
+    if name is not None:
+        client = common.connect_daemon(config_path)
+        try:
+            if client is not None:
+                content = client.call(
+                    "generate_config",
+                    name=name,
+                    config_type=config_type.value,
+                    template=str(template.resolve()) if template else None,
+                )
+            else:
+                config = MainConfig.load(config_path)
+                content = config.generate_peer_config(name, config_type, template)
+        except (UnknownPeerError, DaemonError) as e:
+            if isinstance(e, DaemonError) and (e.kind != "UnknownPeerError"):
+                echo(str(e), err=True)
+            else:
+                echo(f"no such peer: {name}", err=True)
+            exit(1)
+        finally:
+            if client is not None:
+                client.close()
+
+        if output_dir is None:
+            echo(content, nl=False)
+        else:
+            output_dir.mkdir(parents=True, exist_ok=True)
+            write_file(get_config_path(output_dir, name), content)
+        return
+
+    if output_dir is None:
+        echo("--output-dir is required with --all/--match", err=True)
+        exit(1)
+
     config = MainConfig.load(config_path)
-    echo(config.generate_peer_config(name, config_type))
+    result = config.write_peer_configs(
+        output_dir,
+        # with all peers selected, configs of removed peers are deleted
+        None if all_peers else config.select_peers(patterns),
+        config_type,
+        jobs,
+        processes,
+        force,
+        template,
+    )
+    for changed in result.changed:
+        echo(changed)
+    for removed in result.removed:
+        echo(removed)
+    echo(
+        f"wrote {len(result.written)} configs in {result.elapsed:.3f}s "
+        f"({result.throughput:.0f} configs/s), {len(result.unchanged)} unchanged, "
+        f"{len(result.removed)} removed",
+        err=True,
+    )
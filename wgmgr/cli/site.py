@@ -0,0 +1,162 @@
+from ipaddress import ip_network
+from pathlib import Path
+from typing import List, Optional
+
+from typer import Argument, Option, Typer, echo
+
+from wgmgr import MainConfig
+from wgmgr.cli import common
+from wgmgr.error import DuplicateSiteError, UnknownPeerError, UnknownSiteError
+
+app = Typer()
+
+OPTION_HUB = Option(
+    None,
+    "--hub",
+    help="Hub of the site as NAME or NAME=ENDPOINT, the first one is the primary hub.",
+)
+
+OPTION_SUBNET = Option(
+    None, "--subnet", help="Network routed through the primary hub of the site."
+)
+
+
+def parse_hubs(hubs: List[str]) -> tuple[List[str], dict[str, str]]:
+    names: List[str] = []
+    endpoints: dict[str, str] = {}
+    for hub in hubs:
+        name, _, endpoint = hub.partition("=")
+        names.append(name)
+        if endpoint:
+            endpoints[name] = endpoint
+    return names, endpoints
+
+
+def apply_topology(config: MainConfig):
+    added, removed = config.apply_topology()
+    if added or removed:
+        echo(
+            f"added {len(added)} and removed {len(removed)} point-to-point "
+            "connections",
+            err=True,
+        )
+
+
+@app.command()
+def add(
+    name: str = Argument(..., help="Name of the site."),
+    hubs: Optional[List[str]] = OPTION_HUB,
+    subnets: Optional[List[str]] = OPTION_SUBNET,
+    config_path: Path = common.OPTION_CONFIG_PATH,
+):
+    """
+    Add a new site and connect its hubs.
+    """
+    config = common.load_for_update(config_path)
+    hub_names, endpoints = parse_hubs(hubs or [])
+    try:
+        config.add_site(
+            name,
+            hub_names,
+            [ip_network(subnet) for subnet in subnets or []],
+            endpoints,
+        )
+    except (DuplicateSiteError, UnknownPeerError) as e:
+        echo(str(e), err=True)
+        exit(1)
+    apply_topology(config)
+    config.save(config_path)
+
+
+@app.command()
+def set(
+    name: str = Argument(..., help="Name of the site."),
+    hubs: Optional[List[str]] = OPTION_HUB,
+    subnets: Optional[List[str]] = OPTION_SUBNET,
+    config_path: Path = common.OPTION_CONFIG_PATH,
+):
+    """
+    Replace the hubs and/or subnets of a site and update its connections.
+    """
+    config = common.load_for_update(config_path)
+    try:
+        if hubs is not None:
+            config.set_site_hubs(name, *parse_hubs(hubs))
+        if subnets is not None:
+            config.set_site_subnets(name, [ip_network(subnet) for subnet in subnets])
+    except (UnknownSiteError, UnknownPeerError) as e:
+        echo(str(e), err=True)
+        exit(1)
+    apply_topology(config)
+    config.save(config_path)
+
+
+@app.command()
+def remove(
+    name: str = Argument(..., help="Name of the site."),
+    config_path: Path = common.OPTION_CONFIG_PATH,
+):
+    """
+    Remove a site and the connections derived from it. Its peers are kept.
+    """
+    config = common.load_for_update(config_path)
+    try:
+        config.remove_site(name)
+    except UnknownSiteError as e:
+        echo(str(e), err=True)
+        exit(1)
+    apply_topology(config)
+    config.save(config_path)
+
+
+@app.command()
+def assign(
+    peer: str = Argument(..., help="Name of the peer."),
+    site: Optional[str] = Argument(
+        None, help="Name of the site, leave out to remove the peer from its site."
+    ),
+    config_path: Path = common.OPTION_CONFIG_PATH,
+):
+    """
+    Move a peer to a site and update its connections.
+    """
+    config = common.load_for_update(config_path)
+    try:
+        config.set_peer_site(peer, site)
+    except (UnknownSiteError, UnknownPeerError) as e:
+        echo(str(e), err=True)
+        exit(1)
+    apply_topology(config)
+    config.save(config_path)
+
+
+@app.command()
+def apply(
+    config_path: Path = common.OPTION_CONFIG_PATH,
+):
+    """
+    Add and remove the point-to-point connections derived from the sites.
+
+    Every spoke (a member of a site that is not a hub) is connected to all hubs
+    of its site and all hubs are connected to each other. Manually added
+    connections are left alone.
+    """
+    config = common.load_for_update(config_path)
+    apply_topology(config)
+    config.save(config_path)
+
+
+@app.command()
+def list(
+    config_path: Path = common.OPTION_CONFIG_PATH,
+    verbose: bool = Option(False, "-v", "--verbose"),
+):
+    """
+    List sites.
+    """
+    config = MainConfig.load(config_path)
+    for site in config.sites:
+        if verbose:
+            echo(site.serialize())
+        else:
+            echo(site.name)
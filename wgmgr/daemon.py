@@ -0,0 +1,270 @@
+"""
+A long-running process that keeps a config in memory and serves operations from
+wgmgr.dispatch over a Unix domain socket.
+
+The protocol is one JSON object per line in both directions. A request names an
+operation and its keyword arguments, e.g. {"op": "add_peer", "args": {"name":
+"a"}}, and is answered with {"result": ...} or {"error": "...", "type": "..."}.
+Besides the dispatch operations, "batch" runs a list of requests (the argument
+requests) atomically, "flush" writes pending changes to disk and "ping" checks
+that the daemon is alive.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import socket
+import threading
+from pathlib import Path
+from typing import Any
+
+from wgmgr import MainConfig, dispatch, storage
+from wgmgr.error import BatchError, DaemonError
+from wgmgr.storage import StorageFormat
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _stat(path: Path) -> tuple[int, int, int] | None:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _file_state(path: Path) -> tuple[Any, ...]:
+    paths = [path, storage.get_journal_path(path)]
+    if path.is_dir():
+        from wgmgr import directory
+
+        # files are replaced on save, which changes the directory holding them
+        paths += [path / directory.TOP_LEVEL]
+        paths += [path / subdir for subdir, _ in directory.SHARDS.values()]
+    return tuple(_stat(path) for path in paths)
+
+
+class Daemon:
+    """
+    Holds the config loaded from config_path and applies operations to it one at
+    a time. Changes are written every flush_interval seconds (only on request and
+    at shutdown if 0).
+
+    While there are unsaved changes, the daemon holds the lock on the config (see
+    storage.locked), so commands modifying the file directly wait until the
+    changes are written instead of being overwritten by them. If the file was
+    changed by another process, it is loaded again before the next operation.
+    """
+
+    def __init__(
+        self,
+        config_path: Path,
+        socket_path: Path | None = None,
+        flush_interval: float = 1.0,
+        storage_format: StorageFormat | None = None,
+    ):
+        self.config_path = config_path
+        self.socket_path = socket_path or storage.get_socket_path(config_path)
+        self.flush_interval = flush_interval
+        self.storage_format = storage_format
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.config = MainConfig.load(config_path, storage_format)
+        self._file_state = _file_state(config_path)
+        self._file_lock: contextlib.ExitStack | None = None
+        self._stopped = threading.Event()
+        self._server: Any = None
+
+    def _reload_if_changed(self):
+        state = _file_state(self.config_path)
+        if state == self._file_state:
+            return
+        if self.dirty:
+            # only possible if the other process ignored the lock
+            LOGGER.warning(
+                "%s was changed by another process, pending changes overwrite it",
+                self.config_path,
+            )
+            return
+        LOGGER.info("%s was changed by another process, reload", self.config_path)
+        with (
+            contextlib.nullcontext()
+            if self._file_lock
+            else storage.locked(self.config_path)
+        ):
+            self.config = MainConfig.load(self.config_path, self.storage_format)
+            self._file_state = _file_state(self.config_path)
+
+    def _begin_update(self):
+        """
+        Called before changing the config: take the lock on the config file,
+        which is held until the change has been written, and pick up changes
+        made by other processes before it.
+        """
+        if self._file_lock is None:
+            stack = contextlib.ExitStack()
+            stack.enter_context(storage.locked(self.config_path))
+            self._file_lock = stack
+        self._reload_if_changed()
+        self.dirty = True
+
+    def _flush(self):
+        if not self.dirty:
+            return
+        self.config.save(self.config_path, self.storage_format)
+        self._file_state = _file_state(self.config_path)
+        self.dirty = False
+        if self._file_lock is not None:
+            self._file_lock.close()
+            self._file_lock = None
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _batch(self, requests: list[dict[str, Any]], dry_run: bool = False) -> Any:
+        mutating = not dry_run and any(
+            dispatch.get_operation(request["op"]).is_mutating(request.get("args") or {})
+            for request in requests
+        )
+        if mutating:
+            self._begin_update()
+        else:
+            self._reload_if_changed()
+        snapshot = self.config.serialize()
+        try:
+            results = dispatch.run_batch(self.config, requests)
+        except BatchError:
+            self.config = MainConfig.deserialize(snapshot)
+            raise
+
+        if dry_run:
+            self.config = MainConfig.deserialize(snapshot)
+        return results
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        name = request.get("op")
+        with self.lock:
+            try:
+                if name == "ping":
+                    return {"result": None}
+                if name == "flush":
+                    self._flush()
+                    return {"result": None}
+                if name == "batch":
+                    return {"result": self._batch(**(request.get("args") or {}))}
+
+                operation = dispatch.get_operation(str(name))
+                args = request.get("args") or {}
+                # a failing operation may have changed the config partially, so
+                # mutating operations mark it dirty beforehand
+                if operation.is_mutating(args):
+                    self._begin_update()
+                else:
+                    self._reload_if_changed()
+                return {"result": dispatch.dispatch(self.config, str(name), args)}
+            except Exception as e:
+                LOGGER.debug("operation %s failed: %s", name, e)
+                return {"error": str(e), "type": type(e).__name__}
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                LOGGER.error("failed to write %s: %s", self.config_path, e)
+
+    def serve_forever(self):
+        """
+        Serve requests until shutdown() is called or the process is interrupted,
+        then write pending changes and remove the socket.
+        """
+        import socketserver
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        request = json.loads(line)
+                    except ValueError as e:
+                        response = {"error": str(e), "type": type(e).__name__}
+                    else:
+                        response = daemon.handle(request)
+                    self.wfile.write(json.dumps(response).encode() + b"\n")
+
+        if self.socket_path.exists():
+            if (client := connect(self.socket_path)) is not None:
+                client.close()
+                raise RuntimeError(f"a daemon is already serving {self.socket_path}")
+            self.socket_path.unlink()
+
+        self._server = socketserver.ThreadingUnixStreamServer(
+            str(self.socket_path), Handler
+        )
+        self._server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)
+        if self.flush_interval:
+            threading.Thread(target=self._flush_periodically, daemon=True).start()
+
+        LOGGER.info("serving %s on %s", self.config_path, self.socket_path)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stopped.set()
+            self._server.server_close()
+            self.socket_path.unlink(missing_ok=True)
+            self.flush()
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class Client:
+    """
+    Connection to a daemon. call() sends a request and returns the result or
+    raises DaemonError.
+    """
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+
+    def call(self, operation: str, /, **args: Any) -> Any:
+        request = {"op": operation, "args": args}
+        try:
+            self.sock.sendall(json.dumps(request).encode() + b"\n")
+            line = self.reader.readline()
+        except OSError as e:
+            raise DaemonError("ConnectionError", f"connection to daemon failed: {e}")
+        if not line:
+            raise DaemonError("ConnectionError", "daemon closed the connection")
+        try:
+            response = json.loads(line)
+        except ValueError:
+            raise DaemonError("ConnectionError", "invalid response from daemon")
+        if "error" in response:
+            raise DaemonError(response["type"], response["error"])
+        return response["result"]
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+def connect(socket_path: Path) -> Client | None:
+    """
+    Connect to the daemon listening on socket_path, None if there is none.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(socket_path))
+    except OSError:
+        sock.close()
+        return None
+    return Client(sock)
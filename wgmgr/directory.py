@@ -0,0 +1,119 @@
+"""
+Directory layout for configs, with one file per peer and point-to-point
+connection so that edits touch few files and merge well in version control:
+
+    wgmgr.d/
+        config.yml              version, networks, default port, reservations
+                                and sites
+        peers/<name>.yml        one file per peer
+        links/<name1>+<name2>.yml
+                                one file per point-to-point connection
+
+The files hold the entries of the serialized config (see
+MainConfigBase.serialize) as YAML. Peers and connections are loaded in the order
+of their file names.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import quote
+
+from wgmgr.storage import STORAGES, StorageFormat, read_file
+from wgmgr.trace import span
+from wgmgr.util import write_file_atomic
+
+TOP_LEVEL = "config.yml"
+
+
+def escape(name: str) -> str:
+    """
+    File name for a peer name, which may contain any character.
+    """
+    escaped = quote(name, safe="")
+    return f"%2E{escaped[1:]}" if escaped.startswith(".") else escaped
+
+
+SHARDS: dict[str, tuple[str, Callable[[dict[str, Any]], str]]] = {
+    "peers": ("peers", lambda entry: escape(entry["name"])),
+    "point_to_point": (
+        "links",
+        lambda entry: f"{escape(entry['peer1']['name'])}+"
+        f"{escape(entry['peer2']['name'])}",
+    ),
+}
+
+
+def load(path: Path) -> dict[str, Any]:
+    """
+    Read the serialized config stored in the directory at path.
+    """
+    # parsing dominates and holds the GIL, so the files are not read in threads
+    loads = STORAGES[StorageFormat.yaml].loads
+    with span("storage.read"):
+        top_level = read_file(path / TOP_LEVEL)
+        raw = {
+            field: [read_file(file) for file in sorted((path / subdir).glob("*.yml"))]
+            for field, (subdir, _) in SHARDS.items()
+        }
+
+    with span("storage.parse"):
+        data = loads(top_level)
+        for field, contents in raw.items():
+            data[field] = [loads(content) for content in contents]
+    return data
+
+
+def _write_if_changed(path: Path, content: bytes) -> bool:
+    try:
+        if read_file(path) == content:
+            return False
+    except FileNotFoundError:
+        pass
+    write_file_atomic(path, content)
+    return True
+
+
+def dump(data: dict[str, Any], path: Path, base: dict[str, Any] | None = None) -> bool:
+    """
+    Store the serialized config in the directory at path and return whether any
+    file was written or removed.
+
+    If base, the data last loaded from or stored at path, is given, only the
+    entities that differ from it are written. Otherwise every entity is
+    serialized, but only files whose content changed are written. Each file is
+    replaced atomically, the directory as a whole is not.
+    """
+    dumps = STORAGES[StorageFormat.yaml].dumps
+    path.mkdir(exist_ok=True)
+    written = False
+
+    with span("storage.write"):
+        for field, (subdir, get_name) in SHARDS.items():
+            directory = path / subdir
+            directory.mkdir(exist_ok=True)
+            entries = {get_name(entry): entry for entry in data[field]}
+            if base is not None:
+                old = {get_name(entry): entry for entry in base.get(field) or []}
+                for name, entry in entries.items():
+                    if old.get(name) != entry:
+                        write_file_atomic(directory / f"{name}.yml", dumps(entry))
+                        written = True
+                stale = old.keys() - entries.keys()
+            else:
+                for name, entry in entries.items():
+                    written |= _write_if_changed(
+                        directory / f"{name}.yml", dumps(entry)
+                    )
+                stale = {file.stem for file in directory.glob("*.yml")} - (
+                    entries.keys()
+                )
+
+            for name in stale:
+                (directory / f"{name}.yml").unlink(missing_ok=True)
+                written = True
+
+        top_level = {key: value for key, value in data.items() if key not in SHARDS}
+        written |= _write_if_changed(path / TOP_LEVEL, dumps(top_level))
+    return written
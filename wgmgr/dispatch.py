@@ -0,0 +1,269 @@
+"""
+Operations on a config addressed by name and called with JSON-compatible
+keyword arguments, as used by the daemon and the batch command.
+"""
+
+from __future__ import annotations
+
+import inspect
+import shlex
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network, ip_network
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+from wgmgr import MainConfig
+from wgmgr.error import BatchError, NotReservedError, UnknownOperationError
+from wgmgr.peer import PeerConfigType
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Operation:
+    __slots__ = ("func", "mutating")
+
+    def __init__(self, func: Callable[..., Any], mutating: bool):
+        self.func = func
+        self.mutating = mutating
+
+    def is_mutating(self, args: dict[str, Any]) -> bool:
+        """
+        Whether calling the operation with args may change the config, which is
+        not the case for a dry run.
+        """
+        return self.mutating and not args.get("dry_run", False)
+
+
+OPERATIONS: dict[str, Operation] = {}
+
+
+def operation(name: str, mutating: bool = True) -> Callable[[F], F]:
+    def decorator(func: F) -> F:
+        OPERATIONS[name] = Operation(func, mutating)
+        return func
+
+    return decorator
+
+
+def get_operation(name: str) -> Operation:
+    try:
+        return OPERATIONS[name]
+    except KeyError:
+        raise UnknownOperationError(name) from None
+
+
+def dispatch(config: MainConfig, name: str, args: dict[str, Any]) -> Any:
+    """
+    Run the operation name on config. Raises UnknownOperationError for unknown
+    operations and TypeError for invalid arguments.
+    """
+    func = get_operation(name).func
+    try:
+        inspect.signature(func).bind(config, **args)
+    except TypeError as e:
+        raise TypeError(f"{name}: {e}") from None
+    return func(config, **args)
+
+
+@operation("add_peer")
+def add_peer(
+    config: MainConfig,
+    name: str,
+    ipv4: str | None = None,
+    ipv6: str | None = None,
+    port: int | None = None,
+    site: str | None = None,
+):
+    config.add_peer(
+        name,
+        IPv4Address(ipv4) if ipv4 else None,
+        IPv6Address(ipv6) if ipv6 else None,
+        port,
+        site,
+    )
+    if site:
+        config.apply_topology()
+
+
+@operation("remove_peer")
+def remove_peer(config: MainConfig, name: str):
+    config.remove_peer(name)
+
+
+@operation("rename_peer")
+def rename_peer(config: MainConfig, name: str, new_name: str):
+    config.rename_peer(name, new_name)
+
+
+@operation("set_peer_site")
+def set_peer_site(config: MainConfig, name: str, site: str | None = None):
+    config.set_peer_site(name, site)
+
+
+@operation("apply_topology")
+def apply_topology(config: MainConfig) -> list[str]:
+    added, removed = config.apply_topology()
+    return [f"+ {p2p.peer1_name} {p2p.peer2_name}" for p2p in added] + [
+        f"- {p2p.peer1_name} {p2p.peer2_name}" for p2p in removed
+    ]
+
+
+@operation("rotate_keys")
+def rotate_keys(config: MainConfig, names: list[str]):
+    config.rotate_keys(names)
+
+
+@operation("add_p2p")
+def add_p2p(
+    config: MainConfig,
+    peer1: str,
+    peer2: str,
+    endpoint1: str | None = None,
+    endpoint2: str | None = None,
+):
+    config.add_p2p(peer1, peer2, endpoint1, endpoint2)
+
+
+@operation("remove_p2p")
+def remove_p2p(config: MainConfig, peer1: str, peer2: str):
+    config.remove_p2p(peer1, peer2)
+
+
+@operation("set")
+def set_options(
+    config: MainConfig,
+    port: int | None = None,
+    ipv4_network: str | None = None,
+    ipv6_network: str | None = None,
+    reserve: list[str] | None = None,
+    unreserve: list[str] | None = None,
+    keep_offsets: bool = False,
+    dry_run: bool = False,
+) -> list[str]:
+    """
+    Change the global settings like 'wgmgr set'. Returns the renumbering report.
+    With dry_run, the changes are made to a copy and config is left unchanged.
+
+    All arguments are checked before anything is changed. Raises ValueError for
+    invalid networks and NotReservedError when unreserving a network that is not
+    reserved.
+    """
+    unreserved = [ip_network(network) for network in unreserve or []]
+    reserved = [ip_network(network) for network in reserve or []]
+    networks: list[IPv4Network | IPv6Network] = []
+    if ipv4_network is not None:
+        networks.append(IPv4Network(ipv4_network))
+    if ipv6_network is not None:
+        networks.append(IPv6Network(ipv6_network))
+    for network in unreserved:
+        if network not in config.reserved_ipv4 + config.reserved_ipv6:
+            raise NotReservedError(str(network))
+
+    if dry_run:
+        config = MainConfig.deserialize(config.serialize())
+    for network in unreserved:
+        config.unreserve_network(network)
+    for network in reserved:
+        config.reserve_network(network)
+    if port is not None:
+        config.set_default_port(port)
+
+    report: list[str] = []
+    for new_network in networks:
+        renumbering = config.plan_renumbering(new_network, keep_offsets)
+        report.extend(renumbering.report())
+        if not dry_run:
+            config.apply_renumbering(renumbering)
+    return report
+
+
+@operation("generate_config", mutating=False)
+def generate_config(
+    config: MainConfig,
+    name: str,
+    config_type: str = PeerConfigType.wg_quick.value,
+    template: str | None = None,
+) -> str:
+    return config.generate_peer_config(
+        name, PeerConfigType(config_type), Path(template) if template else None
+    )
+
+
+@operation("list_peers", mutating=False)
+def list_peers(config: MainConfig) -> list[str]:
+    return [peer.name for peer in config.peers]
+
+
+def _convert(name: str, annotation: str, value: str) -> Any:
+    if annotation.startswith("int"):
+        return int(value)
+    if annotation == "bool":
+        if value.lower() in ("1", "true", "yes"):
+            return True
+        if value.lower() in ("0", "false", "no"):
+            return False
+        raise ValueError(f"invalid boolean for {name}: {value}")
+    return value
+
+
+def parse_line(line: str) -> dict[str, Any] | None:
+    """
+    Parse a line of a batch script into a request {"op": ..., "args": ...}, None
+    for empty lines and comments.
+
+    A line consists of the name of an operation followed by its arguments, either
+    positional or as key=value, e.g. "add_p2p a b endpoint2=b.example.com".
+    Values are converted according to the annotations of the operation and list
+    arguments are given once per element.
+    """
+    tokens = shlex.split(line, comments=True)
+    if not tokens:
+        return None
+
+    name, *values = tokens
+    parameters = list(inspect.signature(get_operation(name).func).parameters.values())
+    positional = [parameter.name for parameter in parameters[1:]]
+    annotations = {
+        parameter.name: str(parameter.annotation) for parameter in parameters
+    }
+    args: dict[str, Any] = {}
+    for value in values:
+        key, separator, value = value.partition("=")
+        if not separator:
+            key, value = (positional.pop(0) if positional else "", key)
+        elif key in positional:
+            positional.remove(key)
+        if key not in annotations:
+            raise TypeError(f"{name}: unexpected argument {key or value!r}")
+
+        if annotations[key].startswith("list"):
+            args.setdefault(key, []).append(value)
+        else:
+            args[key] = _convert(key, annotations[key], value)
+    return {"op": name, "args": args}
+
+
+def parse_lines(text: str) -> list[dict[str, Any]]:
+    requests: list[dict[str, Any]] = []
+    for number, line in enumerate(text.splitlines(), 1):
+        try:
+            request = parse_line(line)
+        except (TypeError, ValueError, UnknownOperationError) as e:
+            raise ValueError(f"line {number}: {e}") from None
+        if request is not None:
+            requests.append(request)
+    return requests
+
+
+def run_batch(config: MainConfig, requests: list[dict[str, Any]]) -> list[Any]:
+    """
+    Run the requests in order and return their results. Stops at the first
+    failing request with a BatchError, leaving the config partially modified.
+    """
+    results: list[Any] = []
+    for index, request in enumerate(requests):
+        name = str(request.get("op"))
+        try:
+            results.append(dispatch(config, name, request.get("args") or {}))
+        except Exception as e:
+            raise BatchError(index, name, e) from e
+    return results
@@ -3,6 +3,11 @@ class DuplicatePeerError(Exception):
         super().__init__(f"peer already exists: {name}")
 
 
+class InvalidPeerNameError(ValueError):
+    def __init__(self, name: str):
+        super().__init__(f"invalid peer name: {name!r}")
+
+
 class UnknownPeerError(Exception):
     def __init__(self, name: str):
         super().__init__(f"unknown peer: {name}")
@@ -13,11 +18,21 @@ class UnknownSiteError(Exception):
         super().__init__(f"unknown site: {name}")
 
 
+class DuplicateSiteError(Exception):
+    def __init__(self, name: str):
+        super().__init__(f"site already exists: {name}")
+
+
 class FreeAddressError(Exception):
     def __init__(self, protocol: str):
         super().__init__(f"no free {protocol} address")
 
 
+class NotReservedError(Exception):
+    def __init__(self, network: str):
+        super().__init__(f"network is not reserved: {network}")
+
+
 class ConfigVersionError(Exception):
     def __init__(self, version: int, current_version: int):
         super().__init__(
@@ -31,3 +46,35 @@ class MissingMigration(Exception):
         super().__init__(
             f"missing migration for config version {from_version} -> {to_version}"
         )
+
+
+class UnknownOperationError(Exception):
+    def __init__(self, name: str):
+        super().__init__(f"unknown operation: {name}")
+
+
+class WgError(Exception):
+    """
+    A call of the wg binary failed or the binary could not be run.
+    """
+
+    def __init__(self, args: list[str], message: str):
+        super().__init__(f"{' '.join(args)} failed: {message}")
+
+
+class DaemonError(Exception):
+    """
+    An operation failed in the daemon. kind is the name of the exception raised
+    there.
+    """
+
+    def __init__(self, kind: str, message: str):
+        super().__init__(message)
+        self.kind = kind
+
+
+class BatchError(Exception):
+    def __init__(self, index: int, name: str, error: Exception):
+        super().__init__(f"operation {index + 1} ({name}) failed: {error}")
+        self.index = index
+        self.error = error
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import json
+from collections import Counter, deque
+from enum import Enum
+from typing import Any, Iterator, TextIO
+from xml.sax.saxutils import escape, quoteattr
+
+from wgmgr.base import MainConfigBase
+from wgmgr.p2p import PointToPointConfig
+
+NODE_KEYS = ["site", "ipv4", "ipv6", "endpoints"]
+EDGE_KEYS = ["endpoint1", "endpoint2", "auto"]
+
+
+class GraphFormat(str, Enum):
+    dot = "dot"
+    graphml = "graphml"
+    json = "json"
+
+
+class GraphNode:
+    __slots__ = ("name", "site", "ipv4", "ipv6", "endpoints")
+
+    def __init__(
+        self,
+        name: str,
+        site: str | None,
+        ipv4: str | None,
+        ipv6: str | None,
+        endpoints: list[str],
+    ):
+        self.name = name
+        self.site = site
+        self.ipv4 = ipv4
+        self.ipv6 = ipv6
+        self.endpoints = endpoints
+
+    def serialize(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "site": self.site,
+            "ipv4": self.ipv4,
+            "ipv6": self.ipv6,
+            "endpoints": self.endpoints,
+        }
+
+
+def iter_nodes(config: MainConfigBase) -> Iterator[GraphNode]:
+    """
+    The peers of the config with their site, addresses and the endpoints under
+    which other peers reach them.
+    """
+    endpoints: dict[str, set[str]] = {}
+    for p2p in config.point_to_point:
+        if p2p.peer1_endpoint:
+            endpoints.setdefault(p2p.peer1_name, set()).add(p2p.peer1_endpoint)
+        if p2p.peer2_endpoint:
+            endpoints.setdefault(p2p.peer2_name, set()).add(p2p.peer2_endpoint)
+
+    for peer in config.peers:
+        yield GraphNode(
+            peer.name,
+            peer.site,
+            str(peer.ipv4.address) if peer.ipv4 else None,
+            str(peer.ipv6.address) if peer.ipv6 else None,
+            sorted(endpoints.get(peer.name, ())),
+        )
+
+
+def _serialize_edge(p2p: PointToPointConfig) -> dict[str, Any]:
+    return {
+        "peer1": p2p.peer1_name,
+        "peer2": p2p.peer2_name,
+        "endpoint1": p2p.peer1_endpoint,
+        "endpoint2": p2p.peer2_endpoint,
+        "auto": p2p.auto,
+    }
+
+
+def dot_quote(value: Any) -> str:
+    value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return '"' + value.replace("\n", "\\n") + '"'
+
+
+def write_dot(config: MainConfigBase, fptr: TextIO):
+    from wgmgr.templates import get_template
+
+    template = get_template("graph.dot.j2")
+    for chunk in template.generate(
+        config=config,
+        nodes=iter_nodes(config),
+        edges=config.point_to_point,
+        quote=dot_quote,
+    ):
+        fptr.write(chunk)
+    fptr.write("\n")
+
+
+def _graphml_data(key: str, value: Any) -> str:
+    if isinstance(value, bool):
+        value = str(value).lower()
+    elif isinstance(value, list):
+        value = ",".join(value)
+    return f'<data key="{key}">{escape(str(value))}</data>'
+
+
+def write_graphml(config: MainConfigBase, fptr: TextIO):
+    fptr.write(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+    )
+    for key in NODE_KEYS:
+        fptr.write(
+            f'  <key id="{key}" for="node" attr.name="{key}" attr.type="string"/>\n'
+        )
+    for key in EDGE_KEYS:
+        key_type = "boolean" if key == "auto" else "string"
+        fptr.write(
+            f'  <key id="{key}" for="edge" attr.name="{key}" attr.type="{key_type}"/>\n'
+        )
+    fptr.write('  <graph id="network" edgedefault="undirected">\n')
+
+    for node in iter_nodes(config):
+        values = node.serialize()
+        data = "".join(
+            _graphml_data(key, values[key]) for key in NODE_KEYS if values[key]
+        )
+        fptr.write(f"    <node id={quoteattr(node.name)}>{data}</node>\n")
+
+    for p2p in config.point_to_point:
+        values = _serialize_edge(p2p)
+        data = "".join(
+            _graphml_data(key, values[key])
+            for key in EDGE_KEYS
+            if values[key] is not None
+        )
+        fptr.write(
+            f"    <edge source={quoteattr(p2p.peer1_name)} "
+            f"target={quoteattr(p2p.peer2_name)}>{data}</edge>\n"
+        )
+    fptr.write("  </graph>\n</graphml>\n")
+
+
+def write_json(config: MainConfigBase, fptr: TextIO):
+    """
+    Write the nodes and edges as one JSON object, with one node or edge per line.
+    """
+    fptr.write('{"nodes": [')
+    separator = "\n"
+    for node in iter_nodes(config):
+        fptr.write(separator + json.dumps(node.serialize()))
+        separator = ",\n"
+    fptr.write('\n], "edges": [')
+    separator = "\n"
+    for p2p in config.point_to_point:
+        fptr.write(separator + json.dumps(_serialize_edge(p2p)))
+        separator = ",\n"
+    fptr.write("\n]}\n")
+
+
+WRITERS = {
+    GraphFormat.dot: write_dot,
+    GraphFormat.graphml: write_graphml,
+    GraphFormat.json: write_json,
+}
+
+
+def write_graph(config: MainConfigBase, fptr: TextIO, graph_format: GraphFormat):
+    """
+    Write the point-to-point topology of the config to fptr. The output is
+    produced incrementally, one node or edge at a time.
+    """
+    WRITERS[graph_format](config, fptr)
+
+
+def _reachable(config: MainConfigBase, start: str) -> set[str]:
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        for neighbor in config.get_neighbors(queue.popleft()):
+            if neighbor not in seen:
+                seen.add(neighbor)
+                queue.append(neighbor)
+    return seen
+
+
+def components(config: MainConfigBase) -> list[list[str]]:
+    """
+    Connected components of the topology, largest first. Peers without any
+    connection form components of their own.
+    """
+    seen: set[str] = set()
+    result: list[list[str]] = []
+    for peer in config.peers:
+        if peer.name in seen:
+            continue
+        component = _reachable(config, peer.name)
+        seen |= component
+        result.append(sorted(component))
+    result.sort(key=len, reverse=True)
+    return result
+
+
+def degree_distribution(config: MainConfigBase) -> dict[int, int]:
+    """
+    Number of peers by number of connections.
+    """
+    counts = Counter(len(config.get_neighbors(peer.name)) for peer in config.peers)
+    return dict(sorted(counts.items()))
+
+
+def unreachable_from(config: MainConfigBase, name: str) -> list[str]:
+    """
+    Peers that have no path to the peer name over point-to-point connections.
+    """
+    config.get_peer(name)
+    reachable = _reachable(config, name)
+    return [peer.name for peer in config.peers if peer.name not in reachable]
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import logging
+from ipaddress import ip_address, ip_network
+from typing import Any
+
+from wgmgr import wgquick
+from wgmgr.base import MainConfigBase
+from wgmgr.error import WgError
+
+LOGGER = logging.getLogger(__name__)
+
+NONE = "(none)"
+
+
+class PeerState:
+    def __init__(
+        self,
+        public_key: str,
+        preshared_key: str | None = None,
+        endpoint: str | None = None,
+        allowed_ips: list[str] | None = None,
+    ):
+        self.public_key = public_key
+        self.preshared_key = preshared_key
+        self.endpoint = endpoint
+        self.allowed_ips = _normalize_ips(allowed_ips or [])
+
+
+class InterfaceState:
+    """
+    Keys, port and peers of a WireGuard interface, either as reported by
+    'wg show <interface> dump' or as derived from the config by desired_state().
+    """
+
+    def __init__(
+        self,
+        private_key: str | None,
+        listen_port: int | None,
+        peers: list[PeerState] | None = None,
+    ):
+        self.private_key = private_key
+        self.listen_port = listen_port
+        self.peers = {peer.public_key: peer for peer in peers or []}
+
+
+class PeerChange:
+    """
+    Addition, removal or update of a peer. fields holds the new values of the
+    changed attributes, with the keys preshared_key, endpoint and allowed_ips.
+    """
+
+    def __init__(
+        self,
+        action: str,
+        public_key: str,
+        fields: dict[str, Any] | None = None,
+        name: str | None = None,
+    ):
+        self.action = action
+        self.public_key = public_key
+        self.fields = fields or {}
+        self.name = name
+
+    def describe(self) -> str:
+        symbol = {"add": "+", "remove": "-", "update": "~"}[self.action]
+        label = f"{self.public_key} ({self.name})" if self.name else self.public_key
+        details = []
+        for key, value in self.fields.items():
+            if key == "preshared_key":
+                details.append("preshared-key")
+            elif key == "allowed_ips":
+                details.append(f"allowed-ips {','.join(value) or '-'}")
+            else:
+                details.append(f"endpoint {value}")
+        return f"{symbol} peer {label}" + (f": {', '.join(details)}" if details else "")
+
+
+class InterfaceDiff:
+    def __init__(
+        self,
+        private_key: str | None = None,
+        listen_port: int | None = None,
+        peers: list[PeerChange] | None = None,
+    ):
+        self.private_key = private_key
+        self.listen_port = listen_port
+        self.peers = peers or []
+
+    def __bool__(self) -> bool:
+        return bool(
+            (self.private_key is not None)
+            or (self.listen_port is not None)
+            or self.peers
+        )
+
+    def describe(self) -> list[str]:
+        lines: list[str] = []
+        if self.private_key is not None:
+            lines.append("~ interface: private-key")
+        if self.listen_port is not None:
+            lines.append(f"~ interface: listen-port {self.listen_port}")
+        lines.extend(change.describe() for change in self.peers)
+        return lines
+
+
+def _normalize_ips(ips: list[str]) -> list[str]:
+    return sorted(str(ip_network(ip, strict=False)) for ip in ips)
+
+
+def _optional(value: str) -> str | None:
+    return None if value in (NONE, "") else value
+
+
+def parse_dump(text: str) -> InterfaceState:
+    """
+    Parse the output of 'wg show <interface> dump'.
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        raise ValueError("empty wg dump")
+
+    fields = lines[0].split("\t")
+    if len(fields) != 4:
+        raise ValueError(f"invalid interface line in wg dump: {lines[0]!r}")
+    state = InterfaceState(
+        _optional(fields[0]), int(fields[2]) if fields[2] not in ("0", "") else None
+    )
+
+    for line in lines[1:]:
+        fields = line.split("\t")
+        if len(fields) != 8:
+            raise ValueError(f"invalid peer line in wg dump: {line!r}")
+        allowed_ips = _optional(fields[3])
+        peer = PeerState(
+            fields[0],
+            _optional(fields[1]),
+            _optional(fields[2]),
+            allowed_ips.split(",") if allowed_ips else [],
+        )
+        state.peers[peer.public_key] = peer
+    return state
+
+
+def desired_state(config: MainConfigBase, name: str) -> InterfaceState:
+    """
+    State of the interface of the peer name as described by the config.
+    """
+    view = wgquick.build_peer_view(config, name)
+    return InterfaceState(
+        view.private_key,
+        view.port,
+        [
+            PeerState(
+                link.public_key, link.preshared_key, link.endpoint, link.allowed_ips
+            )
+            for link in view.links
+        ],
+    )
+
+
+def _is_literal_endpoint(endpoint: str) -> bool:
+    host = endpoint.rsplit(":", 1)[0].strip("[]")
+    try:
+        ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+def _endpoint_changed(current: str | None, desired: str | None) -> bool:
+    # wg only reports resolved addresses, so an endpoint given as host name is
+    # only set if the peer has no endpoint at all. Peers without a configured
+    # endpoint keep the one they roamed to.
+    if (desired is None) or (current == desired):
+        return False
+    return (current is None) or _is_literal_endpoint(desired)
+
+
+def diff(
+    current: InterfaceState,
+    desired: InterfaceState,
+    names: dict[str, str] | None = None,
+) -> InterfaceDiff:
+    """
+    Minimal set of changes that turns current into desired. names maps public keys
+    to peer names for display.
+    """
+    names = names or {}
+    result = InterfaceDiff()
+    if current.private_key != desired.private_key:
+        result.private_key = desired.private_key
+    if current.listen_port != desired.listen_port:
+        result.listen_port = desired.listen_port
+
+    for public_key in current.peers:
+        if public_key not in desired.peers:
+            result.peers.append(
+                PeerChange("remove", public_key, name=names.get(public_key))
+            )
+
+    for public_key, peer in desired.peers.items():
+        fields: dict[str, Any] = {}
+        existing = current.peers.get(public_key)
+        if (existing is None) or (existing.preshared_key != peer.preshared_key):
+            fields["preshared_key"] = peer.preshared_key
+        if (existing is None) or (existing.allowed_ips != peer.allowed_ips):
+            fields["allowed_ips"] = peer.allowed_ips
+        if _endpoint_changed(existing.endpoint if existing else None, peer.endpoint):
+            fields["endpoint"] = peer.endpoint
+
+        if existing is None:
+            result.peers.append(
+                PeerChange("add", public_key, fields, names.get(public_key))
+            )
+        elif fields:
+            result.peers.append(
+                PeerChange("update", public_key, fields, names.get(public_key))
+            )
+
+    return result
+
+
+def render_wg_config(state: InterfaceState) -> str:
+    """
+    The state in the format of wg(8), as accepted by 'wg syncconf'.
+    """
+    lines = ["[Interface]"]
+    if state.private_key:
+        lines.append(f"PrivateKey = {state.private_key}")
+    if state.listen_port:
+        lines.append(f"ListenPort = {state.listen_port}")
+    for peer in state.peers.values():
+        lines.append("")
+        lines.append("[Peer]")
+        lines.append(f"PublicKey = {peer.public_key}")
+        if peer.preshared_key:
+            lines.append(f"PresharedKey = {peer.preshared_key}")
+        lines.append(f"AllowedIPs = {', '.join(peer.allowed_ips)}")
+        if peer.endpoint:
+            lines.append(f"Endpoint = {peer.endpoint}")
+    lines.append("")
+    return "\n".join(lines)
+
+
+class WgCommand:
+    """
+    Reads and changes the state of an interface by calling the wg binary.
+    Secrets are passed on stdin instead of the command line.
+    """
+
+    def __init__(self, interface: str, binary: str = "wg"):
+        self.interface = interface
+        self.binary = binary
+
+    def run(self, *args: str, input: str | None = None) -> str:
+        import subprocess
+
+        command = [self.binary, *args]
+        LOGGER.debug("run %s", " ".join(command))
+        try:
+            return subprocess.run(
+                command,
+                input=input.encode() if input is not None else None,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                check=True,
+            ).stdout.decode()
+        except subprocess.CalledProcessError as e:
+            message = e.stderr.decode(errors="replace").strip()
+            raise WgError(command, message or f"exit status {e.returncode}") from None
+        except OSError as e:
+            raise WgError(command, str(e)) from None
+
+    def dump(self) -> InterfaceState:
+        return parse_dump(self.run("show", self.interface, "dump"))
+
+    def apply(self, changes: InterfaceDiff):
+        if changes.private_key is not None:
+            self.run(
+                "set",
+                self.interface,
+                "private-key",
+                "/dev/stdin",
+                input=changes.private_key,
+            )
+        if changes.listen_port is not None:
+            self.run("set", self.interface, "listen-port", str(changes.listen_port))
+
+        for change in changes.peers:
+            args = ["set", self.interface, "peer", change.public_key]
+            if change.action == "remove":
+                self.run(*args, "remove")
+                continue
+
+            psk = change.fields.get("preshared_key")
+            if "preshared_key" in change.fields:
+                args += ["preshared-key", "/dev/stdin" if psk else "/dev/null"]
+            if "endpoint" in change.fields:
+                args += ["endpoint", change.fields["endpoint"]]
+            if "allowed_ips" in change.fields:
+                args += ["allowed-ips", ",".join(change.fields["allowed_ips"])]
+            self.run(*args, input=psk)
+
+    def syncconf(self, state: InterfaceState):
+        self.run(
+            "syncconf", self.interface, "/dev/stdin", input=render_wg_config(state)
+        )
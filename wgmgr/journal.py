@@ -0,0 +1,198 @@
+"""
+Append-only journal of changes to a stored config.
+
+In journaled mode (see storage.set_use_journal), saving a config appends the
+differences to the last stored state to a journal next to the snapshot instead
+of rewriting the whole file. Each line of the journal is a JSON record such as
+
+    {"time": 1700000000, "op": "put", "kind": "peer", "key": "a",
+     "fields": ["ipv4"], "value": {...}}
+
+put stores the complete serialized entity (peer, p2p or site) under its key,
+delete removes it and set updates top-level settings such as the networks or
+the default port. Records are idempotent, so replaying a journal on a snapshot
+that already contains some of its changes gives the same result.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from wgmgr.storage import get_journal_path
+from wgmgr.trace import span
+
+LOGGER = logging.getLogger(__name__)
+
+COMPACT_SIZE = 1 << 20
+
+KINDS: dict[str, tuple[str, Callable[[dict[str, Any]], Any]]] = {
+    "peers": ("peer", lambda entry: entry["name"]),
+    "point_to_point": (
+        "p2p",
+        lambda entry: (entry["peer1"]["name"], entry["peer2"]["name"]),
+    ),
+    "sites": ("site", lambda entry: entry["name"]),
+}
+FIELDS = {kind: field for field, (kind, _) in KINDS.items()}
+
+
+def get_size(path: Path) -> int:
+    try:
+        return os.stat(get_journal_path(path)).st_size
+    except FileNotFoundError:
+        return 0
+
+
+def diff(old: dict[str, Any], new: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    Records that turn the serialized config old into new.
+    """
+    records: list[dict[str, Any]] = []
+    now = int(time.time())
+
+    settings = {
+        key: value
+        for key, value in new.items()
+        if key not in KINDS and old.get(key) != value
+    }
+    if settings:
+        records.append(
+            {
+                "time": now,
+                "op": "set",
+                "kind": "settings",
+                "fields": sorted(settings),
+                "value": settings,
+            }
+        )
+
+    for field, (kind, get_key) in KINDS.items():
+        old_entries = {get_key(entry): entry for entry in old.get(field) or []}
+        new_entries = {get_key(entry): entry for entry in new.get(field) or []}
+        for key in old_entries:
+            if key not in new_entries:
+                records.append({"time": now, "op": "delete", "kind": kind, "key": key})
+        for key, entry in new_entries.items():
+            previous = old_entries.get(key)
+            if entry == previous:
+                continue
+            records.append(
+                {
+                    "time": now,
+                    "op": "put",
+                    "kind": kind,
+                    "key": key,
+                    "fields": sorted(
+                        name
+                        for name, value in entry.items()
+                        if previous is None or previous.get(name) != value
+                    ),
+                    "value": entry,
+                }
+            )
+    return records
+
+
+def replay(data: dict[str, Any], records: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Apply records to the serialized config data in place and return it.
+    """
+    indexes: dict[str, dict[Any, int]] = {}
+    for field, (_, get_key) in KINDS.items():
+        data[field] = data.get(field) or []
+        indexes[field] = {
+            get_key(entry): index for index, entry in enumerate(data[field])
+        }
+
+    for record in records:
+        if record["kind"] == "settings":
+            data.update(record["value"])
+            continue
+
+        field = FIELDS[record["kind"]]
+        key = record["key"]
+        if isinstance(key, list):
+            key = tuple(key)
+        entries, index = data[field], indexes[field]
+        if record["op"] == "put":
+            if key in index:
+                entries[index[key]] = record["value"]
+            else:
+                index[key] = len(entries)
+                entries.append(record["value"])
+        elif key in index:
+            entries[index.pop(key)] = None
+
+    for field in KINDS:
+        data[field] = [entry for entry in data[field] if entry is not None]
+    return data
+
+
+def read(path: Path) -> list[dict[str, Any]]:
+    """
+    Records in the journal of the config at path, oldest first. A torn last line
+    left by an interrupted append is ignored.
+    """
+    journal_path = get_journal_path(path)
+    try:
+        with open(journal_path, "rb") as fptr:
+            lines = fptr.read().splitlines()
+    except FileNotFoundError:
+        return []
+
+    records = []
+    for number, line in enumerate(lines, 1):
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            if number < len(lines):
+                raise ValueError(f"{journal_path}:{number}: invalid journal record")
+            LOGGER.warning("ignore incomplete last record in %s", journal_path)
+    return records
+
+
+def append(path: Path, records: list[dict[str, Any]]):
+    journal_path = get_journal_path(path)
+    content = b"".join(
+        json.dumps(record, separators=(",", ":")).encode() + b"\n" for record in records
+    )
+    with span("journal.append"):
+        fd = os.open(journal_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            # cut off an incomplete last record left by an interrupted append,
+            # which read() ignores, so that the new records start on a new line
+            size = os.fstat(fd).st_size
+            if size and os.pread(fd, 1, size - 1) != b"\n":
+                with open(journal_path, "rb") as fptr:
+                    end = fptr.read().rfind(b"\n") + 1
+                LOGGER.warning("drop incomplete last record in %s", journal_path)
+                os.ftruncate(fd, end)
+            os.write(fd, content)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def format_record(record: dict[str, Any]) -> str:
+    """
+    One line describing record, without the stored values as they contain keys.
+    """
+    key = record.get("key")
+    if isinstance(key, list):
+        key = " ".join(key)
+    return " ".join(
+        part
+        for part in (
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["time"])),
+            record["op"],
+            record["kind"],
+            key,
+            ",".join(record.get("fields") or []),
+        )
+        if part
+    )
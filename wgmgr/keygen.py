@@ -1,17 +1,224 @@
-import subprocess
+from __future__ import annotations
 
+import base64
+import binascii
+import logging
+import os
+import sys
+from enum import Enum
+from typing import Callable, TypeVar
 
-def generate_private_key() -> str:
-    return subprocess.check_output(["wg", "genkey"]).decode().strip()
+from wgmgr.trace import traced
 
+try:
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+except ImportError:
+    X25519PrivateKey = None  # type: ignore
+
+LOGGER = logging.getLogger(__name__)
+
+KEY_SIZE = 32
+
+T = TypeVar("T")
+
+_FIELD_PRIME = 2**255 - 19
+_A24 = 121665
+_BASE_POINT = 9
+
+
+class KeygenBackend(str, Enum):
+    native = "native"
+    wg = "wg"
+
+
+def _backend_from_env() -> KeygenBackend:
+    value = os.environ.get("WGMGR_KEYGEN_BACKEND", "native")
+    try:
+        return KeygenBackend(value)
+    except ValueError:
+        LOGGER.warning("invalid WGMGR_KEYGEN_BACKEND %r, use native", value)
+        return KeygenBackend.native
+
+
+_backend = _backend_from_env()
+
+
+def get_backend() -> KeygenBackend:
+    return _backend
+
+
+def set_backend(backend: KeygenBackend | str):
+    global _backend
+    _backend = KeygenBackend(backend)
+
+
+def encode_key(key: bytes) -> str:
+    return base64.b64encode(key).decode()
+
+
+if sys.version_info >= (3, 11):
+
+    def _b64decode(key: str) -> bytes:
+        return binascii.a2b_base64(key, strict_mode=True)
+
+else:
+
+    def _b64decode(key: str) -> bytes:
+        return base64.b64decode(key, validate=True)
+
+
+def decode_key(key: str) -> bytes:
+    data = _b64decode(key)
+    if len(data) != KEY_SIZE:
+        raise ValueError(f"invalid key length: {len(data)}")
+    return data
+
+
+def _clamp(scalar: bytes) -> int:
+    value = bytearray(scalar)
+    value[0] &= 248
+    value[31] &= 127
+    value[31] |= 64
+    return int.from_bytes(value, "little")
+
+
+def _cswap(swap: int, a: int, b: int) -> tuple[int, int]:
+    """
+    Swap a and b if swap is 1 without branching on it (cswap of RFC 7748).
+    """
+    dummy = -swap & (a ^ b)
+    return a ^ dummy, b ^ dummy
+
+
+def x25519(scalar: bytes, point: bytes) -> bytes:
+    """
+    Montgomery ladder for Curve25519 as specified in RFC 7748. The ladder does
+    not branch on bits of the scalar, but Python integers give no timing
+    guarantees, so the cryptography package is used for keys when installed.
+    """
+    k = _clamp(scalar)
+    u = int.from_bytes(point, "little") & ((1 << 255) - 1)
+    p = _FIELD_PRIME
+
+    x1 = u
+    x2, z2 = 1, 0
+    x3, z3 = u, 1
+    swap = 0
+    for t in reversed(range(255)):
+        bit = (k >> t) & 1
+        swap ^= bit
+        x2, x3 = _cswap(swap, x2, x3)
+        z2, z3 = _cswap(swap, z2, z3)
+        swap = bit
+
+        a = (x2 + z2) % p
+        aa = a * a % p
+        b = (x2 - z2) % p
+        bb = b * b % p
+        e = (aa - bb) % p
+        c = (x3 + z3) % p
+        d = (x3 - z3) % p
+        da = d * a % p
+        cb = c * b % p
+        x3 = (da + cb) % p
+        x3 = x3 * x3 % p
+        z3 = (da - cb) % p
+        z3 = x1 * (z3 * z3 % p) % p
+        x2 = aa * bb % p
+        z2 = e * (aa + _A24 * e) % p
+
+    x2, x3 = _cswap(swap, x2, x3)
+    z2, z3 = _cswap(swap, z2, z3)
+
+    return (x2 * pow(z2, p - 2, p) % p).to_bytes(KEY_SIZE, "little")
+
+
+def _native_private_key() -> bytes:
+    return _clamp(os.urandom(KEY_SIZE)).to_bytes(KEY_SIZE, "little")
+
+
+def _native_public_key(private_key: bytes) -> bytes:
+    if X25519PrivateKey is not None:
+        return (
+            X25519PrivateKey.from_private_bytes(private_key)
+            .public_key()
+            .public_bytes(Encoding.Raw, PublicFormat.Raw)
+        )
+    return x25519(private_key, _BASE_POINT.to_bytes(KEY_SIZE, "little"))
+
+
+@traced("keygen.wg")
+def _wg(*args: str, input: str | None = None) -> str:
+    import subprocess
 
-def generate_public_key(private_key: str) -> str:
     return (
-        subprocess.check_output(["wg", "pubkey"], input=private_key.encode())
+        subprocess.check_output(
+            ["wg", *args], input=input.encode() if input is not None else None
+        )
         .decode()
         .strip()
     )
 
 
+@traced("keygen.private_key")
+def generate_private_key() -> str:
+    if _backend == KeygenBackend.wg:
+        return _wg("genkey")
+    return encode_key(_native_private_key())
+
+
+@traced("keygen.public_key")
+def generate_public_key(private_key: str) -> str:
+    if _backend == KeygenBackend.wg:
+        return _wg("pubkey", input=private_key)
+    return encode_key(_native_public_key(decode_key(private_key)))
+
+
+@traced("keygen.psk")
 def generate_psk() -> str:
-    return subprocess.check_output(["wg", "genpsk"]).decode().strip()
+    if _backend == KeygenBackend.wg:
+        return _wg("genpsk")
+    return encode_key(os.urandom(KEY_SIZE))
+
+
+def generate_keypair() -> tuple[str, str]:
+    private_key = generate_private_key()
+    return private_key, generate_public_key(private_key)
+
+
+def _wg_parallel(func: Callable[[], T], count: int, jobs: int | None) -> list[T]:
+    if (count <= 1) or (jobs == 1):
+        return [func() for _ in range(count)]
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(jobs) as executor:
+        return list(executor.map(lambda _: func(), range(count)))
+
+
+@traced("keygen.keypairs")
+def generate_keypairs(count: int, jobs: int | None = None) -> list[tuple[str, str]]:
+    """
+    Generate count key pairs. With the wg backend, up to jobs calls of the wg
+    binary run concurrently.
+    """
+    if _backend == KeygenBackend.wg:
+        return _wg_parallel(generate_keypair, count, jobs)
+
+    result: list[tuple[str, str]] = []
+    for _ in range(count):
+        private_key = _native_private_key()
+        result.append(
+            (encode_key(private_key), encode_key(_native_public_key(private_key)))
+        )
+    return result
+
+
+@traced("keygen.psks")
+def generate_psks(count: int, jobs: int | None = None) -> list[str]:
+    if _backend == KeygenBackend.wg:
+        return _wg_parallel(generate_psk, count, jobs)
+
+    data = os.urandom(KEY_SIZE * count)
+    return [encode_key(data[i : i + KEY_SIZE]) for i in range(0, len(data), KEY_SIZE)]
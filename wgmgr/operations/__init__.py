@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import importlib
+from typing import Any
+
+
+class LazyOperation:
+    """
+    Method of MainConfig that imports the module implementing it on first use and
+    then replaces itself with the actual function.
+    """
+
+    def __init__(self, module: str, name: str):
+        self.module = module
+        self.name = name
+        self.attribute = name
+
+    def __set_name__(self, owner: type, name: str):
+        self.attribute = name
+
+    def __get__(self, obj: Any, owner: type) -> Any:
+        function = getattr(importlib.import_module(self.module), self.name)
+        setattr(owner, self.attribute, function)
+        return function.__get__(obj, owner)
+
+
+class LazyOperations:
+    def __init__(self, module: str):
+        self.module = module
+
+    def __getattr__(self, name: str) -> LazyOperation:
+        return LazyOperation(self.module, name)
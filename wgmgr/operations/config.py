@@ -4,7 +4,11 @@ import logging
 from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
 from typing import cast
 
+from wgmgr import renumber
 from wgmgr.base import MainConfigBase
+from wgmgr.error import NotReservedError
+from wgmgr.pool import AddressPool
+from wgmgr.renumber import Renumbering
 from wgmgr.util import AssignableIPv4, AssignableIPv6
 
 LOGGER = logging.getLogger(__name__)
@@ -22,33 +26,109 @@ def set_default_port(self: MainConfigBase, port: int):
             peer.port.set_auto(port)
 
 
-def set_ipv4_network(self: MainConfigBase, network: IPv4Network):
-    self.ipv4_network = network
-    for peer in self.peers:
-        if peer.ipv4:
-            if peer.ipv4.address in self.ipv4_network:
-                continue
-            if not peer.ipv4.auto:
-                LOGGER.warn(
-                    f"udpating IPv4 address of peer {peer} as it is not "
-                    "included in the new network"
+def plan_renumbering(
+    self: MainConfigBase,
+    network: IPv4Network | IPv6Network,
+    keep_offsets: bool = False,
+) -> Renumbering:
+    """
+    Compute the new addresses of all peers for a change of the IPv4 or IPv6
+    network without changing the config, see wgmgr.renumber.plan.
+    """
+    if isinstance(network, IPv4Network):
+        return renumber.plan(
+            self.peers, network, self.ipv4_network, self.reserved_ipv4, keep_offsets
+        )
+    return renumber.plan(
+        self.peers, network, self.ipv6_network, self.reserved_ipv6, keep_offsets
+    )
+
+
+def apply_renumbering(self: MainConfigBase, renumbering: Renumbering):
+    """
+    Switch to the network of a renumbering computed by plan_renumbering for the
+    current state of the config and assign the new addresses.
+    """
+    network = renumbering.network
+    assignable = AssignableIPv4 if isinstance(network, IPv4Network) else AssignableIPv6
+    attribute = f"ipv{network.version}"
+
+    for entry in renumbering.entries:
+        peer = self.get_peer(entry.name)
+        address = getattr(peer, attribute)
+        if address:
+            if not address.auto:
+                LOGGER.warning(
+                    "updating manual IPv%d address of peer %s as it is not "
+                    "included in the new network",
+                    network.version,
+                    peer.name,
                 )
-            peer.ipv4.set_auto(cast(IPv4Address, self.get_next_ipv4()))
+            address.set_auto(entry.new)
         else:
-            peer.ipv4 = AssignableIPv4(cast(IPv4Address, self.get_next_ipv4()), True)
+            setattr(peer, attribute, assignable(entry.new, True))
 
+    pool: AddressPool
+    if isinstance(network, IPv4Network):
+        self.ipv4_network = network
+        self.ipv4_pool = pool = cast(AddressPool[IPv4Address], self.build_ipv4_pool())
+    else:
+        self.ipv6_network = network
+        self.ipv6_pool = pool = cast(AddressPool[IPv6Address], self.build_ipv6_pool())
 
-def set_ipv6_network(self: MainConfigBase, network: IPv6Network):
-    self.ipv6_network = network
     for peer in self.peers:
-        if peer.ipv6:
-            if peer.ipv6.address in self.ipv6_network:
-                continue
-            if not peer.ipv6.auto:
-                LOGGER.warn(
-                    f"udpating manual IPv6 address of peer {peer} as it is not "
-                    "included in the new network"
-                )
-            peer.ipv6.set_auto(cast(IPv6Address, self.get_next_ipv6()))
-        else:
-            peer.ipv6 = AssignableIPv6(cast(IPv6Address, self.get_next_ipv6()), True)
+        if address := getattr(peer, attribute):
+            pool.allocate(address.value)
+
+
+def set_ipv4_network(
+    self: MainConfigBase, network: IPv4Network, keep_offsets: bool = False
+) -> Renumbering:
+    renumbering = plan_renumbering(self, network, keep_offsets)
+    apply_renumbering(self, renumbering)
+    return renumbering
+
+
+def set_ipv6_network(
+    self: MainConfigBase, network: IPv6Network, keep_offsets: bool = False
+) -> Renumbering:
+    renumbering = plan_renumbering(self, network, keep_offsets)
+    apply_renumbering(self, renumbering)
+    return renumbering
+
+
+def reserve_network(self: MainConfigBase, network: IPv4Network | IPv6Network):
+    if isinstance(network, IPv4Network):
+        reserved: list = self.reserved_ipv4
+        pool: AddressPool | None = self.ipv4_pool
+    else:
+        reserved = self.reserved_ipv6
+        pool = self.ipv6_pool
+
+    if network in reserved:
+        LOGGER.warn("network %s is already reserved, nothing to do", network)
+        return
+
+    for peer in self.peers:
+        address = peer.ipv4 if isinstance(network, IPv4Network) else peer.ipv6
+        if address and (address.address in network):
+            LOGGER.warn(
+                "address %s of peer %s is inside reserved network %s",
+                address.address,
+                peer.name,
+                network,
+            )
+
+    reserved.append(network)
+    if pool:
+        pool.reserve(network)
+
+
+def unreserve_network(self: MainConfigBase, network: IPv4Network | IPv6Network):
+    reserved: list = (
+        self.reserved_ipv4 if isinstance(network, IPv4Network) else self.reserved_ipv6
+    )
+    if network not in reserved:
+        raise NotReservedError(str(network))
+    reserved.remove(network)
+    self.reindex()
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Iterable
+
+from wgmgr import keygen
+from wgmgr.base import MainConfigBase
+from wgmgr.operations.render import select_peers
+from wgmgr.p2p import PointToPointConfig
+
+LOGGER = logging.getLogger(__name__)
+
+
+class RotationResult:
+    def __init__(self, peers: list[str], p2ps: list[PointToPointConfig]):
+        self.peers = peers
+        self.p2ps = p2ps
+
+
+def select_key_rotation(
+    self: MainConfigBase,
+    older_than: float | None = None,
+    patterns: Iterable[str] | None = None,
+    sites: Iterable[str] | None = None,
+    now: float | None = None,
+) -> list[str]:
+    """
+    Names of the peers selected by patterns and sites (see select_peers) whose
+    keys are at least older_than seconds old. Keys of unknown age are always
+    considered old.
+    """
+    names = select_peers(self, patterns, sites)
+    if older_than is None:
+        return names
+
+    limit = (time.time() if now is None else now) - older_than
+    result: list[str] = []
+    for name in names:
+        created = self.get_peer(name).key_created
+        if (created is None) or (created <= limit):
+            result.append(name)
+    return result
+
+
+def rotate_keys(
+    self: MainConfigBase, names: Iterable[str], jobs: int | None = None
+) -> RotationResult:
+    """
+    Replace the keys of the given peers and the PSKs of all their point-to-point
+    connections. The new keys are generated in one batch, with the wg backend
+    using up to jobs concurrent calls.
+    """
+    peers = [self.get_peer(name) for name in dict.fromkeys(names)]
+
+    p2ps: dict[int, PointToPointConfig] = {}
+    for peer in peers:
+        for p2p in self.get_p2ps(peer.name):
+            p2ps.setdefault(id(p2p), p2p)
+
+    created = int(time.time())
+    keypairs = keygen.generate_keypairs(len(peers), jobs)
+    for peer, (private_key, public_key) in zip(peers, keypairs):
+        self.set_peer_keys(peer, private_key, public_key, created)
+
+    for p2p, psk in zip(p2ps.values(), keygen.generate_psks(len(p2ps), jobs)):
+        p2p.set_preshared_key(psk, created)
+
+    LOGGER.info(
+        "rotated keys of %d peers and %d point-to-point connections",
+        len(peers),
+        len(p2ps),
+    )
+    return RotationResult([peer.name for peer in peers], list(p2ps.values()))
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import logging
+from typing import Iterable
+
+from wgmgr import keygen
 from wgmgr.base import MainConfigBase
 from wgmgr.p2p import PointToPointConfig
 
+LOGGER = logging.getLogger(__name__)
+
 
 def add_p2p(
     self: MainConfigBase,
@@ -21,14 +27,50 @@ def add_p2p(
     if endpoint1 and (endpoint1 == endpoint2):
         raise ValueError("The peers in a p2p cannot have the same endpoint address")
 
-    for p2p in self.point_to_point:
-        if (p2p.peer1_name == name1) and (p2p.peer2_name == name2):
-            raise ValueError(
-                f"P2P connection between {name1} and {name2} is already present"
-            )
-        if (p2p.peer1_name == name2) and (p2p.peer2_name == name1):
-            raise ValueError(
-                f"P2P connection between {name1} and {name2} is already present"
-            )
-
-    self.point_to_point.append(PointToPointConfig(name1, name2, endpoint1, endpoint2))
+    if self.has_p2p(name1, name2):
+        raise ValueError(
+            f"P2P connection between {name1} and {name2} is already present"
+        )
+
+    p2p = PointToPointConfig.create(name1, name2, endpoint1, endpoint2)
+    self.point_to_point.append(p2p)
+    self._index_p2p(p2p)
+
+
+def remove_p2p(self: MainConfigBase, name1: str, name2: str):
+    p2p = self.get_p2p(name1, name2)
+    self.point_to_point.remove(p2p)
+    self._unindex_p2p(p2p)
+
+
+def add_p2p_mesh(
+    self: MainConfigBase, names: Iterable[str]
+) -> list[PointToPointConfig]:
+    """
+    Connect every pair of the given peers that is not connected yet.
+
+    The PSKs of all new connections are generated in one batch. Returns the new
+    connections.
+    """
+    names = sorted(set(names))
+    for name in names:
+        self.get_peer(name)
+
+    missing = [
+        (name1, name2)
+        for index, name1 in enumerate(names)
+        for name2 in names[index + 1 :]
+        if not self.has_p2p(name1, name2)
+    ]
+
+    LOGGER.info(
+        "add %d point-to-point connections between %d peers", len(missing), len(names)
+    )
+    p2ps = [
+        PointToPointConfig.create(name1, name2, preshared_key=psk)
+        for (name1, name2), psk in zip(missing, keygen.generate_psks(len(missing)))
+    ]
+    self.point_to_point.extend(p2ps)
+    for p2p in p2ps:
+        self._index_p2p(p2p)
+    return p2ps
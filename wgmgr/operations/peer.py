@@ -1,14 +1,16 @@
 from __future__ import annotations
 
 import logging
-from enum import Enum
 from ipaddress import IPv4Address, IPv6Address
+from pathlib import Path
+from typing import Any, Iterable
 
-from wgmgr import keygen
+from wgmgr import keygen, wgquick
 from wgmgr.base import MainConfigBase
-from wgmgr.error import DuplicatePeerError, UnknownPeerError
-from wgmgr.peer import PeerConfig
-from wgmgr.templates import get_template
+from wgmgr.error import DuplicatePeerError, FreeAddressError, UnknownSiteError
+from wgmgr.peer import PeerConfig, PeerConfigType, check_name
+from wgmgr.pool import AddressPool, AddressType
+from wgmgr.trace import span, traced
 from wgmgr.util import AssignableIPv4, AssignableIPv6, AssignablePort
 
 LOGGER = logging.getLogger(__name__)
@@ -20,15 +22,15 @@ def add_peer(
     ipv4: IPv4Address | None = None,
     ipv6: IPv6Address | None = None,
     port: int | None = None,
+    site: str | None = None,
 ):
-    try:
-        self.get_peer(name)
+    check_name(name)
+    if self.has_peer(name):
         raise DuplicatePeerError(name)
-    except UnknownPeerError:
-        pass
+    if site is not None:
+        self.get_site(site)
 
-    private_key = keygen.generate_private_key()
-    peer = PeerConfig(name, private_key, keygen.generate_public_key(private_key))
+    peer = PeerConfig.create(name, site)
 
     if ipv4:
         peer.ipv4 = AssignableIPv4(ipv4, False)
@@ -50,20 +52,180 @@ def add_peer(
         peer.port = AssignablePort(self.default_port, True)
 
     self.peers.append(peer)
+    self._index_peer(peer)
+
+
+def _record_value(record: dict[str, Any], key: str) -> Any:
+    value = record.get(key)
+    if value is None or value == "":
+        return None
+    return value
+
+
+@traced("allocate.next")
+def _next_free_address(
+    pool: AddressPool[AddressType], pending: set[AddressType]
+) -> AddressType | None:
+    address = pool.next_free()
+    while (address is not None) and (address in pending):
+        address = pool.next_free(address + 1)
+    return address
+
+
+def add_peers(
+    self: MainConfigBase, records: Iterable[dict[str, Any]]
+) -> list[tuple[int, Exception]]:
+    """
+    Add many peers at once.
+
+    Each record is a mapping with the keys name, ipv4, ipv6, port and site, where
+    all but the name are optional. Keys for all peers are generated in one batch
+    and free addresses are taken from the address pools of the config. Records
+    that cannot be added are skipped and returned as (index, error) pairs.
+    """
+    records = list(records)
+    errors: list[tuple[int, Exception]] = []
+    names: set[str] = set()
+    pending_ipv4: set[IPv4Address] = set()
+    pending_ipv6: set[IPv6Address] = set()
+
+    parsed: list[tuple[int, str, Any, Any, Any, Any]] = []
+    for index, record in enumerate(records):
+        try:
+            if not record.get("name"):
+                raise ValueError("record has no name")
+            name = str(record["name"])
+            check_name(name)
+            if (name in names) or self.has_peer(name):
+                raise DuplicatePeerError(name)
+            ipv4 = _record_value(record, "ipv4")
+            ipv6 = _record_value(record, "ipv6")
+            port = _record_value(record, "port")
+            site = _record_value(record, "site")
+            if (site is not None) and not self.has_site(site):
+                raise UnknownSiteError(site)
+            ipv4 = IPv4Address(ipv4) if ipv4 is not None else None
+            ipv6 = IPv6Address(ipv6) if ipv6 is not None else None
+            port = int(port) if port is not None else None
+        except (ValueError, DuplicatePeerError, UnknownSiteError) as e:
+            errors.append((index, e))
+            continue
+
+        names.add(name)
+        if ipv4:
+            pending_ipv4.add(ipv4)
+        if ipv6:
+            pending_ipv6.add(ipv6)
+        parsed.append((index, name, ipv4, ipv6, port, site))
+
+    keypairs = keygen.generate_keypairs(len(parsed))
+    for (index, name, ipv4, ipv6, port, site), keypair in zip(parsed, keypairs):
+        peer = PeerConfig.create(name, site, keypair)
+        if ipv4:
+            peer.ipv4 = AssignableIPv4(ipv4, False)
+        elif self.ipv4_pool:
+            if (ipv4 := _next_free_address(self.ipv4_pool, pending_ipv4)) is None:
+                errors.append((index, FreeAddressError("IPv4")))
+                continue
+            peer.ipv4 = AssignableIPv4(ipv4, True)
+
+        if ipv6:
+            peer.ipv6 = AssignableIPv6(ipv6, False)
+        elif self.ipv6_pool:
+            if (ipv6 := _next_free_address(self.ipv6_pool, pending_ipv6)) is None:
+                errors.append((index, FreeAddressError("IPv6")))
+                continue
+            peer.ipv6 = AssignableIPv6(ipv6, True)
 
+        if port:
+            peer.port = AssignablePort(port, False)
+        else:
+            peer.port = AssignablePort(self.default_port, True)
 
-def remove_peer(self: MainConfigBase, name: str):
-    self.peers.remove(self.get_peer(name))
+        LOGGER.info("add peer %s", name)
+        self.peers.append(peer)
+        self._index_peer(peer)
 
+    return errors
 
-class PeerConfigType(str, Enum):
-    wg_quick = "wg-quick"
+
+def remove_peer(self: MainConfigBase, name: str):
+    peer = self.get_peer(name)
+    if peer.site is not None:
+        site = self.get_site(peer.site)
+        if name in site.hubs:
+            site.hubs.remove(name)
+            site.endpoints.pop(name, None)
+    self.peers.remove(peer)
+    self._unindex_peer(peer)
+
+    p2ps = self.get_p2ps(name)
+    if p2ps:
+        LOGGER.info("remove %d point-to-point connections of peer %s", len(p2ps), name)
+        removed = {id(p2p) for p2p in p2ps}
+        self.point_to_point = [
+            p2p for p2p in self.point_to_point if id(p2p) not in removed
+        ]
+        for p2p in p2ps:
+            self._unindex_p2p(p2p)
+
+
+def rename_peer(self: MainConfigBase, name: str, new_name: str):
+    check_name(new_name)
+    if self.has_peer(new_name):
+        raise DuplicatePeerError(new_name)
+
+    peer = self.get_peer(name)
+    self._unindex_peer(peer)
+    peer.name = new_name
+    self._index_peer(peer)
+
+    if peer.site is not None:
+        site = self.get_site(peer.site)
+        if name in site.hubs:
+            site.hubs[site.hubs.index(name)] = new_name
+            if name in site.endpoints:
+                site.endpoints[new_name] = site.endpoints.pop(name)
+
+    for p2p in self.get_p2ps(name):
+        self._unindex_p2p(p2p)
+        if p2p.peer1_name == name:
+            p2p.peer1_name = new_name
+        else:
+            p2p.peer2_name = new_name
+
+        if p2p.peer1_name > p2p.peer2_name:
+            p2p.peer1_name, p2p.peer2_name = p2p.peer2_name, p2p.peer1_name
+            p2p.peer1_endpoint, p2p.peer2_endpoint = (
+                p2p.peer2_endpoint,
+                p2p.peer1_endpoint,
+            )
+        self._index_p2p(p2p)
 
 
 def generate_peer_config(
-    self: MainConfigBase, name: str, config_type: PeerConfigType
+    self: MainConfigBase,
+    name: str,
+    config_type: PeerConfigType,
+    template: str | Path | None = None,
 ) -> str:
-    if config_type == PeerConfigType.wg_quick:
-        return get_template("wg-quick.conf.j2").render(config=self, peer_name=name)
+    """
+    Render the config of a peer.
+
+    By default the builtin renderer for config_type is used. Alternatively, a
+    Jinja template can be given, either the name of a builtin template or the path
+    of a custom one. Templates receive the MainConfig as config, the name of the
+    peer as peer_name and a wgmgr.wgquick.PeerView as peer.
+    """
+    with span("render.peer_config"):
+        if template is not None:
+            from wgmgr.templates import get_template
+
+            return get_template(template).render(
+                config=self, peer_name=name, peer=wgquick.build_peer_view(self, name)
+            )
+
+        if config_type == PeerConfigType.wg_quick:
+            return wgquick.render(wgquick.build_peer_view(self, name))
 
     raise ValueError(f"Unknown peer config type {config_type}")
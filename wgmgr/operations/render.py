@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, cast
+
+from wgmgr import wgquick
+from wgmgr.base import MainConfigBase
+from wgmgr.operations.peer import generate_peer_config
+from wgmgr.peer import PeerConfig, PeerConfigType, get_config_path, is_valid_name
+from wgmgr.trace import span
+from wgmgr.util import write_file, write_file_atomic
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+LOGGER = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".wgmgr-manifest.json"
+MANIFEST_VERSION = 1
+
+_worker_config: MainConfigBase | None = None
+
+
+class RenderResult:
+    def __init__(
+        self,
+        written: list[Path],
+        elapsed: float,
+        unchanged: list[str] | None = None,
+        removed: list[str] | None = None,
+    ):
+        self.written = written
+        self.elapsed = elapsed
+        self.unchanged = unchanged or []
+        self.removed = removed or []
+
+    @property
+    def changed(self) -> list[str]:
+        return [path.stem for path in self.written]
+
+    @property
+    def throughput(self) -> float:
+        return len(self.written) / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def _renderer_id(config_type: PeerConfigType, template: str | Path | None) -> str:
+    if template is None:
+        return f"{config_type.value}:native:{wgquick.RENDERER_VERSION}"
+
+    from wgmgr.templates import get_template
+
+    source = Path(cast(str, get_template(template).filename)).read_bytes()
+    return f"template:{hashlib.sha256(source).hexdigest()}"
+
+
+def _peer_inputs(peer: PeerConfig) -> list[Any]:
+    return [
+        peer.name,
+        peer.public_key,
+        str(peer.ipv4.address) if peer.ipv4 else None,
+        str(peer.ipv6.address) if peer.ipv6 else None,
+        peer.port.number,
+    ]
+
+
+def peer_input_hash(self: MainConfigBase, name: str) -> str:
+    """
+    Hash of everything that goes into the config of a peer: its own keys,
+    addresses and port as well as the keys, addresses, endpoints and PSKs of all
+    its point-to-point connections, including the networks routed through them.
+    """
+    peer = self.get_peer(name)
+    inputs: list[Any] = [_peer_inputs(peer), peer.private_key]
+    for p2p in self.get_p2ps(name):
+        other_name = p2p.peer2_name if p2p.peer1_name == name else p2p.peer1_name
+        inputs.append(
+            [
+                _peer_inputs(self.get_peer(other_name)),
+                p2p.preshared_key,
+                p2p.peer1_endpoint,
+                p2p.peer2_endpoint,
+                [
+                    str(network)
+                    for network in self.get_routed_networks(name, other_name)
+                ],
+            ]
+        )
+    return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()
+
+
+def read_manifest(output_dir: Path) -> dict[str, Any]:
+    try:
+        with open(output_dir / MANIFEST_NAME) as fptr:
+            manifest = json.load(fptr)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest
+
+
+def write_manifest(output_dir: Path, manifest: dict[str, Any]):
+    path = output_dir / MANIFEST_NAME
+    write_file_atomic(path, json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def _write_peer_config(
+    config: MainConfigBase,
+    name: str,
+    config_type: PeerConfigType,
+    template: str | Path | None,
+    path: Path,
+) -> Path:
+    write_file(path, generate_peer_config(config, name, config_type, template))
+    return path
+
+
+def _init_worker(config: MainConfigBase):
+    global _worker_config
+    _worker_config = config
+
+
+def _process_worker(
+    name: str, config_type: PeerConfigType, template: str | Path | None, path: Path
+) -> Path:
+    assert _worker_config is not None
+    return _write_peer_config(_worker_config, name, config_type, template, path)
+
+
+def select_peers(
+    self: MainConfigBase,
+    patterns: Iterable[str] | None = None,
+    sites: Iterable[str] | None = None,
+) -> list[str]:
+    """
+    Names of the peers whose name matches any of the glob patterns and that belong
+    to any of the sites. Without patterns and sites, all peers are selected.
+    """
+    peers = self.peers
+    if sites:
+        sites = set(sites)
+        peers = [peer for peer in peers if peer.site in sites]
+
+    names = [peer.name for peer in peers]
+    if not patterns:
+        return names
+
+    patterns = list(patterns)
+    return [
+        name
+        for name in names
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+    ]
+
+
+def write_peer_configs(
+    self: MainConfigBase,
+    output_dir: Path,
+    names: Iterable[str] | None = None,
+    config_type: PeerConfigType = PeerConfigType.wg_quick,
+    jobs: int | None = None,
+    processes: bool = False,
+    force: bool = False,
+    template: str | Path | None = None,
+) -> RenderResult:
+    """
+    Render the configs of several peers (all by default) into output_dir.
+
+    A manifest in output_dir records a hash of the inputs of every config, so
+    only configs whose inputs changed since the last run are rendered again
+    unless force is set. When rendering all peers, configs of peers that no
+    longer exist are removed.
+
+    Rendering is spread over a pool of threads or, if processes is set, worker
+    processes that receive a copy of the config once at startup.
+    """
+    with span("render.write"):
+        start = time.perf_counter()
+        render_all = names is None
+        names = list(names) if names is not None else [peer.name for peer in self.peers]
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+        manifest = read_manifest(output_dir)
+        renderer = _renderer_id(config_type, template)
+        recorded: dict[str, str] = manifest.get("peers", {})
+        peers = dict(recorded) if manifest.get("renderer") == renderer else {}
+        previous = {} if force else peers
+        with span("render.hash"):
+            hashes = {name: peer_input_hash(self, name) for name in names}
+
+        unchanged = [
+            name
+            for name in names
+            if (previous.get(name) == hashes[name])
+            and get_config_path(output_dir, name).exists()
+        ]
+        skip = set(unchanged)
+        names = [name for name in names if name not in skip]
+        paths = [get_config_path(output_dir, name) for name in names]
+
+        removed: list[str] = []
+        if render_all:
+            # the manifest is a plain file in output_dir, never follow names
+            # in it outside of output_dir
+            removed = sorted(
+                name for name in set(recorded) - set(hashes) if is_valid_name(name)
+            )
+            for name in removed:
+                get_config_path(output_dir, name).unlink(missing_ok=True)
+                peers.pop(name, None)
+
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        executor: Executor
+        if processes:
+            executor = ProcessPoolExecutor(
+                jobs, initializer=_init_worker, initargs=(self,)
+            )
+            with executor:
+                written = list(
+                    executor.map(
+                        _process_worker,
+                        names,
+                        [config_type] * len(names),
+                        [template] * len(names),
+                        paths,
+                        chunksize=max(
+                            1, len(names) // (4 * (jobs or os.cpu_count() or 1))
+                        ),
+                    )
+                )
+        else:
+            with ThreadPoolExecutor(jobs) as executor:
+                written = list(
+                    executor.map(
+                        lambda name, path: _write_peer_config(
+                            self, name, config_type, template, path
+                        ),
+                        names,
+                        paths,
+                    )
+                )
+
+        peers.update(hashes)
+        write_manifest(
+            output_dir,
+            {"version": MANIFEST_VERSION, "renderer": renderer, "peers": peers},
+        )
+
+        result = RenderResult(written, time.perf_counter() - start, unchanged, removed)
+        LOGGER.info(
+            "wrote %d peer configs in %.3fs, %d unchanged, %d removed",
+            len(result.written),
+            result.elapsed,
+            len(result.unchanged),
+            len(result.removed),
+        )
+    return result
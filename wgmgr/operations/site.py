@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import logging
+from typing import Iterable
+
+from wgmgr import keygen
+from wgmgr.base import MainConfigBase
+from wgmgr.error import DuplicateSiteError
+from wgmgr.p2p import PointToPointConfig
+from wgmgr.pool import NetworkType
+from wgmgr.site import Site
+
+LOGGER = logging.getLogger(__name__)
+
+Link = tuple[str, str]
+
+
+def add_site(
+    self: MainConfigBase,
+    name: str,
+    hubs: Iterable[str] = (),
+    subnets: Iterable[NetworkType] = (),
+    endpoints: dict[str, str] | None = None,
+):
+    if self.has_site(name):
+        raise DuplicateSiteError(name)
+
+    site = Site(name)
+    self.sites.append(site)
+    self._sites_by_name[name] = site
+    set_site_hubs(self, name, hubs, endpoints)
+    set_site_subnets(self, name, subnets)
+
+
+def remove_site(self: MainConfigBase, name: str):
+    site = self.get_site(name)
+    for peer in self.peers:
+        if peer.site == name:
+            peer.site = None
+    self.sites.remove(site)
+    del self._sites_by_name[name]
+
+
+def set_site_hubs(
+    self: MainConfigBase,
+    name: str,
+    hubs: Iterable[str],
+    endpoints: dict[str, str] | None = None,
+):
+    """
+    Make the given peers the hubs of a site, in order of preference. Hubs that
+    are not yet members of the site are moved to it. endpoints maps hubs to the
+    address under which the other peers reach them.
+    """
+    site = self.get_site(name)
+    hubs = list(dict.fromkeys(hubs))
+    for hub in hubs:
+        set_peer_site(self, hub, name)
+    site.hubs = hubs
+    site.endpoints = {
+        hub: endpoint for hub, endpoint in (endpoints or {}).items() if hub in hubs
+    }
+
+
+def set_site_subnets(self: MainConfigBase, name: str, subnets: Iterable[NetworkType]):
+    self.get_site(name).subnets = list(subnets)
+
+
+def set_peer_site(self: MainConfigBase, name: str, site_name: str | None):
+    peer = self.get_peer(name)
+    if site_name is not None:
+        self.get_site(site_name)
+
+    if (peer.site is not None) and (peer.site != site_name):
+        old_site = self.get_site(peer.site)
+        if name in old_site.hubs:
+            old_site.hubs.remove(name)
+            old_site.endpoints.pop(name, None)
+    peer.site = site_name
+
+
+def derive_topology(self: MainConfigBase) -> dict[Link, tuple[str | None, str | None]]:
+    """
+    Connections implied by the sites, as a mapping of (name1, name2) with
+    name1 < name2 to the endpoints of both peers.
+    """
+    members: dict[str, list[str]] = {}
+    for peer in self.peers:
+        if peer.site is not None:
+            members.setdefault(peer.site, []).append(peer.name)
+
+    endpoints: dict[str, str | None] = {}
+    for site in self.sites:
+        for hub in site.hubs:
+            endpoints[hub] = site.endpoints.get(hub)
+
+    links: dict[Link, tuple[str | None, str | None]] = {}
+    for site in self.sites:
+        for name in members.get(site.name, []):
+            if name in endpoints:
+                continue
+            for hub in site.hubs:
+                if name < hub:
+                    links[(name, hub)] = (None, endpoints[hub])
+                else:
+                    links[(hub, name)] = (endpoints[hub], None)
+
+    hubs = sorted(endpoints)
+    for index, name1 in enumerate(hubs):
+        for name2 in hubs[index + 1 :]:
+            links[(name1, name2)] = (endpoints[name1], endpoints[name2])
+    return links
+
+
+def apply_topology(
+    self: MainConfigBase,
+) -> tuple[list[PointToPointConfig], list[PointToPointConfig]]:
+    """
+    Bring the automatically managed connections in line with the sites: add the
+    missing hub↔spoke and hub↔hub connections, update the endpoints of existing
+    ones and remove those that are no longer implied. Manually added connections
+    are never changed. Returns the added and removed connections.
+    """
+    links = derive_topology(self)
+
+    removed = [
+        p2p
+        for p2p in self.point_to_point
+        if p2p.auto and ((p2p.peer1_name, p2p.peer2_name) not in links)
+    ]
+    if removed:
+        ids = {id(p2p) for p2p in removed}
+        self.point_to_point = [p2p for p2p in self.point_to_point if id(p2p) not in ids]
+        for p2p in removed:
+            self._unindex_p2p(p2p)
+
+    missing: list[Link] = []
+    for (name1, name2), (endpoint1, endpoint2) in links.items():
+        if not self.has_p2p(name1, name2):
+            missing.append((name1, name2))
+            continue
+        p2p = self.get_p2p(name1, name2)
+        if p2p.auto:
+            p2p.peer1_endpoint = endpoint1
+            p2p.peer2_endpoint = endpoint2
+
+    added = [
+        PointToPointConfig.create(
+            name1, name2, *links[(name1, name2)], auto=True, preshared_key=psk
+        )
+        for (name1, name2), psk in zip(missing, keygen.generate_psks(len(missing)))
+    ]
+    self.point_to_point.extend(added)
+    for p2p in added:
+        self._index_p2p(p2p)
+
+    LOGGER.info("topology: %d connections added, %d removed", len(added), len(removed))
+    return added, removed
@@ -1,23 +1,92 @@
 from __future__ import annotations
 
+import time
 from typing import Any
 
 from wgmgr import keygen
 
 
 class PointToPointConfig:
+    """
+    A connection between two peers. The preshared key is stored as raw bytes and
+    only encoded as base64 when it is read through the preshared_key property.
+
+    Connections derived from the sites of the config are marked as auto and are
+    added and removed along with the topology.
+
+    psk_created and psk_generation track the age of the preshared key like
+    PeerConfig.key_created and key_generation.
+
+    The constructor only takes stored values, new connections with a fresh
+    preshared key are made with create().
+    """
+
+    __slots__ = (
+        "peer1_name",
+        "peer2_name",
+        "peer1_endpoint",
+        "peer2_endpoint",
+        "preshared_key_bytes",
+        "auto",
+        "psk_created",
+        "psk_generation",
+    )
+
     def __init__(
         self,
         name1: str,
         name2: str,
-        endpoint1: str | None = None,
-        endpoint2: str | None = None,
+        endpoint1: str | None,
+        endpoint2: str | None,
+        preshared_key: str,
+        auto: bool = False,
+        psk_created: int | None = None,
+        psk_generation: int = 1,
     ):
         self.peer1_name = name1
         self.peer2_name = name2
         self.peer1_endpoint = endpoint1
         self.peer2_endpoint = endpoint2
-        self.preshared_key = keygen.generate_psk()
+        self.preshared_key_bytes = keygen.decode_key(preshared_key)
+        self.auto = auto
+        self.psk_created = psk_created
+        self.psk_generation = psk_generation
+
+    @staticmethod
+    def create(
+        name1: str,
+        name2: str,
+        endpoint1: str | None = None,
+        endpoint2: str | None = None,
+        auto: bool = False,
+        preshared_key: str | None = None,
+    ) -> PointToPointConfig:
+        """
+        A new connection. Unless given, e.g. from a batch generated with
+        keygen.generate_psks, a preshared key is generated.
+        """
+        return PointToPointConfig(
+            name1,
+            name2,
+            endpoint1,
+            endpoint2,
+            preshared_key if preshared_key is not None else keygen.generate_psk(),
+            auto,
+            int(time.time()),
+        )
+
+    @property
+    def preshared_key(self) -> str:
+        return keygen.encode_key(self.preshared_key_bytes)
+
+    @preshared_key.setter
+    def preshared_key(self, preshared_key: str):
+        self.preshared_key_bytes = keygen.decode_key(preshared_key)
+
+    def set_preshared_key(self, preshared_key: str, created: int | None = None):
+        self.preshared_key = preshared_key
+        self.psk_created = int(time.time()) if created is None else created
+        self.psk_generation += 1
 
     def serialize(self) -> dict[str, Any]:
         return {
@@ -30,15 +99,20 @@ class PointToPointConfig:
                 "endpoint": self.peer2_endpoint if self.peer2_endpoint else None,
             },
             "preshared_key": self.preshared_key,
+            "auto": self.auto,
+            "psk_created": self.psk_created,
+            "psk_generation": self.psk_generation,
         }
 
     @staticmethod
     def deserialize(data: dict[str, Any]) -> PointToPointConfig:
-        config = PointToPointConfig(
+        return PointToPointConfig(
             data["peer1"]["name"],
             data["peer2"]["name"],
             data["peer1"]["endpoint"],
             data["peer2"]["endpoint"],
+            data["preshared_key"],
+            bool(data.get("auto", False)),
+            data.get("psk_created"),
+            int(data.get("psk_generation", 1)),
         )
-        config.preshared_key = data["preshared_key"]
-        return config
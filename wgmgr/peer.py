@@ -1,21 +1,120 @@
 from __future__ import annotations
 
+import time
+from enum import Enum
+from pathlib import Path
 from typing import Any
 
+from wgmgr import keygen
+from wgmgr.error import InvalidPeerNameError
+from wgmgr.keygen import decode_key, encode_key
 from wgmgr.util import AssignableIPv4, AssignableIPv6, AssignablePort
 
 
+class PeerConfigType(str, Enum):
+    wg_quick = "wg-quick"
+
+
+def is_valid_name(name: str) -> bool:
+    """
+    Peer names are used as file names, e.g. <name>.conf by write_peer_configs, so
+    they must not be empty, contain path separators or start with a dot.
+    """
+    return bool(name) and not name.startswith(".") and not (set(name) & set("/\\\0"))
+
+
+def check_name(name: str):
+    if not is_valid_name(name):
+        raise InvalidPeerNameError(name)
+
+
+def get_config_path(output_dir: Path, name: str) -> Path:
+    """
+    Path of the rendered config of peer name in output_dir. Names that would
+    point outside of it, e.g. in configs written before names were checked, raise
+    InvalidPeerNameError.
+    """
+    check_name(name)
+    return output_dir / f"{name}.conf"
+
+
 class PeerConfig:
+    """
+    A peer of the network. Keys are stored as raw bytes and only encoded as base64
+    when they are read through the private_key and public_key properties.
+
+    key_created is the Unix time at which the current keys were generated (None if
+    unknown) and key_generation counts how often they were generated.
+
+    The constructor only takes stored values, new peers with fresh keys are made
+    with create().
+    """
+
+    __slots__ = (
+        "name",
+        "private_key_bytes",
+        "public_key_bytes",
+        "ipv4",
+        "ipv6",
+        "port",
+        "site",
+        "key_created",
+        "key_generation",
+    )
+
     def __init__(
-        self, name: str, private_key: str, public_key: str, site: str | None = None
+        self,
+        name: str,
+        private_key: str,
+        public_key: str,
+        site: str | None = None,
+        key_created: int | None = None,
+        key_generation: int = 1,
     ):
         self.name: str = name
-        self.private_key: str = private_key
-        self.public_key: str = public_key
-        self.ipv4: AssignableIPv4 | None
-        self.ipv6: AssignableIPv6 | None
+        self.private_key_bytes: bytes = decode_key(private_key)
+        self.public_key_bytes: bytes = decode_key(public_key)
+        self.ipv4: AssignableIPv4 | None = None
+        self.ipv6: AssignableIPv6 | None = None
         self.port: AssignablePort
-        self.site: str | None
+        self.site: str | None = site
+        self.key_created: int | None = key_created
+        self.key_generation: int = key_generation
+
+    @staticmethod
+    def create(
+        name: str,
+        site: str | None = None,
+        keypair: tuple[str, str] | None = None,
+    ) -> PeerConfig:
+        """
+        A new peer. Unless given, e.g. from a batch generated with
+        keygen.generate_keypairs, a key pair is generated.
+        """
+        private_key, public_key = keypair or keygen.generate_keypair()
+        return PeerConfig(name, private_key, public_key, site, int(time.time()))
+
+    @property
+    def private_key(self) -> str:
+        return encode_key(self.private_key_bytes)
+
+    @private_key.setter
+    def private_key(self, private_key: str):
+        self.private_key_bytes = decode_key(private_key)
+
+    @property
+    def public_key(self) -> str:
+        return encode_key(self.public_key_bytes)
+
+    @public_key.setter
+    def public_key(self, public_key: str):
+        self.public_key_bytes = decode_key(public_key)
+
+    def set_keys(self, private_key: str, public_key: str, created: int | None = None):
+        self.private_key = private_key
+        self.public_key = public_key
+        self.key_created = int(time.time()) if created is None else created
+        self.key_generation += 1
 
     def serialize(self) -> dict[str, Any]:
         return {
@@ -25,11 +124,21 @@ class PeerConfig:
             "ipv4": self.ipv4.serialize() if self.ipv4 else None,
             "ipv6": self.ipv6.serialize() if self.ipv6 else None,
             "port": self.port.serialize(),
+            "site": self.site,
+            "key_created": self.key_created,
+            "key_generation": self.key_generation,
         }
 
     @staticmethod
     def deserialize(data: dict[str, Any]) -> PeerConfig:
-        config = PeerConfig(data["name"], data["private_key"], data["public_key"])
+        config = PeerConfig(
+            data["name"],
+            data["private_key"],
+            data["public_key"],
+            data.get("site"),
+            data.get("key_created"),
+            int(data.get("key_generation", 1)),
+        )
         config.ipv4 = AssignableIPv4.deserialize(data["ipv4"]) if data["ipv4"] else None
         config.ipv6 = AssignableIPv6.deserialize(data["ipv6"]) if data["ipv6"] else None
         config.port = AssignablePort.deserialize(data["port"])
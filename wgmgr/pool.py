@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from ipaddress import IPv4Address, IPv4Network, IPv6Address, IPv6Network
+from typing import Generic, Iterable, Iterator, Type, TypeVar, Union, cast
+
+from wgmgr.error import FreeAddressError
+from wgmgr.trace import traced
+
+AddressType = TypeVar("AddressType", IPv4Address, IPv6Address)
+NetworkType = Union[IPv4Network, IPv6Network]
+
+
+class AddressPool(Generic[AddressType]):
+    """
+    Allocation state of the host addresses of a network.
+
+    Allocated and reserved addresses are kept as a sorted list of merged intervals
+    of integers, so finding the lowest free address is a binary search no matter
+    how many addresses are in use.
+    """
+
+    def __init__(self, network: NetworkType, reserved: Iterable[NetworkType] = ()):
+        self.network = network
+        self.protocol = f"IPv{network.version}"
+        self.address_class: Type[AddressType] = cast(
+            Type[AddressType], type(network.network_address)
+        )
+        self.first = int(network.network_address)
+        self.last = int(network.broadcast_address)
+        if network.num_addresses > 2:
+            self.first += 1
+            if network.version == 4:
+                self.last -= 1
+
+        self.reserved: list[tuple[int, int]] = []
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        self._counts: dict[int, int] = {}
+
+        for entry in reserved:
+            self.reserve(entry)
+
+    def _cover(self, start: int, end: int):
+        lo = bisect_left(self._ends, start - 1)
+        hi = bisect_right(self._starts, end + 1)
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi - 1])
+        self._starts[lo:hi] = [start]
+        self._ends[lo:hi] = [end]
+
+    def _uncover(self, value: int):
+        index = bisect_right(self._starts, value) - 1
+        if (index < 0) or (self._ends[index] < value):
+            return
+
+        start, end = self._starts[index], self._ends[index]
+        starts: list[int] = []
+        ends: list[int] = []
+        if start < value:
+            starts.append(start)
+            ends.append(value - 1)
+        if value < end:
+            starts.append(value + 1)
+            ends.append(end)
+        self._starts[index : index + 1] = starts
+        self._ends[index : index + 1] = ends
+
+    def is_reserved(self, address: AddressType | int) -> bool:
+        value = int(address)
+        return any(start <= value <= end for start, end in self.reserved)
+
+    def is_free(self, address: AddressType | int) -> bool:
+        value = int(address)
+        if (value < self.first) or (value > self.last):
+            return False
+        index = bisect_right(self._starts, value) - 1
+        return (index < 0) or (self._ends[index] < value)
+
+    def reserve(self, network: NetworkType):
+        start = int(network.network_address)
+        end = int(network.broadcast_address)
+        self.reserved.append((start, end))
+        self._cover(start, end)
+
+    def allocate(self, address: AddressType | int):
+        value = int(address)
+        count = self._counts.get(value, 0)
+        self._counts[value] = count + 1
+        if count == 0:
+            self._cover(value, value)
+
+    def release(self, address: AddressType | int):
+        value = int(address)
+        count = self._counts.get(value, 0)
+        if count > 1:
+            self._counts[value] = count - 1
+            return
+
+        self._counts.pop(value, None)
+        if not self.is_reserved(address):
+            self._uncover(value)
+
+    def _next_free_value(self, value: int) -> int | None:
+        value = max(value, self.first)
+        index = bisect_right(self._starts, value) - 1
+        if (index >= 0) and (self._ends[index] >= value):
+            value = self._ends[index] + 1
+
+        if value > self.last:
+            return None
+        return value
+
+    def next_free(self, start: AddressType | None = None) -> AddressType | None:
+        value = self._next_free_value(int(start) if start is not None else self.first)
+        return self.address_class(value) if value is not None else None
+
+    @traced("allocate.next")
+    def allocate_next(self) -> AddressType:
+        address = self.next_free()
+        if address is None:
+            raise FreeAddressError(self.protocol)
+        self.allocate(address)
+        return address
+
+    def free_addresses(self) -> Iterator[AddressType]:
+        value = self._next_free_value(self.first)
+        while value is not None:
+            yield self.address_class(value)
+            value = self._next_free_value(value + 1)
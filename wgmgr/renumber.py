@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+from typing import Iterable
+
+from wgmgr.peer import PeerConfig
+from wgmgr.pool import AddressPool, NetworkType
+from wgmgr.trace import traced
+
+
+class RenumberEntry:
+    __slots__ = ("name", "old", "new")
+
+    def __init__(self, name: str, old: int | None, new: int):
+        self.name = name
+        self.old = old
+        self.new = new
+
+
+class Renumbering:
+    """
+    The complete mapping of old to new addresses of all peers that have to move
+    when the IPv4 or IPv6 network of a config changes, as computed by plan().
+    """
+
+    def __init__(self, network: NetworkType, entries: list[RenumberEntry]):
+        self.network = network
+        self.entries = entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def mapping(self) -> dict[str, tuple[str | None, str]]:
+        address_class = type(self.network.network_address)
+        return {
+            entry.name: (
+                str(address_class(entry.old)) if entry.old is not None else None,
+                str(address_class(entry.new)),
+            )
+            for entry in self.entries
+        }
+
+    def report(self) -> list[str]:
+        return [
+            f"{name}: {old or '-'} -> {new}"
+            for name, (old, new) in self.mapping().items()
+        ]
+
+
+@traced("renumber.plan")
+def plan(
+    peers: Iterable[PeerConfig],
+    network: NetworkType,
+    old_network: NetworkType | None = None,
+    reserved: Iterable[NetworkType] = (),
+    keep_offsets: bool = False,
+) -> Renumbering:
+    """
+    Compute new addresses in network for all peers whose address of the same IP
+    version is missing or outside of it.
+
+    Addresses inside the new network, manual ones included, are kept. With
+    keep_offsets, a peer keeps the offset of its address in old_network if that
+    address is free in the new network, e.g. 10.0.0.17 in 10.0.0.0/24 becomes
+    10.1.0.17 in 10.1.0.0/24. All other peers get the lowest free addresses, in
+    the order of peers.
+    """
+    attribute = f"ipv{network.version}"
+    pool: AddressPool = AddressPool(network, reserved)
+    first = int(network.network_address)
+    last = int(network.broadcast_address)
+
+    relocate: list[tuple[PeerConfig, int | None]] = []
+    for peer in peers:
+        address = getattr(peer, attribute)
+        value = address.value if address else None
+        if (value is not None) and (first <= value <= last):
+            pool.allocate(value)
+        else:
+            relocate.append((peer, value))
+
+    new_values: list[int | None] = [None] * len(relocate)
+    if keep_offsets and (old_network is not None):
+        old_first = int(old_network.network_address)
+        for index, (_, value) in enumerate(relocate):
+            if value is None:
+                continue
+            new = first + (value - old_first)
+            if pool.is_free(new):
+                pool.allocate(new)
+                new_values[index] = new
+
+    entries: list[RenumberEntry] = []
+    for (peer, value), new_value in zip(relocate, new_values):
+        if new_value is None:
+            new_value = int(pool.allocate_next())
+        entries.append(RenumberEntry(peer.name, value, new_value))
+
+    return Renumbering(network, entries)
@@ -1,15 +1,47 @@
 from __future__ import annotations
 
+from ipaddress import ip_network
 from typing import Any
 
+from wgmgr.pool import NetworkType
+
 
 class Site:
-    def __init__(self, name: str):
+    """
+    A group of peers. Spokes, i.e. members of the site that are not hubs, are only
+    connected to the hubs of their site and route the subnets of all sites through
+    the first (primary) hub. Hubs are connected to each other across all sites.
+    """
+
+    __slots__ = ("name", "hubs", "endpoints", "subnets")
+
+    def __init__(
+        self,
+        name: str,
+        hubs: list[str] | None = None,
+        subnets: list[NetworkType] | None = None,
+        endpoints: dict[str, str] | None = None,
+    ):
         self.name = name
+        self.hubs: list[str] = hubs or []
+        self.endpoints: dict[str, str] = endpoints or {}
+        self.subnets: list[NetworkType] = subnets or []
 
     def serialize(self) -> dict[str, Any]:
-        return {"name": self.name}
+        return {
+            "name": self.name,
+            "hubs": [
+                {"name": hub, "endpoint": self.endpoints.get(hub)} for hub in self.hubs
+            ],
+            "subnets": [str(subnet) for subnet in self.subnets],
+        }
 
     @staticmethod
     def deserialize(data: dict[str, Any]) -> Site:
-        return Site(data["name"])
+        hubs = data.get("hubs", [])
+        return Site(
+            data["name"],
+            [hub["name"] for hub in hubs],
+            [ip_network(subnet) for subnet in data.get("subnets", [])],
+            {hub["name"]: hub["endpoint"] for hub in hubs if hub.get("endpoint")},
+        )
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import logging
+import marshal
+import os
+import sys
+from enum import Enum
+from pathlib import Path
+from typing import Any, Iterator
+
+from wgmgr.trace import span
+from wgmgr.util import write_file_atomic
+
+LOGGER = logging.getLogger(__name__)
+
+BINARY_MAGIC = b"WGMGR\x00\x02\n"
+# written by versions that used marshal, whose format depends on the Python version
+LEGACY_BINARY_MAGIC = b"WGMGR\x00\x01\n"
+CACHE_MAGIC = b"WGMGR-CACHE\x00\x01\n"
+
+_use_cache = os.environ.get("WGMGR_CACHE", "") not in ("", "0")
+
+
+def get_use_cache() -> bool:
+    return _use_cache
+
+
+def set_use_cache(use_cache: bool):
+    global _use_cache
+    _use_cache = use_cache
+
+
+_use_journal = os.environ.get("WGMGR_JOURNAL", "") not in ("", "0")
+
+
+def get_use_journal() -> bool:
+    return _use_journal
+
+
+def set_use_journal(use_journal: bool):
+    global _use_journal
+    _use_journal = use_journal
+
+
+class StorageFormat(str, Enum):
+    yaml = "yaml"
+    json = "json"
+    binary = "binary"
+    directory = "directory"
+
+
+class Storage:
+    """
+    Conversion between the serialized form of a config (see
+    MainConfigBase.serialize) and the bytes stored on disk.
+    """
+
+    def dumps(self, data: dict[str, Any]) -> bytes:
+        raise NotImplementedError()
+
+    def loads(self, raw: bytes) -> dict[str, Any]:
+        raise NotImplementedError()
+
+
+class YamlStorage(Storage):
+    def dumps(self, data: dict[str, Any]) -> bytes:
+        import yaml
+
+        return yaml.dump(
+            data, Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+        ).encode()
+
+    def loads(self, raw: bytes) -> dict[str, Any]:
+        import yaml
+
+        return yaml.load(raw, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+class JsonStorage(Storage):
+    def dumps(self, data: dict[str, Any]) -> bytes:
+        return json.dumps(data, indent=2, sort_keys=True).encode() + b"\n"
+
+    def loads(self, raw: bytes) -> dict[str, Any]:
+        return json.loads(raw)
+
+
+class BinaryStorage(Storage):
+    """
+    Pickle protocol 4, which every Python version since 3.4 can read. Only plain
+    data is accepted when loading, so a config file cannot run code.
+    """
+
+    def dumps(self, data: dict[str, Any]) -> bytes:
+        import pickle
+
+        return BINARY_MAGIC + pickle.dumps(data, 4)
+
+    def loads(self, raw: bytes) -> dict[str, Any]:
+        import io
+        import pickle
+
+        class Unpickler(pickle.Unpickler):
+            def find_class(self, module: str, name: str) -> Any:
+                raise pickle.UnpicklingError(f"unexpected object {module}.{name}")
+
+        if raw.startswith(LEGACY_BINARY_MAGIC):
+            try:
+                return marshal.loads(raw[len(LEGACY_BINARY_MAGIC) :])
+            except (EOFError, ValueError, TypeError):
+                raise ValueError(
+                    "binary wgmgr config written by an older wgmgr with another "
+                    "Python version, convert it with that version"
+                )
+        if not raw.startswith(BINARY_MAGIC):
+            raise ValueError("not a binary wgmgr config")
+        return Unpickler(io.BytesIO(raw[len(BINARY_MAGIC) :])).load()
+
+
+STORAGES: dict[StorageFormat, Storage] = {
+    StorageFormat.yaml: YamlStorage(),
+    StorageFormat.json: JsonStorage(),
+    StorageFormat.binary: BinaryStorage(),
+}
+
+SUFFIXES = {
+    ".json": StorageFormat.json,
+    ".wgmgr": StorageFormat.binary,
+    ".bin": StorageFormat.binary,
+}
+
+
+def guess_format(path: Path) -> StorageFormat:
+    if path.suffix == ".d" or path.is_dir():
+        return StorageFormat.directory
+    return SUFFIXES.get(path.suffix, StorageFormat.yaml)
+
+
+def get_storage(path: Path, storage_format: StorageFormat | None = None) -> Storage:
+    return STORAGES[storage_format or guess_format(path)]
+
+
+def read_file(path: Path) -> bytes:
+    with os.fdopen(os.open(path, os.O_RDONLY), "rb") as fptr:
+        return fptr.read()
+
+
+def get_cache_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.cache")
+
+
+def get_socket_path(path: Path) -> Path:
+    """
+    Path of the socket of the daemon serving the config at path, see wgmgr.daemon.
+    Can be set with the WGMGR_SOCKET environment variable.
+    """
+    if socket_path := os.environ.get("WGMGR_SOCKET"):
+        return Path(socket_path)
+    return path.with_name(f".{path.name}.sock")
+
+
+def get_journal_path(path: Path) -> Path:
+    return path.with_name(f"{path.name}.journal")
+
+
+def get_lock_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.lock")
+
+
+@contextlib.contextmanager
+def locked(path: Path) -> Iterator[None]:
+    """
+    Hold an exclusive lock on the config at path, so that concurrent
+    load-modify-save cycles do not overwrite each other's changes. The lock is
+    advisory and taken on a separate lock file, as the config file itself is
+    replaced on every save.
+    """
+    import fcntl
+
+    fd = os.open(get_lock_path(path), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _cache_key(raw: bytes, stat: os.stat_result) -> bytes:
+    # marshal data is only readable by the same Python version
+    return marshal.dumps(
+        (
+            sys.hexversion,
+            stat.st_mtime_ns,
+            stat.st_size,
+            hashlib.sha256(raw).hexdigest(),
+        )
+    )
+
+
+def read_cache(path: Path, raw: bytes, stat: os.stat_result) -> dict[str, Any] | None:
+    try:
+        cached = read_file(get_cache_path(path))
+    except OSError:
+        return None
+
+    key = _cache_key(raw, stat)
+    header = CACHE_MAGIC + len(key).to_bytes(4, "little") + key
+    if not cached.startswith(header):
+        return None
+
+    try:
+        return marshal.loads(cached[len(header) :])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def write_cache(path: Path, raw: bytes, data: dict[str, Any]):
+    key = _cache_key(raw, os.stat(path))
+    cache_path = get_cache_path(path)
+    try:
+        write_file_atomic(
+            cache_path,
+            CACHE_MAGIC + len(key).to_bytes(4, "little") + key + marshal.dumps(data, 4),
+        )
+    except OSError as e:
+        LOGGER.warning("failed to write snapshot cache %s: %s", cache_path, e)
+
+
+def load_data(
+    path: Path,
+    storage_format: StorageFormat | None = None,
+    cache: bool | None = None,
+) -> dict[str, Any]:
+    """
+    Read the serialized config stored at path.
+
+    With cache (by default if enabled by set_use_cache or the WGMGR_CACHE
+    environment variable), a sidecar snapshot of the parsed data is used if it
+    matches the modification time, size and hash of the file, and written
+    otherwise.
+
+    If there is a journal next to the file (see wgmgr.journal), its records are
+    replayed on top of it.
+
+    In the directory format (see wgmgr.directory), the cache is not used.
+    """
+    if (storage_format or guess_format(path)) == StorageFormat.directory:
+        from wgmgr import directory
+
+        data = directory.load(path)
+    else:
+        data = _load_snapshot(path, storage_format, cache)
+    if os.path.exists(get_journal_path(path)):
+        from wgmgr import journal
+
+        with span("journal.replay"):
+            data = journal.replay(data, journal.read(path))
+    return data
+
+
+def _load_snapshot(
+    path: Path,
+    storage_format: StorageFormat | None = None,
+    cache: bool | None = None,
+) -> dict[str, Any]:
+    with span("storage.read"):
+        raw = read_file(path)
+    if not (_use_cache if cache is None else cache):
+        with span("storage.parse"):
+            return get_storage(path, storage_format).loads(raw)
+
+    stat = os.stat(path)
+    with span("storage.cache"):
+        data = read_cache(path, raw, stat)
+    if data is not None:
+        LOGGER.debug("use snapshot cache for %s", path)
+        return data
+
+    with span("storage.parse"):
+        data = get_storage(path, storage_format).loads(raw)
+    with span("storage.cache"):
+        write_cache(path, raw, data)
+    return data
+
+
+def dump_data(
+    data: dict[str, Any],
+    path: Path,
+    storage_format: StorageFormat | None = None,
+    cache: bool | None = None,
+    base: dict[str, Any] | None = None,
+    journal: bool | None = None,
+) -> bool:
+    """
+    Store the serialized config at path.
+
+    Nothing is written if the file already has the same content. Otherwise the
+    new content is written to a temporary file that atomically replaces the old
+    one. Returns whether the file was written.
+
+    With journal (by default if enabled by set_use_journal or the WGMGR_JOURNAL
+    environment variable) and base, the data last loaded from or stored at path,
+    only the differences to base are appended to the journal. Once the journal
+    grows past journal.COMPACT_SIZE bytes, or whenever the file is written
+    without journal, the whole config is written and the journal removed.
+
+    In the directory format, only the files of entities that differ from base
+    are written, see wgmgr.directory.dump.
+    """
+    if (_use_journal if journal is None else journal) and base is not None:
+        from wgmgr import journal as journal_module
+
+        if path.exists() and journal_module.get_size(path) < (
+            journal_module.COMPACT_SIZE
+        ):
+            with span("journal.diff"):
+                records = journal_module.diff(base, data)
+            if records:
+                journal_module.append(path, records)
+            return bool(records)
+
+    if (storage_format or guess_format(path)) == StorageFormat.directory:
+        from wgmgr import directory
+
+        # base includes the changes replayed from a journal, which are not in
+        # the files yet, so compare with the files instead when compacting
+        journal_path = get_journal_path(path)
+        written = directory.dump(data, path, None if journal_path.exists() else base)
+        journal_path.unlink(missing_ok=True)
+        return written
+
+    with span("storage.dump"):
+        raw = get_storage(path, storage_format).dumps(data)
+    use_cache = _use_cache if cache is None else cache
+
+    try:
+        unchanged = hashlib.sha256(read_file(path)).digest() == (
+            hashlib.sha256(raw).digest()
+        )
+    except FileNotFoundError:
+        unchanged = False
+
+    if unchanged:
+        LOGGER.debug("%s is unchanged, skip writing", path)
+        if use_cache and (read_cache(path, raw, os.stat(path)) is None):
+            write_cache(path, raw, data)
+        get_journal_path(path).unlink(missing_ok=True)
+        return False
+
+    with span("storage.write"):
+        write_file_atomic(path, raw)
+    get_journal_path(path).unlink(missing_ok=True)
+    if use_cache:
+        with span("storage.cache"):
+            write_cache(path, raw, data)
+    return True
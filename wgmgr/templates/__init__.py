@@ -1,7 +1,51 @@
+from __future__ import annotations
+
+import functools
+import os
+from pathlib import Path
+
 import jinja2
 
-environment = jinja2.Environment(loader=jinja2.PackageLoader("wgmgr", "templates"))
+
+def get_cache_dir() -> Path | None:
+    path = (
+        Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+        / "wgmgr"
+        / "jinja"
+    )
+    try:
+        path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    except OSError:
+        return None
+    return path
+
+
+@functools.lru_cache(maxsize=None)
+def get_environment(directory: Path | None = None) -> jinja2.Environment:
+    """
+    Environment for the builtin templates, or for the templates in directory.
+
+    Compiled templates are kept in a bytecode cache in the user cache directory,
+    so templates only need to be compiled once.
+    """
+    cache_dir = get_cache_dir()
+    loader: jinja2.BaseLoader
+    if directory is None:
+        loader = jinja2.PackageLoader("wgmgr", "templates")
+    else:
+        loader = jinja2.FileSystemLoader(directory)
+    return jinja2.Environment(
+        loader=loader,
+        bytecode_cache=(
+            jinja2.FileSystemBytecodeCache(str(cache_dir)) if cache_dir else None
+        ),
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
 
 
-def get_template(name: str) -> jinja2.Template:
-    return environment.get_template(name)
+def get_template(name: str | Path) -> jinja2.Template:
+    if isinstance(name, Path):
+        name = name.resolve()
+        return get_environment(name.parent).get_template(name.name)
+    return get_environment().get_template(name)
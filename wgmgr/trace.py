@@ -0,0 +1,141 @@
+"""
+Lightweight timing of the phases of wgmgr operations.
+
+Spans are only recorded while tracing is enabled, either with set_enabled or by
+setting the WGMGR_TRACE environment variable. When disabled, span() returns a
+shared no-op context manager and traced functions only check a flag.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from enum import Enum
+from typing import Any, Callable, ContextManager, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class TraceFormat(str, Enum):
+    table = "table"
+    json = "json"
+
+
+_enabled = os.environ.get("WGMGR_TRACE", "") not in ("", "0")
+_origin = time.perf_counter()
+_lock = threading.Lock()
+_local = threading.local()
+_stats: dict[str, list[float]] = {}
+_events: list[dict[str, Any]] = []
+_NULL = contextlib.nullcontext()
+
+
+def get_enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(enabled: bool):
+    global _enabled
+    _enabled = enabled
+
+
+def reset():
+    global _origin
+    with _lock:
+        _stats.clear()
+        _events.clear()
+        _origin = time.perf_counter()
+
+
+class _Span:
+    __slots__ = ("name", "start", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = 0.0
+        self.children = 0.0
+
+    def __enter__(self) -> _Span:
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args: Any):
+        duration = time.perf_counter() - self.start
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            stack[-1].children += duration
+
+        with _lock:
+            entry = _stats.setdefault(self.name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] += duration - self.children
+            _events.append(
+                {
+                    "span": self.name,
+                    "start": self.start - _origin,
+                    "duration": duration,
+                    "depth": len(stack),
+                    "thread": threading.current_thread().name,
+                }
+            )
+
+
+def span(name: str) -> ContextManager[Any]:
+    """
+    Context manager timing the enclosed block as a phase called name.
+    """
+    return _Span(name) if _enabled else _NULL
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """
+    Decorator timing every call of a function as a phase called name.
+    """
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+def events() -> list[dict[str, Any]]:
+    with _lock:
+        return list(_events)
+
+
+def report_table() -> str:
+    """
+    Calls, total time and self time (excluding nested phases) of every phase,
+    slowest first.
+    """
+    with _lock:
+        stats = sorted(_stats.items(), key=lambda item: item[1][1], reverse=True)
+
+    lines = [f"{'phase':<32} {'calls':>8} {'total':>10} {'self':>10} {'mean':>10}"]
+    for name, (count, total, self_time) in stats:
+        lines.append(
+            f"{name:<32} {int(count):>8} {total * 1e3:>8.2f}ms "
+            f"{self_time * 1e3:>8.2f}ms {total / count * 1e3:>8.3f}ms"
+        )
+    return "\n".join(lines)
+
+
+def report_json() -> str:
+    return "".join(json.dumps(event) + "\n" for event in events())
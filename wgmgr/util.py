@@ -1,10 +1,30 @@
 from __future__ import annotations
 
+import os
+import socket
+import tempfile
 from ipaddress import IPv4Address, IPv6Address
+from pathlib import Path
 from typing import Any
 
 
+def parse_ipv4(text: str) -> int:
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+    except OSError:
+        return int(IPv4Address(text))
+
+
+def parse_ipv6(text: str) -> int:
+    try:
+        return int.from_bytes(socket.inet_pton(socket.AF_INET6, text), "big")
+    except OSError:
+        return int(IPv6Address(text))
+
+
 class AssignablePort:
+    __slots__ = ("number", "auto")
+
     def __init__(self, number: int, auto: bool):
         self.number = number
         self.auto = auto
@@ -28,46 +48,110 @@ class AssignablePort:
 
 
 class AssignableIPv4:
-    def __init__(self, address: IPv4Address, auto: bool):
-        self.address = address
+    """
+    An IPv4 address stored as an integer. The IPv4Address is only created when
+    the address property is accessed.
+    """
+
+    __slots__ = ("value", "auto")
+
+    def __init__(self, address: IPv4Address | int, auto: bool):
+        self.value = int(address)
         self.auto = auto
 
-    def set(self, address: IPv4Address, auto: bool):
-        self.address = address
+    @property
+    def address(self) -> IPv4Address:
+        return IPv4Address(self.value)
+
+    @address.setter
+    def address(self, address: IPv4Address | int):
+        self.value = int(address)
+
+    def set(self, address: IPv4Address | int, auto: bool):
+        self.value = int(address)
         self.auto = auto
 
-    def set_auto(self, address: IPv4Address):
+    def set_auto(self, address: IPv4Address | int):
         self.set(address, True)
 
-    def set_manual(self, address: IPv4Address):
+    def set_manual(self, address: IPv4Address | int):
         self.set(address, False)
 
     def serialize(self) -> dict[str, Any]:
-        return {"address": str(self.address), "auto": self.auto}
+        return {
+            "address": socket.inet_ntop(socket.AF_INET, self.value.to_bytes(4, "big")),
+            "auto": self.auto,
+        }
 
     @staticmethod
     def deserialize(data: dict[str, Any]) -> AssignableIPv4:
-        return AssignableIPv4(IPv4Address(data["address"]), bool(data["auto"]))
+        return AssignableIPv4(parse_ipv4(data["address"]), bool(data["auto"]))
 
 
 class AssignableIPv6:
-    def __init__(self, address: IPv6Address, auto: bool):
-        self.address = address
+    """
+    An IPv6 address stored as an integer. The IPv6Address is only created when
+    the address property is accessed.
+    """
+
+    __slots__ = ("value", "auto")
+
+    def __init__(self, address: IPv6Address | int, auto: bool):
+        self.value = int(address)
         self.auto = auto
 
-    def set(self, address: IPv6Address, auto: bool):
-        self.address = address
+    @property
+    def address(self) -> IPv6Address:
+        return IPv6Address(self.value)
+
+    @address.setter
+    def address(self, address: IPv6Address | int):
+        self.value = int(address)
+
+    def set(self, address: IPv6Address | int, auto: bool):
+        self.value = int(address)
         self.auto = auto
 
-    def set_auto(self, address: IPv6Address):
+    def set_auto(self, address: IPv6Address | int):
         self.set(address, True)
 
-    def set_manual(self, address: IPv6Address):
+    def set_manual(self, address: IPv6Address | int):
         self.set(address, False)
 
     def serialize(self) -> dict[str, Any]:
-        return {"address": str(self.address), "auto": self.auto}
+        return {"address": str(IPv6Address(self.value)), "auto": self.auto}
 
     @staticmethod
     def deserialize(data: dict[str, Any]) -> AssignableIPv6:
-        return AssignableIPv6(IPv6Address(data["address"]), bool(data["auto"]))
+        return AssignableIPv6(parse_ipv6(data["address"]), bool(data["auto"]))
+
+
+def write_file(path: Path, content: str | bytes):
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode=0o600)
+    os.fchmod(fd, 0o600)
+    with os.fdopen(fd, "wb" if isinstance(content, bytes) else "w") as fptr:
+        fptr.write(content)
+
+
+def write_file_atomic(path: Path, content: str | bytes):
+    """
+    Write a file with mode 0600 such that readers see either the old or the new
+    content, but never a partially written file.
+    """
+    data = content.encode() if isinstance(content, str) else content
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as fptr:
+            fptr.write(data)
+            fptr.flush()
+            os.fsync(fptr.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+    dir_fd = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from wgmgr.base import MainConfigBase
+from wgmgr.peer import PeerConfig
+
+RENDERER_VERSION = 1
+
+
+def _addresses(peer: PeerConfig) -> list[str]:
+    result: list[str] = []
+    if peer.ipv4:
+        result.append(str(peer.ipv4.address))
+    if peer.ipv6:
+        result.append(str(peer.ipv6.address))
+    return result
+
+
+class LinkView:
+    def __init__(
+        self,
+        name: str,
+        public_key: str,
+        preshared_key: str,
+        allowed_ips: list[str],
+        endpoint: str | None,
+    ):
+        self.name = name
+        self.public_key = public_key
+        self.preshared_key = preshared_key
+        self.allowed_ips = allowed_ips
+        self.endpoint = endpoint
+
+
+class PeerView:
+    """
+    Everything needed to write the config of one peer, resolved from the
+    MainConfig up front so that renderers do not have to look anything up.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        private_key: str,
+        addresses: list[str],
+        port: int,
+        links: list[LinkView],
+    ):
+        self.name = name
+        self.private_key = private_key
+        self.addresses = addresses
+        self.port = port
+        self.links = links
+
+
+def build_peer_view(config: MainConfigBase, name: str) -> PeerView:
+    peer = config.get_peer(name)
+    links: list[LinkView] = []
+    for p2p in config.get_p2ps(name):
+        if p2p.peer1_name == name:
+            other = config.get_peer(p2p.peer2_name)
+            endpoint = p2p.peer2_endpoint
+        else:
+            other = config.get_peer(p2p.peer1_name)
+            endpoint = p2p.peer1_endpoint
+
+        links.append(
+            LinkView(
+                other.name,
+                other.public_key,
+                p2p.preshared_key,
+                _addresses(other)
+                + [
+                    str(network)
+                    for network in config.get_routed_networks(name, other.name)
+                ],
+                f"{endpoint}:{other.port.number}" if endpoint else None,
+            )
+        )
+
+    return PeerView(
+        peer.name, peer.private_key, _addresses(peer), peer.port.number, links
+    )
+
+
+def render(view: PeerView) -> str:
+    lines = ["[Interface]"]
+    if view.addresses:
+        lines.append(f"Address = {', '.join(view.addresses)}")
+    lines.append(f"ListenPort = {view.port}")
+    lines.append(f"PrivateKey = {view.private_key}")
+
+    for link in view.links:
+        lines.append("")
+        lines.append("[Peer]")
+        lines.append(f"PublicKey = {link.public_key}")
+        lines.append(f"PresharedKey = {link.preshared_key}")
+        lines.append(f"AllowedIPs = {', '.join(link.allowed_ips)}")
+        if link.endpoint:
+            lines.append(f"Endpoint = {link.endpoint}")
+
+    lines.append("")
+    return "\n".join(lines)